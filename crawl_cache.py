@@ -0,0 +1,193 @@
+"""On-disk HTTP response cache shared by the crawlers.
+
+Bodies are stored once per distinct content, zlib-compressed under
+``objects/<sha256>``; ``index.db`` maps each URL to its body and validators
+(``ETag``, ``Last-Modified``). A cached response is served without a request
+while it is younger than the TTL for its content type, and revalidated with a
+conditional request after that, so unchanged pages come back as a bodiless 304.
+
+    python crawl_cache.py --stats
+    python crawl_cache.py --prune
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from requests.structures import CaseInsensitiveDict
+
+from crawl_http import FetchResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = '.crawl_cache'
+DAY = 24 * 60 * 60
+# Seconds a response is trusted without revalidation, by content-type prefix; the longest match wins
+DEFAULT_TTLS = {
+    'text/html': 7 * DAY,
+    'application/xhtml': 7 * DAY,
+    'text/xml': 7 * DAY,
+    'application/xml': 7 * DAY,
+    'text/plain': 7 * DAY,
+    'image/': 30 * DAY,
+    '': DAY,
+}
+
+@dataclass
+class CachedResponse:
+    cache: 'ResponseCache'
+    url: str
+    status: int
+    content_type: str
+    encoding: str
+    etag: str
+    last_modified: str
+    body_hash: str
+    validated_at: float
+    ttl: float
+
+    @property
+    def fresh(self):
+        return time.time() - self.validated_at < self.ttl
+
+    def validators(self):
+        """Headers for a conditional request"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def result(self):
+        self.cache.hits += 1
+        headers = CaseInsensitiveDict({'Content-Type': self.content_type, 'ETag': self.etag,
+                                       'Last-Modified': self.last_modified})
+        return FetchResult(self.url, self.status, headers, self.cache.read_body(self.body_hash),
+                           self.encoding, from_cache=True)
+
+class ResponseCache:
+    """Content-addressed response store with a SQLite index, safe to share between threads and processes"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, ttls=None):
+        self.root = Path(root)
+        self.objects = self.root / 'objects'
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.root / 'index.db', timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute('''CREATE TABLE IF NOT EXISTS responses
+                             (url TEXT PRIMARY KEY,
+                              status INTEGER NOT NULL,
+                              content_type TEXT NOT NULL DEFAULT '',
+                              encoding TEXT,
+                              etag TEXT NOT NULL DEFAULT '',
+                              last_modified TEXT NOT NULL DEFAULT '',
+                              body_hash TEXT NOT NULL,
+                              fetched_at REAL NOT NULL,
+                              validated_at REAL NOT NULL)''')
+        self._conn.commit()
+        self.hits = self.revalidated = self.stored = 0
+
+    def ttl_for(self, content_type):
+        mime = (content_type or '').split(';')[0].strip().lower()
+        return self.ttls[max((prefix for prefix in self.ttls if mime.startswith(prefix)), key=len)]
+
+    def lookup(self, url, ttl=None):
+        """The cached response for ``url``, or None; ``ttl`` overrides the content-type policy"""
+        with self._lock:
+            row = self._conn.execute(
+                '''SELECT status, content_type, encoding, etag, last_modified, body_hash, validated_at
+                   FROM responses WHERE url = ?''', (url,)).fetchone()
+        if row is None or not self._object_path(row[5]).exists():
+            return None
+        status, content_type, encoding, etag, last_modified, body_hash, validated_at = row
+        return CachedResponse(self, url, status, content_type, encoding, etag, last_modified, body_hash,
+                              validated_at, self.ttl_for(content_type) if ttl is None else ttl)
+
+    def store(self, url, result):
+        """Save a complete response, writing its body only if this content is new"""
+        body_hash = hashlib.sha256(result.body).hexdigest()
+        path = self._object_path(body_hash)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(zlib.compress(result.body, 6))
+            os.replace(tmp, path)
+        now = time.time()
+        headers = result.headers
+        with self._lock:
+            self._conn.execute(
+                '''INSERT INTO responses (url, status, content_type, encoding, etag, last_modified, body_hash,
+                                          fetched_at, validated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(url) DO UPDATE SET status = excluded.status, content_type = excluded.content_type,
+                       encoding = excluded.encoding, etag = excluded.etag, last_modified = excluded.last_modified,
+                       body_hash = excluded.body_hash, fetched_at = excluded.fetched_at,
+                       validated_at = excluded.validated_at''',
+                (url, result.status, headers.get('Content-Type', ''), result.encoding, headers.get('ETag', ''),
+                 headers.get('Last-Modified', ''), body_hash, now, now))
+            self._conn.commit()
+        self.stored += 1
+
+    def mark_revalidated(self, url):
+        """Record a 304 Not Modified: the cached body is good for another TTL"""
+        with self._lock:
+            self._conn.execute("UPDATE responses SET validated_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        self.revalidated += 1
+
+    def read_body(self, body_hash):
+        return zlib.decompress(self._object_path(body_hash).read_bytes())
+
+    def _object_path(self, body_hash):
+        return self.objects / body_hash[:2] / body_hash
+
+    def prune(self):
+        """Delete bodies no URL refers to any more; returns how many were removed"""
+        with self._lock:
+            referenced = {row[0] for row in self._conn.execute("SELECT DISTINCT body_hash FROM responses")}
+        removed = 0
+        for path in self.objects.glob('*/*'):
+            if path.name not in referenced and not path.name.endswith('.tmp'):
+                path.unlink()
+                removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            urls, bodies = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT body_hash) FROM responses").fetchone()
+        size = sum(path.stat().st_size for path in self.objects.glob('*/*'))
+        return {'urls': urls, 'bodies': bodies, 'bytes_on_disk': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--stats', action='store_true', help='Print how many URLs and bodies are cached')
+    parser.add_argument('--prune', action='store_true', help='Delete bodies no cached URL uses')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    cache = ResponseCache(args.cache_dir)
+    if args.prune:
+        logger.info(f"Removed {cache.prune()} unused bodies")
+    if args.stats or not args.prune:
+        stats = cache.stats()
+        logger.info(f"{stats['urls']} URLs, {stats['bodies']} distinct bodies, "
+                    f"{stats['bytes_on_disk'] / 1024 / 1024:.1f} MB on disk")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Which pages of an organization's site to fetch when looking for contacts.
+
+Links are scored by how likely they lead to contact details ('contact' beats
+'about', which beats 'team'), and ``ContactFrontier`` hands them out best
+first, within a per-site page budget. Links found on fetched pages join the
+queue one level deeper and score lower. A site with no promising link on its
+homepage gets its sitemap read instead (the one robots.txt names, or
+/sitemap.xml), since contact pages often sit in footers or menus built by
+scripts.
+"""
+import heapq
+import html
+import re
+from urllib.parse import urldefrag, urlparse
+
+from email_quality import registrable_domain
+
+# Pages fetched per site, counting the homepage and sitemap
+DEFAULT_PAGE_BUDGET = 5
+# How far from the homepage links are followed
+MAX_DEPTH = 2
+# Keyword weights; a link takes its best match in its path or text
+CONTACT_KEYWORDS = {
+    'contact': 10, 'kontakt': 10, 'contato': 10, 'get in touch': 9, 'get-in-touch': 9,
+    'reach us': 8, 'reach-us': 8, 'email us': 8, 'connect': 6,
+    'about': 5, 'who we are': 5, 'who-we-are': 5, 'quienes': 5,
+    'staff': 4, 'team': 4, 'leadership': 3, 'board': 3, 'people': 3, 'office': 3, 'location': 3,
+}
+# Whole words or path segments only, so /disconnect, /dashboard and /officers score nothing;
+# a plural or a run-together "us" (/contacts, /contactus, /aboutus) still counts
+CONTACT_RE = re.compile('(?<![a-z])(' + '|'.join(re.escape(keyword) for keyword in
+                                                 sorted(CONTACT_KEYWORDS, key=len, reverse=True)) + ')(?:s|us)?(?![a-z])')
+# A link at least this good makes reading the sitemap unnecessary
+CONTACT_PAGE_SCORE = 8
+SKIP_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.zip', '.doc', '.docx',
+                   '.xls', '.xlsx', '.ppt', '.pptx', '.mp3', '.mp4', '.css', '.js', '.ics')
+LOC_RE = re.compile(r'<loc>\s*([^<\s]+)\s*</loc>', re.IGNORECASE)
+
+def link_score(href, text=''):
+    """How likely a link leads to contact details; 0 means not worth following"""
+    path = urlparse(href).path.lower()
+    if path.endswith(SKIP_EXTENSIONS):
+        return 0
+    matches = CONTACT_RE.findall(path) + CONTACT_RE.findall(text.lower())
+    return max((CONTACT_KEYWORDS[match] for match in matches), default=0)
+
+def parse_sitemap(xml):
+    """Split a sitemap's <loc> entries into (pages, nested sitemaps)"""
+    pages, sitemaps = [], []
+    for loc in LOC_RE.findall(xml):
+        loc = html.unescape(loc)
+        (sitemaps if urlparse(loc).path.lower().endswith('.xml') else pages).append(loc)
+    return pages, sitemaps
+
+def sitemap_url(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"
+
+class ContactFrontier:
+    """Priority queue of one site's candidate contact pages, bounded by a page budget.
+
+    ``pop`` returns the best (url, depth) still queued, or None once the
+    budget is spent or nothing is left. The caller fetches it, passes the
+    page's links to ``add`` (or a sitemap, marked by depth None, to
+    ``add_sitemap``) and may ``stop`` early once it has what it needs.
+    """
+
+    def __init__(self, url, budget=DEFAULT_PAGE_BUDGET, max_depth=MAX_DEPTH, sitemaps=()):
+        self.url = url
+        self.site = registrable_domain(urlparse(url).hostname or '')
+        # The sitemap robots.txt points to, if it names one on this site
+        self.sitemap = next((loc for loc in sitemaps if self.same_site(loc)), sitemap_url(url))
+        self.budget = budget
+        self.max_depth = max_depth
+        self.fetched = 1  # The homepage
+        self._queue = []
+        self._seen = {urldefrag(url)[0]}
+        self._best = 0
+        self._sitemap_read = False
+        self._nested_read = False
+        self._stopped = False
+
+    def same_site(self, url):
+        host = urlparse(url).hostname
+        return bool(host) and registrable_domain(host) == self.site
+
+    def add(self, links, depth=1):
+        """Queue ``links`` ({url: score}) found ``depth`` clicks from the homepage"""
+        if depth > self.max_depth:
+            return
+        for link, score in links.items():
+            link = urldefrag(link)[0]
+            if score <= 0 or link in self._seen or not self.same_site(link):
+                continue
+            self._seen.add(link)
+            self._best = max(self._best, score)
+            # Deeper links rank below shallower ones with the same keyword
+            heapq.heappush(self._queue, (-score / depth, len(self._seen), link, depth))
+
+    def add_sitemap(self, xml):
+        """Queue the promising pages listed in a fetched sitemap and at most one nested sitemap"""
+        pages, sitemaps = parse_sitemap(xml)
+        self.add({page: link_score(page) for page in pages})
+        # Sitemap indexes split pages from posts; the page sitemap is the one with contact pages
+        nested = [loc for loc in sitemaps if 'page' in loc.lower() and loc not in self._seen]
+        if nested and not self._nested_read:
+            self._nested_read = True
+            self._seen.add(nested[0])
+            heapq.heappush(self._queue, (-CONTACT_PAGE_SCORE, 0, nested[0], None))
+
+    def pop(self):
+        """The next (url, depth) to fetch, or None when done; depth is None for a sitemap"""
+        if self._stopped or self.fetched >= self.budget:
+            return None
+        if not self._sitemap_read and self._best < CONTACT_PAGE_SCORE:
+            # The homepage offered nothing that looks like a contact page
+            self._sitemap_read = True
+            self.fetched += 1
+            return self.sitemap, None
+        if not self._queue:
+            return None
+        self.fetched += 1
+        _, _, link, depth = heapq.heappop(self._queue)
+        return link, depth
+
+    def stop(self):
+        self._stopped = True
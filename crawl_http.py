@@ -0,0 +1,225 @@
+"""Pooled HTTP clients shared by the crawlers.
+
+``HTTPClient`` is the async client: one connection pool for a whole crawl,
+keep-alive, cached DNS lookups and bodies streamed with a size cap. It uses
+aiohttp, or httpx over HTTP/2 when ``http2=True`` and httpx[http2] is
+installed. ``create_requests_session`` and ``fetch`` give the synchronous
+code paths the same pooling and size limit. Both take an optional
+``crawl_cache.ResponseCache``: fresh cached pages are served without a
+request and stale ones are revalidated with ``If-None-Match``/``If-Modified-Since``.
+An optional ``crawl_metrics.CrawlMetrics`` records every fetch and cache hit.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+class FetchError(Exception):
+    """A request failed before a complete response was read"""
+
+class ResponseTooLarge(FetchError):
+    """The body exceeded the size limit and the download was abandoned"""
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    headers: CaseInsensitiveDict = field(default_factory=CaseInsensitiveDict)
+    body: bytes = b''
+    encoding: str = None
+    from_cache: bool = False
+
+    @property
+    def text(self):
+        try:
+            return self.body.decode(self.encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return self.body.decode('utf-8', errors='replace')
+
+def cached_or_none(cache, url, offline=False, ttl=None):
+    """The cached response to serve without a request, the stale entry to revalidate, or None"""
+    entry = cache.lookup(url, ttl) if cache else None
+    if offline and entry is None:
+        raise FetchError("not in the cache (offline)")
+    return entry
+
+def merge_cached(cache, url, entry, result):
+    """Fold a network response into the cache, swapping a 304 for the cached body"""
+    if result.status == 304 and entry is not None:
+        cache.mark_revalidated(url)
+        return entry.result()
+    if cache and result.status == 200:
+        cache.store(url, result)
+    return result
+
+def observe(metrics, started, result=None):
+    """Record a network fetch begun at ``started``; no ``result`` means it failed"""
+    if metrics:
+        seconds = time.monotonic() - started
+        if result is None:
+            metrics.observe_fetch(seconds, 'error')
+        else:
+            metrics.observe_fetch(seconds, result.status, len(result.body))
+
+def check_length(headers, max_bytes):
+    length = headers.get('Content-Length')
+    if max_bytes and length and length.isdigit() and int(length) > max_bytes:
+        raise ResponseTooLarge(f"Content-Length {length} exceeds {max_bytes} bytes")
+
+class HTTPClient:
+    """Async HTTP client with one shared, keep-alive connection pool.
+
+    ``pool_size`` caps open connections overall and ``per_host`` per host; DNS
+    answers are cached for ``dns_ttl`` seconds. Bodies are read in chunks and
+    the download is abandoned once it passes ``max_bytes``.
+    """
+
+    def __init__(self, pool_size=100, per_host=4, dns_ttl=300, timeout=10, max_bytes=DEFAULT_MAX_BYTES, http2=False,
+                 cache=None, offline=False, metrics=None):
+        self.cache = cache
+        self.offline = offline
+        self.metrics = metrics
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.dns_ttl = dns_ttl
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.http2 = http2 and httpx is not None
+        if http2 and httpx is None:
+            logger.warning("httpx is not installed; falling back to HTTP/1.1 with aiohttp")
+        self._session = None
+
+    async def __aenter__(self):
+        if self.http2:
+            self._session = httpx.AsyncClient(
+                http2=True, timeout=self.timeout, follow_redirects=True,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size))
+        else:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host,
+                                             ttl_dns_cache=self.dns_ttl, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        if self.http2:
+            await self._session.aclose()
+        else:
+            await self._session.close()
+
+    def cached(self, url):
+        """The cached response for ``url`` if it can be served without any request"""
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry is not None and (self.offline or entry.fresh):
+            if self.metrics:
+                self.metrics.observe_cache_hit()
+            return entry.result()
+        return None
+
+    async def get(self, url, headers=None, ttl=None):
+        """GET ``url`` and return a FetchResult; raise FetchError if no complete response arrives"""
+        entry = cached_or_none(self.cache, url, self.offline, ttl)
+        if entry is not None and (self.offline or entry.fresh):
+            if self.metrics:
+                self.metrics.observe_cache_hit()
+            return entry.result()
+        if entry is not None:
+            headers = dict(headers or {}, **entry.validators())
+        started = time.monotonic()
+        try:
+            if self.http2:
+                result = await self._get_httpx(url, headers)
+            else:
+                result = await self._get_aiohttp(url, headers)
+        except FetchError:
+            observe(self.metrics, started)
+            raise
+        observe(self.metrics, started, result)
+        return merge_cached(self.cache, url, entry, result)
+
+    async def _get_aiohttp(self, url, headers):
+        try:
+            async with self._session.get(url, headers=headers) as response:
+                check_length(response.headers, self.max_bytes)
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    body.extend(chunk)
+                    if self.max_bytes and len(body) > self.max_bytes:
+                        raise ResponseTooLarge(f"Body exceeds {self.max_bytes} bytes")
+                return FetchResult(str(response.url), response.status, CaseInsensitiveDict(response.headers),
+                                   bytes(body), response.charset)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise FetchError(str(e) or e.__class__.__name__) from e
+
+    async def _get_httpx(self, url, headers):
+        try:
+            async with self._session.stream('GET', url, headers=headers) as response:
+                check_length(response.headers, self.max_bytes)
+                body = bytearray()
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    body.extend(chunk)
+                    if self.max_bytes and len(body) > self.max_bytes:
+                        raise ResponseTooLarge(f"Body exceeds {self.max_bytes} bytes")
+                return FetchResult(str(response.url), response.status_code, CaseInsensitiveDict(response.headers),
+                                   bytes(body), response.charset_encoding)
+        except httpx.HTTPError as e:
+            raise FetchError(str(e) or e.__class__.__name__) from e
+
+def create_requests_session(pool_size=10):
+    """requests.Session that keeps up to ``pool_size`` connections alive per host"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def fetch(session, url, headers=None, timeout=10, max_bytes=DEFAULT_MAX_BYTES, cache=None, offline=False, ttl=None,
+          metrics=None):
+    """Synchronous GET through ``session`` with the size limit, optional cache and metrics of HTTPClient.get"""
+    entry = cached_or_none(cache, url, offline, ttl)
+    if entry is not None and (offline or entry.fresh):
+        if metrics:
+            metrics.observe_cache_hit()
+        return entry.result()
+    if entry is not None:
+        headers = dict(headers or {}, **entry.validators())
+    started = time.monotonic()
+    try:
+        response = session.get(url, headers=headers, timeout=timeout, stream=True)
+        result = read_limited(response, max_bytes)
+    except requests.exceptions.RequestException as e:
+        observe(metrics, started)
+        raise FetchError(str(e)) from e
+    except FetchError:
+        observe(metrics, started)
+        raise
+    observe(metrics, started, result)
+    return merge_cached(cache, url, entry, result)
+
+def read_limited(response, max_bytes=DEFAULT_MAX_BYTES):
+    """Read a streamed requests response, abandoning it once it passes ``max_bytes``"""
+    try:
+        check_length(response.headers, max_bytes)
+        body = bytearray()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            body.extend(chunk)
+            if max_bytes and len(body) > max_bytes:
+                raise ResponseTooLarge(f"Body exceeds {max_bytes} bytes")
+    finally:
+        response.close()
+    return FetchResult(response.url, response.status_code, CaseInsensitiveDict(response.headers), bytes(body), response.encoding)
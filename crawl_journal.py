@@ -0,0 +1,57 @@
+import json
+import logging
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class CrawlJournal:
+    """Append-only JSON-lines record of crawled URLs, the email crawler's resume state.
+
+    Each finished URL costs one short append of ``{"url", "status", "emails",
+    "error", "ts"}``, flushed straight away, so a crash loses at most the URLs
+    still in flight. Later entries for a URL replace earlier ones.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    def load(self):
+        """Return the latest entry per URL, ignoring a torn final line"""
+        entries = {}
+        if not self.path.exists():
+            return entries
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.endswith("\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.error(f"Skipping corrupt line {number} of {self.path}")
+                    continue
+                entries[entry['url']] = entry
+        return entries
+
+    def record(self, url, status, emails=(), error=None):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._torn_tail():
+                # Finish the line a crash left half-written so the next entry starts cleanly
+                self._file.write("\n")
+        entry = {'url': url, 'status': status, 'emails': sorted(emails), 'error': error, 'ts': time.time()}
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def _torn_tail(self):
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return False
+        with open(self.path, 'rb') as f:
+            f.seek(-1, 2)
+            return f.read(1) != b"\n"
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
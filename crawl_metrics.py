@@ -0,0 +1,184 @@
+"""Counters and histograms for the crawlers, for tuning concurrency and delays.
+
+``CrawlMetrics`` records fetch latency, bytes and status codes, parse time,
+emails per site, queue depth and the time spent waiting on politeness delays.
+``summary`` condenses them into one log line, written every ``interval``
+seconds by ``maybe_log``, and ``serve`` exposes them in the Prometheus text
+format on a local port:
+
+    python email_crawler.py --metrics-port 9108
+    curl http://127.0.0.1:9108/metrics
+"""
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (1024, 10 * 1024, 50 * 1024, 100 * 1024, 500 * 1024, 1024 * 1024, 2 * 1024 * 1024)
+EMAIL_BUCKETS = (0, 1, 2, 5, 10, 25, 50)
+
+class Histogram:
+    """Fixed-bucket histogram in the Prometheus style: cumulative counts, sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate of the ``q`` quantile, interpolated within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self, name, help_text):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines += [f"{name}_sum {self.sum}", f"{name}_count {self.count}"]
+        return lines
+
+class CrawlMetrics:
+    """Thread-safe crawl counters, shared by the crawl and the metrics endpoint"""
+
+    def __init__(self, interval=30, label=''):
+        self.interval = interval
+        self.label = label
+        self.started = time.monotonic()
+        self.fetch_seconds = Histogram(LATENCY_BUCKETS)
+        self.page_bytes = Histogram(BYTES_BUCKETS)
+        self.parse_seconds = Histogram(LATENCY_BUCKETS)
+        self.emails_per_site = Histogram(EMAIL_BUCKETS)
+        self.statuses = {}  # HTTP status, 'error' or 'cache' -> fetches
+        self.sites = {'ok': 0, 'failed': 0}
+        self.sleep_seconds = 0.0
+        self.queue_depth = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._last_log = self.started
+        self._server = None
+
+    def observe_fetch(self, seconds, status, size=0):
+        """A request that got a response (``status`` is its code) or failed (``status`` 'error')"""
+        with self._lock:
+            self.fetch_seconds.observe(seconds)
+            if size:
+                self.page_bytes.observe(size)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def observe_cache_hit(self):
+        with self._lock:
+            self.statuses['cache'] = self.statuses.get('cache', 0) + 1
+
+    def observe_parse(self, seconds):
+        with self._lock:
+            self.parse_seconds.observe(seconds)
+
+    def observe_site(self, emails, failed=False):
+        with self._lock:
+            self.sites['failed' if failed else 'ok'] += 1
+            if not failed:
+                self.emails_per_site.observe(emails)
+
+    def add_sleep(self, seconds):
+        """Time spent waiting for a host's turn rather than working"""
+        with self._lock:
+            self.sleep_seconds += seconds
+
+    def set_queue(self, depth, in_flight):
+        with self._lock:
+            self.queue_depth = depth
+            self.in_flight = in_flight
+
+    def summary(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            sites = self.sites['ok'] + self.sites['failed']
+            fetches = self.fetch_seconds.count
+            statuses = ' '.join(f"{status}:{count}" for status, count in sorted(self.statuses.items()))
+            emails = self.emails_per_site.sum / self.emails_per_site.count if self.emails_per_site.count else 0
+            return (f"{self.label}{sites} sites ({sites / elapsed:.2f}/s, {self.sites['failed']} failed), "
+                    f"{fetches} fetches ({fetches / elapsed:.2f}/s, p50 {self.fetch_seconds.quantile(0.5) * 1000:.0f} ms, "
+                    f"p95 {self.fetch_seconds.quantile(0.95) * 1000:.0f} ms), "
+                    f"{self.page_bytes.sum / 1024 / 1024:.1f} MB, status {statuses or '-'}, "
+                    f"{emails:.1f} emails/site, queue {self.queue_depth} ({self.in_flight} in flight), "
+                    f"time: {self.sleep_seconds:.0f}s waiting, {self.fetch_seconds.sum:.0f}s fetching, "
+                    f"{self.parse_seconds.sum:.0f}s parsing")
+
+    def maybe_log(self):
+        """Log the summary if ``interval`` seconds have passed since the last one"""
+        now = time.monotonic()
+        if self.interval and now - self._last_log >= self.interval:
+            self._last_log = now
+            logger.info(self.summary())
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = ["# HELP crawl_fetches_total Fetches by HTTP status, 'error' or 'cache'",
+                     "# TYPE crawl_fetches_total counter"]
+            lines += [f'crawl_fetches_total{{status="{status}"}} {count}' for status, count in sorted(self.statuses.items())]
+            lines += ["# HELP crawl_sites_total Sites finished, by result", "# TYPE crawl_sites_total counter"]
+            lines += [f'crawl_sites_total{{result="{result}"}} {count}' for result, count in self.sites.items()]
+            lines += self.fetch_seconds.render('crawl_fetch_seconds', 'Network fetch latency')
+            lines += self.page_bytes.render('crawl_page_bytes', 'Size of fetched bodies')
+            lines += self.parse_seconds.render('crawl_parse_seconds', 'Time to parse a page')
+            lines += self.emails_per_site.render('crawl_emails_per_site', 'Emails found per finished site')
+            lines += ["# HELP crawl_sleep_seconds_total Time spent waiting on per-host politeness",
+                      "# TYPE crawl_sleep_seconds_total counter", f"crawl_sleep_seconds_total {self.sleep_seconds}",
+                      "# HELP crawl_queue_depth Sites waiting to be crawled", "# TYPE crawl_queue_depth gauge",
+                      f"crawl_queue_depth {self.queue_depth}",
+                      "# HELP crawl_in_flight Sites being crawled", "# TYPE crawl_in_flight gauge",
+                      f"crawl_in_flight {self.in_flight}"]
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve /metrics on ``host``:``port`` from a background thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Serving crawl metrics on http://{host}:{port}/metrics")
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
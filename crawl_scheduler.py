@@ -0,0 +1,260 @@
+"""Per-host pacing shared by the crawlers: robots.txt, Crawl-delay and adaptive delays.
+
+``HostScheduler`` keeps one state per host: its parsed robots.txt, how many
+requests are in flight and when the next one may start. The gap between
+requests to a host starts at ``min_delay`` (or the host's ``Crawl-delay``,
+if larger), grows with the host's observed response time, doubles when it
+answers 429/503 (or waits as long as ``Retry-After`` asks) and shrinks back
+as it recovers. Hosts are independent, so a crawl is only slow where a site
+is.
+
+The scheduler does no I/O of its own: callers fetch ``robots_url(url)`` when
+``needs_robots`` says so, hand the result to ``record_robots``, and report
+every response to ``observe``. ``wait_turn`` and ``wait_turn_sync`` sleep
+until a host may be requested again.
+
+``TokenBucket`` paces a single service that many workers share, such as a
+search provider, with the same halve-on-pushback, recover-gradually policy.
+"""
+import asyncio
+import email.utils
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+logger = logging.getLogger(__name__)
+
+# Product token matched against robots.txt groups; sites rarely name it, so '*' rules apply
+ROBOTS_AGENT = 'onekindnetwork'
+# How long robots.txt is trusted, and how soon to ask again after a server error
+ROBOTS_TTL = 24 * 60 * 60
+ROBOTS_RETRY = 10 * 60
+BACKOFF_STATUSES = (429, 503)
+# The gap between requests is at least this many times the host's recent response time
+LATENCY_FACTOR = 2.0
+# Share of the excess delay given back after each good response
+RECOVERY = 0.25
+
+def host_of(url):
+    return urlparse(url).netloc.lower()
+
+def robots_url(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}/robots.txt"
+
+def retry_after_seconds(value):
+    """Seconds asked for by a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+@dataclass
+class HostState:
+    delay: float
+    next_request: float = 0.0
+    latency: float = None  # Moving average of response times
+    robots: RobotFileParser = None
+    robots_checked: float = None  # When robots.txt was last fetched, None if never
+    crawl_delay: float = 0.0
+    sitemaps: list = field(default_factory=list)
+    semaphore: asyncio.Semaphore = None
+
+class HostScheduler:
+    """Robots rules and adaptive request spacing, per host.
+
+    ``min_delay`` and ``max_delay`` bound the gap between requests to one host
+    (a Crawl-delay above ``max_delay`` is still honored); ``max_per_host``
+    bounds requests in flight to it in async code. Usable from threads and
+    from one event loop.
+    """
+
+    def __init__(self, min_delay=1.0, max_delay=60.0, max_per_host=1, obey_robots=True,
+                 backoff_statuses=BACKOFF_STATUSES, agent=ROBOTS_AGENT):
+        self.min_delay = min_delay
+        self.max_delay = max(max_delay, min_delay)
+        self.max_per_host = max_per_host
+        self.obey_robots = obey_robots
+        self.backoff_statuses = tuple(backoff_statuses)
+        self.agent = agent
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host):
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = HostState(delay=self.min_delay)
+            return self._hosts[host]
+
+    def needs_robots(self, url):
+        """True when ``url``'s host has no usable robots.txt rules yet"""
+        if not self.obey_robots:
+            return False
+        state = self._state(host_of(url))
+        if state.robots_checked is None:
+            return True
+        expiry = ROBOTS_TTL if state.robots is not None else ROBOTS_RETRY
+        return time.time() - state.robots_checked > expiry
+
+    def record_robots(self, url, status=None, text=''):
+        """Apply a fetched robots.txt; ``status`` None means the request failed outright.
+
+        As in RFC 9309, a missing robots.txt (4xx) allows everything and an
+        unreachable one (5xx, 429) disallows everything until it is retried.
+        A connection failure allows everything: the pages themselves will fail
+        the same way if the site is really down.
+        """
+        state = self._state(host_of(url))
+        state.robots_checked = time.time()
+        if status is not None and (status >= 500 or status == 429):
+            state.robots = None
+            logger.warning(f"robots.txt for {host_of(url)} returned HTTP {status}; holding off the host")
+            return
+        parser = RobotFileParser()
+        if status is not None and 200 <= status < 300:
+            parser.parse(text.splitlines())
+        else:
+            parser.allow_all = True
+        state.robots = parser
+        state.crawl_delay = self._crawl_delay(parser)
+        state.sitemaps = parser.site_maps() or []
+        if state.crawl_delay > state.delay:
+            state.delay = state.crawl_delay
+            logger.info(f"{host_of(url)} asks for a Crawl-delay of {state.crawl_delay:g}s")
+
+    def _crawl_delay(self, parser):
+        delay = parser.crawl_delay(self.agent)
+        rate = parser.request_rate(self.agent)
+        if rate and rate.requests:
+            delay = max(float(delay or 0), rate.seconds / rate.requests)
+        return float(delay or 0)
+
+    def allowed(self, url):
+        """Whether robots.txt lets us fetch ``url``; unchecked hosts are allowed"""
+        if not self.obey_robots:
+            return True
+        state = self._state(host_of(url))
+        if state.robots_checked is None:
+            return True
+        if state.robots is None:
+            return False
+        return state.robots.can_fetch(self.agent, url)
+
+    def sitemaps(self, url):
+        """Sitemap URLs listed in the host's robots.txt"""
+        return list(self._state(host_of(url)).sitemaps)
+
+    def reserve(self, url):
+        """Book the host's next request slot and return how long to wait for it"""
+        state = self._state(host_of(url))
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, state.next_request)
+            state.next_request = start + state.delay
+            return start - now
+
+    def observe(self, url, seconds, status=None, retry_after=None):
+        """Adapt the host's delay to a response (``status`` None for a failed request)"""
+        state = self._state(host_of(url))
+        with self._lock:
+            floor = max(self.min_delay, state.crawl_delay)
+            if status is None or status in self.backoff_statuses:
+                wait = retry_after_seconds(retry_after)
+                state.delay = max(floor, min(self.max_delay, max(state.delay * 2, wait or 0)))
+                if wait:
+                    state.next_request = max(state.next_request, time.monotonic() + wait)
+                logger.debug(f"Backing off {host_of(url)} to {state.delay:.1f}s ({status or 'error'})")
+                return
+            state.latency = seconds if state.latency is None else 0.7 * state.latency + 0.3 * seconds
+            target = max(floor, min(self.max_delay, LATENCY_FACTOR * state.latency))
+            state.delay = max(target, state.delay - (state.delay - target) * RECOVERY)
+
+    def delay(self, url):
+        return self._state(host_of(url)).delay
+
+    def semaphore(self, url):
+        """Async cap on requests in flight to ``url``'s host"""
+        state = self._state(host_of(url))
+        if state.semaphore is None:
+            state.semaphore = asyncio.Semaphore(self.max_per_host)
+        return state.semaphore
+
+    async def wait_turn(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def wait_turn_sync(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+class TokenBucket:
+    """Thread-safe token bucket for one rate-limited service, such as a search provider.
+
+    Requests take a token each; tokens refill at ``rate`` a second up to
+    ``capacity``. ``backoff`` halves the rate and pauses the bucket when the
+    service pushes back, and ``recover`` adds back a tenth of the configured
+    rate per good response, so the rate settles just under the service's
+    real limit.
+    """
+
+    def __init__(self, rate, capacity=1, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 64
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a token is available, take it and return the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def backoff(self, retry_after=None):
+        """The service pushed back: halve the rate and pause for ``retry_after`` or one interval"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            pause = retry_after_seconds(retry_after) or 1 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+    def limit(self, max_rate):
+        """Never exceed ``max_rate``, e.g. what a robots.txt Crawl-delay allows"""
+        with self._lock:
+            self.max_rate = min(self.max_rate, max_rate)
+            self.rate = min(self.rate, self.max_rate)
+            self.min_rate = min(self.min_rate, self.max_rate)
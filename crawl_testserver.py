@@ -0,0 +1,179 @@
+"""Local stand-in for nonprofit websites, for exercising the crawlers offline.
+
+    python crawl_testserver.py --sites 50 --latency 0.2 --write-csv test_sites.csv
+
+Every loopback address is a separate site: http://127.0.0.N:PORT/ serves a
+homepage linking to /contact, /about and /about/board pages carrying email
+addresses among several pages without any, plus a /sitemap.xml, so per-host
+limits apply exactly as they would on the internet. Every fourth homepage
+leaves out its contact link, which then only the sitemap lists. Each site has
+a robots.txt that disallows /private and, on every fifth site, asks for a
+2 second Crawl-delay. With --throttle, a host answering more than that many
+requests a second replies 429 with Retry-After. Pages carry an
+ETag and answer If-None-Match with 304. /huge streams a 50 MB page for
+testing size limits. --write-csv
+produces an input file for email_crawler.py pointing at N such sites.
+"""
+import argparse
+import csv
+import hashlib
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+HOME_PAGE = '''<html><head><title>Site {site}</title></head><body>
+<h1>Nonprofit {site}</h1>
+<p>Welcome! General questions: info@site{site}.org</p>
+{contact_link}<a href="/about">About</a> <a href="/programs">Programs</a> <a href="/about/board">Our board</a>
+<a href="/about/history">Our history</a> <a href="/news/email-newsletter">Email newsletter</a>
+<a href="/mailing-list">Join our mailing list</a> <a href="/events">Events</a>
+</body></html>'''
+CONTACT_LINK = '<a href="/contact">Contact us</a> '
+CONTACT_PAGE = '''<html><body><h1>Contact</h1>
+<a href="mailto:director@site{site}.org">Email our director</a>
+<a href="/private">Staff contact directory</a>
+</body></html>'''
+ABOUT_PAGE = '''<html><body><h1>About</h1><p>Volunteer coordinator: volunteer@site{site}.org</p></body></html>'''
+BOARD_PAGE = '''<html><body><h1>Board</h1><p>Write to the board chair at board@site{site}.org</p></body></html>'''
+PRIVATE_PAGE = '''<html><body><h1>Staff only</h1><p>staff@site{site}.org</p></body></html>'''
+PLAIN_PAGE = '''<html><body><h1>Site {site}</h1><p>Nothing to see here.</p></body></html>'''
+SITEMAP = '''<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+''' + ''.join(f"<url><loc>http://{{host}}{path}</loc></url>\n" for path in (
+    '/', '/about', '/programs', '/contact', '/about/board', '/about/history', '/news/email-newsletter',
+    '/mailing-list', '/events')) + '</urlset>'
+ROBOTS = '''User-agent: *
+Disallow: /private
+{crawl_delay}Sitemap: http://{host}/sitemap.xml
+'''
+PAGES = {'/robots.txt': ROBOTS, '/private': PRIVATE_PAGE, '/': HOME_PAGE, '/contact': CONTACT_PAGE, '/about': ABOUT_PAGE, '/about/board': BOARD_PAGE,
+         '/about/history': PLAIN_PAGE, '/news/email-newsletter': PLAIN_PAGE, '/mailing-list': PLAIN_PAGE,
+         '/programs': PLAIN_PAGE, '/events': PLAIN_PAGE, '/sitemap.xml': SITEMAP}
+
+class SiteHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like real web servers
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle's algorithm
+    # stalls every reused connection on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.record(self.headers.get('Host', ''), self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        host = self.headers.get('Host', '').split(':')[0]
+        site = host.rsplit('.', 1)[-1] if host.startswith('127.') else '1'
+        if self.server.throttled(host):
+            self.send_response(429)
+            self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/huge':
+            self.send_huge_page()
+            return
+        template = PAGES.get(self.path.split('?')[0])
+        # Every fourth site only links its contact page from a script-built menu, so only the sitemap has it
+        contact_link = '' if int(site) % 4 == 0 else CONTACT_LINK
+        crawl_delay = 'Crawl-delay: 2\n' if int(site) % 5 == 0 else ''
+        body = (template or '<html><body>Not found</body></html>').format(
+            site=site, host=self.headers.get('Host', ''), contact_link=contact_link, crawl_delay=crawl_delay).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if template and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200 if template else 404)
+        content_type = 'application/xml' if self.path.endswith('.xml') else 'text/html; charset=utf-8'
+        if self.path == '/robots.txt':
+            content_type = 'text/plain'
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_huge_page(self, size=50 * 1024 * 1024):
+        """A page far larger than any real homepage, sent in chunks"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunk = b'<p>' + b'x' * 65529 + b'</p>'
+        try:
+            for _ in range(size // len(chunk)):
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on the body, as it should
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+class TestSiteServer(ThreadingHTTPServer):
+    """Threaded server that also counts requests per host"""
+    daemon_threads = True
+
+    def __init__(self, port=8765, latency=0.0, throttle=0):
+        # Bind every local address so each 127.0.0.N is its own host
+        super().__init__(('', port), SiteHandler)
+        self.latency = latency
+        self.throttle = throttle
+        self.requests = {}
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def throttled(self, host):
+        """True when ``host`` has had more than ``throttle`` requests in the last second"""
+        if not self.throttle:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            recent = [t for t in self._recent.get(host, ()) if now - t < 1.0]
+            recent.append(now)
+            self._recent[host] = recent
+            if len(recent) > self.throttle:
+                self.requests['429'] = self.requests.get('429', 0) + 1
+                return True
+            return False
+
+    def record(self, host, path):
+        with self._lock:
+            self.requests[host] = self.requests.get(host, 0) + 1
+            self.requests['total'] = self.requests.get('total', 0) + 1
+
+def site_urls(count, port=8765):
+    return [f"http://127.0.0.{n}:{port}/" for n in range(1, count + 1)]
+
+def write_sites_csv(path, count, port=8765):
+    """Write a crawler input file with one test site per row, URL in the last column"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['EIN', 'Organization Name', 'City', 'State', 'Country', 'PC', 'Website'])
+        for n, url in enumerate(site_urls(count, port), 1):
+            writer.writerow([f"{n:09d}", f"Test Nonprofit {n}", 'Testville', '', 'TEST', 'PC', url])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--sites', type=int, default=50, help='Number of sites listed by --write-csv (at most 254)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each request')
+    parser.add_argument('--throttle', type=int, default=0,
+                        help='Answer 429 once a host gets more than this many requests a second (0: never)')
+    parser.add_argument('--write-csv', help='Write a crawler input CSV for the test sites and keep serving')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.write_csv:
+        write_sites_csv(args.write_csv, min(args.sites, 254), args.port)
+        logger.info(f"Wrote {args.write_csv}")
+    with TestSiteServer(args.port, args.latency, args.throttle) as server:
+        logger.info(f"Serving test sites on 127.0.0.N:{args.port}")
+        server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class CRMDatabase:
+    """Pooled SQLite access for the CRM.
+
+    Connections are opened once, tuned (WAL journal, ``synchronous=NORMAL``, a
+    larger page cache, busy timeout) and handed out to one thread at a time.
+    Streamlit runs every rerun on a fresh thread, so connections are checked
+    out per operation rather than pinned to a thread that is about to exit.
+    Each connection keeps its own compiled-statement cache, so the constant SQL
+    strings the CRM uses are prepared once per connection and reused.
+
+    Every operation is timed under a name; ``stats()`` reports the latencies.
+    """
+
+    _instances = {}
+    _instances_guard = threading.Lock()
+
+    def __init__(self, path, pool_size=8, cache_size_kb=32768, busy_timeout_ms=5000, statement_cache=256):
+        self.path = str(path)
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.statement_cache = statement_cache
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._timings = defaultdict(lambda: deque(maxlen=1000))
+        self._counts = defaultdict(int)
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, path, **kwargs):
+        """One pool per database file per process"""
+        key = str(Path(path).resolve())
+        with cls._instances_guard:
+            if key not in cls._instances:
+                cls._instances[key] = cls(path, **kwargs)
+            return cls._instances[key]
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self, operation="query"):
+        """Check a connection out of the pool for the duration of one timed operation"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        started = time.perf_counter()
+        try:
+            yield conn
+        finally:
+            self._record(operation, time.perf_counter() - started)
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self, operation="write"):
+        """Run the block in one write transaction, committed on success and rolled back on error"""
+        with self.connection(operation) as conn:
+            # Take the write lock up front so concurrent writers queue on busy_timeout
+            # instead of failing with "database is locked" when upgrading a read lock
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def _record(self, operation, elapsed):
+        with self._stats_lock:
+            self._timings[operation].append(elapsed)
+            self._counts[operation] += 1
+        logger.debug(f"{operation} took {elapsed * 1000:.2f}ms")
+
+    def stats(self):
+        """Latency per operation in milliseconds over its most recent calls"""
+        with self._stats_lock:
+            snapshot = {op: sorted(times) for op, times in self._timings.items()}
+            counts = dict(self._counts)
+        report = {}
+        for op, times in sorted(snapshot.items()):
+            report[op] = {
+                'count': counts[op],
+                'mean_ms': round(sum(times) / len(times) * 1000, 3),
+                'p95_ms': round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 3),
+                'max_ms': round(times[-1] * 1000, 3),
+            }
+        return report
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,227 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import chardet
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class ChangeJournal:
+    """Append-only JSON-lines log of prospect changes destined for the CSV exports.
+
+    Each CRM edit costs one short append instead of a read and rewrite of every
+    CSV file. Entries are ``{"op": "upsert"|"delete", "ein": ..., "row": {...}}``
+    where ``row`` uses the CSV column names.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path="crm_changes.jsonl"):
+        self.path = Path(path)
+        self.offset_path = self.path.with_suffix(self.path.suffix + ".offset")
+        # One lock per journal file, shared by every CRMSystem in the process
+        with self._locks_guard:
+            self.lock = self._locks.setdefault(self.path.resolve(), threading.Lock())
+
+    def append(self, op, ein, row=None):
+        entry = {'op': op, 'ein': str(ein), 'row': row or {}, 'ts': time.time()}
+        line = json.dumps(entry, default=str) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+
+    def append_many(self, entries):
+        """Append several (op, ein, row) changes with a single write"""
+        now = time.time()
+        lines = ''.join(json.dumps({'op': op, 'ein': str(ein), 'row': row or {}, 'ts': now}, default=str) + "\n"
+                        for op, ein, row in entries)
+        if not lines:
+            return
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+
+    def committed_offset(self):
+        try:
+            return int(self.offset_path.read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def pending_bytes(self):
+        try:
+            return self.path.stat().st_size - self.committed_offset()
+        except FileNotFoundError:
+            return 0
+
+    def read_pending(self, max_entries):
+        """Return up to ``max_entries`` uncompacted entries and the offset just after them"""
+        offset = self.committed_offset()
+        entries = []
+        if not self.path.exists():
+            return entries, offset
+        with open(self.path, 'r', encoding='utf-8') as f:
+            f.seek(offset)
+            while len(entries) < max_entries:
+                line = f.readline()
+                # A line without a newline is still being written
+                if not line or not line.endswith("\n"):
+                    break
+                offset += len(line.encode('utf-8'))
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.error(f"Skipping corrupt journal line at offset {offset}")
+        return entries, offset
+
+    def commit(self, offset):
+        """Record that everything before ``offset`` is in the CSVs, truncating a fully consumed journal"""
+        with self.lock:
+            consumed = self.path.exists() and offset >= self.path.stat().st_size
+            # Reset the offset before truncating: a crash in between only replays the batch
+            self._write_offset(0 if consumed else offset)
+            if consumed:
+                self.path.write_text('')
+
+    def _write_offset(self, offset):
+        tmp = self.offset_path.with_suffix('.tmp')
+        tmp.write_text(str(offset))
+        os.replace(tmp, self.offset_path)
+
+class CSVCompactor:
+    """Background worker that folds journal entries into the CSV exports in batches.
+
+    Every ``interval`` seconds (or sooner once ``batch_size`` changes are
+    pending) it collapses the pending entries to one change per EIN and
+    rewrites each CSV once for the whole batch. Applying a batch twice gives the
+    same result, so a crash between writing the CSVs and committing the offset
+    only repeats work.
+    """
+
+    _instances = {}
+    _instances_guard = threading.Lock()
+
+    def __init__(self, journal, csv_paths, interval=10.0, batch_size=5000):
+        self.journal = journal
+        self.csv_paths = list(csv_paths)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._encodings = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._compact_lock = threading.Lock()
+        self._appended = 0
+        self._thread = threading.Thread(target=self._run, name="crm-csv-compactor", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @classmethod
+    def shared(cls, journal, csv_paths, **kwargs):
+        """One compactor per journal file per process, however many CRMSystem objects exist"""
+        key = journal.path.resolve()
+        with cls._instances_guard:
+            if key not in cls._instances:
+                cls._instances[key] = cls(journal, csv_paths, **kwargs)
+            return cls._instances[key]
+
+    def notify(self):
+        self._wake.set()
+
+    def changes_appended(self, count=1):
+        """Count new journal entries, waking the worker early once a full batch is waiting"""
+        self._appended += count
+        if self._appended >= self.batch_size:
+            self._wake.set()
+
+    def stop(self):
+        """Stop the worker after a final compaction"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=30)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.compact()
+        self.compact()
+
+    def detect_encoding(self, file_path):
+        # Detect once per file; the compactor writes back with the same encoding
+        if file_path not in self._encodings:
+            with open(file_path, 'rb') as f:
+                self._encodings[file_path] = chardet.detect(f.read())['encoding']
+        return self._encodings[file_path]
+
+    def compact(self):
+        """Apply all pending journal entries to the CSV files, one batch at a time"""
+        with self._compact_lock:
+            while True:
+                entries, offset = self.journal.read_pending(self.batch_size)
+                if not entries:
+                    self._appended = 0
+                    return
+                latest = self.collapse(entries)
+                for csv_path in self.csv_paths:
+                    if csv_path.exists():
+                        try:
+                            self.apply(csv_path, latest)
+                        except Exception as e:
+                            logger.error(f"Error compacting changes into {csv_path}: {e}")
+                            return
+                self.journal.commit(offset)
+                logger.info(f"Compacted {len(entries)} CRM changes ({len(latest)} prospects) into CSV exports")
+
+    @staticmethod
+    def collapse(entries):
+        """One change per EIN: upserts merge field by field, a delete discards what came before.
+
+        An upsert after a delete is marked ``replace``, so the old CSV row is
+        dropped before the new one is written.
+        """
+        latest = {}
+        for entry in entries:
+            previous = latest.get(entry['ein'])
+            if entry['op'] == 'upsert' and previous is not None:
+                if previous['op'] == 'upsert':
+                    entry = dict(entry, row=dict(previous['row'], **entry['row']), replace=previous.get('replace', False))
+                else:
+                    entry = dict(entry, replace=True)
+            latest[entry['ein']] = entry
+        return latest
+
+    def apply(self, csv_path, latest):
+        encoding = self.detect_encoding(csv_path)
+        df = pd.read_csv(csv_path, encoding=encoding, dtype={'EIN': str})
+
+        deleted = {ein for ein, entry in latest.items() if entry['op'] == 'delete' or entry.get('replace')}
+        rows = [dict(entry['row'], EIN=ein) for ein, entry in latest.items() if entry['op'] == 'upsert']
+        if deleted:
+            df = df[~df['EIN'].isin(deleted)]
+        if rows:
+            updates = pd.DataFrame(rows).set_index('EIN')
+            # Add new columns if they don't exist
+            for col in updates.columns:
+                if col not in df.columns:
+                    df[col] = ''
+            # Update the fields each change carries (bulk imports journal only non-empty ones),
+            # then append prospects the file does not have yet
+            for col in updates.columns:
+                values = df['EIN'].map(updates[col])
+                changed = values.notna()
+                df[col] = df[col].astype(object)
+                df.loc[changed, col] = values[changed]
+            new_rows = updates[~updates.index.isin(df['EIN'])].reset_index()
+            df = pd.concat([df, new_rows], ignore_index=True)
+
+        tmp_path = csv_path.with_suffix(csv_path.suffix + '.tmp')
+        df.to_csv(tmp_path, index=False, encoding=encoding)
+        os.replace(tmp_path, csv_path)
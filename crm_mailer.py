@@ -0,0 +1,336 @@
+"""Outbound campaign queue and its sender.
+
+    python crm_mailer.py --debug-server          # local SMTP stand-in on port 1025
+
+Campaign emails are rows in ``email_campaigns`` with status ``queued``. A
+background worker claims them in batches, sends them over a small pool of SMTP
+connections and records ``sent``, ``bounced`` (permanent 5xx rejection) or
+``failed`` (retries exhausted). Transient errors are retried with exponential
+backoff, and each recipient domain has its own rate limit.
+"""
+import argparse
+import atexit
+import logging
+import os
+import queue
+import random
+import smtplib
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+CLAIM_SQL = '''UPDATE email_campaigns SET status='sending'
+               WHERE id IN (SELECT id FROM email_campaigns
+                            WHERE status='queued' AND next_attempt_at <= ?
+                            ORDER BY next_attempt_at, id LIMIT ?)
+               RETURNING id, prospect_id, recipient, email_subject, email_content, attempts'''
+SENT_SQL = "UPDATE email_campaigns SET status='sent', sent_date=CURRENT_TIMESTAMP, last_error=NULL WHERE id=?"
+BOUNCED_SQL = "UPDATE email_campaigns SET status='bounced', attempts=attempts+1, last_error=? WHERE id=?"
+FAILED_SQL = "UPDATE email_campaigns SET status='failed', attempts=attempts+1, last_error=? WHERE id=?"
+RETRY_SQL = "UPDATE email_campaigns SET status='queued', attempts=attempts+1, next_attempt_at=?, last_error=? WHERE id=?"
+DEFER_SQL = "UPDATE email_campaigns SET status='queued', next_attempt_at=? WHERE id=?"
+ENQUEUE_SQL = '''INSERT INTO email_campaigns
+                 (prospect_id, recipient, email_subject, email_content, status, attempts, next_attempt_at, queued_at)
+                 VALUES (?, ?, ?, ?, 'queued', 0, 0, CURRENT_TIMESTAMP)'''
+
+class DomainRateLimiter:
+    """Token bucket per recipient domain"""
+
+    def __init__(self, rate=1.0, burst=5):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+
+    def acquire(self, domain, now=None):
+        """Take a token for ``domain``; return 0 on success or the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.get(domain, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[domain] = (tokens - 1, now)
+            return 0
+        self._buckets[domain] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+class CampaignMailer:
+    """Background worker that drains the campaign queue.
+
+    SMTP settings come from SMTP_HOST, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD,
+    SMTP_STARTTLS and SMTP_SENDER; the defaults point at the local debug server.
+    Rows left in ``sending`` by a crash are re-queued when the worker starts.
+    """
+
+    _instances = {}
+    _instances_guard = threading.Lock()
+
+    def __init__(self, db, suppression=None, batch_size=100, pool_size=4, domain_rate=1.0, domain_burst=5,
+                 max_attempts=5, backoff_base=60.0, poll_interval=2.0):
+        self.db = db
+        self.suppression = suppression
+        self.host = os.environ.get('SMTP_HOST', 'localhost')
+        self.port = int(os.environ.get('SMTP_PORT', '1025'))
+        self.username = os.environ.get('SMTP_USERNAME')
+        self.password = os.environ.get('SMTP_PASSWORD')
+        self.starttls = os.environ.get('SMTP_STARTTLS', '0') == '1'
+        self.sender = os.environ.get('SMTP_SENDER', 'outreach@localhost')
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.poll_interval = poll_interval
+        self.limiter = DomainRateLimiter(domain_rate, domain_burst)
+        self._connections = queue.LifoQueue(maxsize=pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="crm-smtp")
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._requeue_interrupted()
+        self._thread = threading.Thread(target=self._run, name="crm-campaign-mailer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    @classmethod
+    def shared(cls, db, suppression=None, **kwargs):
+        """One mailer per database per process"""
+        with cls._instances_guard:
+            if db.path not in cls._instances:
+                cls._instances[db.path] = cls(db, suppression, **kwargs)
+            return cls._instances[db.path]
+
+    def _requeue_interrupted(self):
+        with self.db.transaction("requeue_interrupted") as conn:
+            count = conn.execute("UPDATE email_campaigns SET status='queued' WHERE status='sending'").rowcount
+        if count:
+            logger.info(f"Re-queued {count} campaign emails interrupted mid-send")
+
+    def enqueue(self, rows):
+        """Queue (prospect_id, recipient, subject, content) rows in one transaction"""
+        rows = list(rows)
+        if rows:
+            with self.db.transaction("enqueue_campaign") as conn:
+                conn.executemany(ENQUEUE_SQL, rows)
+            self._wake.set()
+        return len(rows)
+
+    def retry_failed(self):
+        """Put failed emails back in the queue with a fresh set of attempts"""
+        with self.db.transaction("retry_failed") as conn:
+            count = conn.execute('''UPDATE email_campaigns SET status='queued', attempts=0, next_attempt_at=0
+                                    WHERE status='failed' ''').rowcount
+        self._wake.set()
+        return count
+
+    def status_counts(self):
+        with self.db.connection("campaign_status_counts") as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM email_campaigns GROUP BY status").fetchall())
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=30)
+        self._executor.shutdown(wait=False)
+        while True:
+            try:
+                self._connections.get_nowait().quit()
+            except queue.Empty:
+                return
+            except (smtplib.SMTPException, OSError):
+                continue
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.send_batch()
+            except Exception as e:
+                logger.error(f"Campaign mailer error: {e}")
+                sent = 0
+            # Keep draining while there is work; otherwise wait for new mail or the next retry
+            if not sent:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        return conn
+
+    def _send(self, row):
+        """Send one email over a pooled connection; return (status, error)"""
+        _, _, recipient, subject, content, _ = row
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.set_content(content or '')
+        try:
+            conn = self._connections.get_nowait()
+        except queue.Empty:
+            conn = None
+        for resend in (False, True):
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.send_message(message, self.sender, [recipient])
+                result = 'sent', None
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                # Servers close idle pooled connections; resend once on a fresh one before counting an attempt
+                self._discard(conn)
+                conn = None
+                if resend:
+                    return 'retry', str(e) or e.__class__.__name__
+                continue
+            except smtplib.SMTPRecipientsRefused as e:
+                code, reply = next(iter(e.recipients.values()))
+                result = ('bounced' if code >= 500 else 'retry'), f"{code} {reply.decode(errors='replace')}"
+            except smtplib.SMTPDataError as e:
+                result = ('bounced' if e.smtp_code >= 500 else 'retry'), f"{e.smtp_code} {e.smtp_error.decode(errors='replace')}"
+            except (smtplib.SMTPException, OSError) as e:
+                # The connection may be unusable; drop it and retry the email later
+                self._discard(conn)
+                return 'retry', str(e) or e.__class__.__name__
+            break
+        try:
+            self._connections.put_nowait(conn)
+        except queue.Full:
+            conn.quit()
+        return result
+
+    @staticmethod
+    def _discard(conn):
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def send_batch(self):
+        """Claim one batch of due emails, send what the rate limits allow and record the outcomes"""
+        now = time.time()
+        with self.db.transaction("claim_campaign_batch") as conn:
+            rows = conn.execute(CLAIM_SQL, (now, self.batch_size)).fetchall()
+        if not rows:
+            return 0
+
+        ready, deferred, suppressed = [], [], []
+        waiting = {}
+        for row in rows:
+            recipient = row[2] or ''
+            if self.suppression and self.suppression.is_email_suppressed(recipient):
+                suppressed.append(('Recipient is on the Do-Not-Contact list', row[0]))
+                continue
+            domain = recipient.rpartition('@')[2].lower()
+            wait = self.limiter.acquire(domain)
+            if wait:
+                # Spread a domain's overflow over future slots instead of retrying it all at once
+                waiting[domain] = waiting.get(domain, -1) + 1
+                deferred.append((now + wait + waiting[domain] / self.limiter.rate, row[0]))
+            else:
+                ready.append(row)
+
+        results = list(zip(ready, self._executor.map(self._send, ready)))
+        updates = {'sent': [], 'bounced': [], 'failed': list(suppressed), 'retry': []}
+        for row, (status, error) in results:
+            email_id, attempts = row[0], row[5]
+            if status == 'sent':
+                updates['sent'].append((email_id,))
+            elif status == 'bounced':
+                updates['bounced'].append((error, email_id))
+            elif attempts + 1 >= self.max_attempts:
+                updates['failed'].append((error, email_id))
+            else:
+                delay = self.backoff_base * 2 ** attempts * random.uniform(0.8, 1.2)
+                updates['retry'].append((time.time() + delay, error, email_id))
+
+        with self.db.transaction("record_campaign_batch") as conn:
+            conn.executemany(SENT_SQL, updates['sent'])
+            conn.executemany(BOUNCED_SQL, updates['bounced'])
+            conn.executemany(FAILED_SQL, updates['failed'])
+            conn.executemany(RETRY_SQL, updates['retry'])
+            conn.executemany(DEFER_SQL, deferred)
+        if results:
+            logger.info(f"Campaign batch: {len(updates['sent'])} sent, {len(updates['bounced'])} bounced, "
+                        f"{len(updates['failed'])} failed, {len(updates['retry'])} to retry, {len(deferred)} rate limited")
+        return len(results)
+
+class DebugSMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue that logs messages instead of delivering them.
+
+    Recipients whose local part starts with ``bounce`` are rejected with 550 and
+    ones starting with ``defer`` with 451, so bounce and retry handling can be
+    exercised locally.
+    """
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 localhost debug SMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply("250 localhost")
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                address = command.partition(':')[2].strip().strip('<>')
+                if address.lower().startswith('bounce'):
+                    self.reply("550 No such user")
+                elif address.lower().startswith('defer'):
+                    self.reply("451 Try again later")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                size = 0
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    size += len(data_line)
+                self.server.received += 1
+                logger.info(f"Received message for {', '.join(recipients)} ({size} bytes)")
+                self.reply("250 OK")
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class DebugSMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=('localhost', 1025)):
+        super().__init__(address, DebugSMTPHandler)
+        self.received = 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--debug-server', action='store_true', help='Run the local SMTP stand-in')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.debug_server:
+        with DebugSMTPServer((args.host, args.port)) as server:
+            logger.info(f"Debug SMTP server listening on {args.host}:{args.port}")
+            server.serve_forever()
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field, fields
+
+# Prospect columns in the prospects table, in SELECT order
+PROSPECT_COLUMNS = ('id', 'organization_name', 'ein', 'contact_name', 'phone', 'email',
+                    'city', 'state', 'country', 'website', 'notes', 'do_not_contact', 'removed',
+                    'created_at', 'updated_at')
+# Legacy JSON text columns replaced by the prospect_systems and social_links tables
+LEGACY_JSON_COLUMNS = ('current_systems', 'social_media')
+
+@dataclass(slots=True)
+class Prospect:
+    """One CRM prospect with its systems and social links already decoded"""
+    id: int
+    organization_name: str = ''
+    ein: str = ''
+    contact_name: str = ''
+    phone: str = ''
+    email: str = ''
+    city: str = ''
+    state: str = ''
+    country: str = ''
+    website: str = ''
+    notes: str = ''
+    do_not_contact: int = 0
+    removed: int = 0
+    created_at: str = ''
+    updated_at: str = ''
+    current_systems: tuple = ()
+    social_media: dict = field(default_factory=dict)
+
+    def to_dict(self):
+        """Plain dict in the shape add_prospect/update_prospect take"""
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        data['current_systems'] = list(self.current_systems)
+        data['social_media'] = dict(self.social_media)
+        return data
+
+def init_link_tables(c):
+    """Create the systems/social link tables, moving data out of the legacy JSON columns"""
+    c.execute('''CREATE TABLE IF NOT EXISTS prospect_systems
+                (prospect_id INTEGER NOT NULL REFERENCES prospects(id),
+                 system TEXT NOT NULL,
+                 PRIMARY KEY (prospect_id, system)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS social_links
+                (prospect_id INTEGER NOT NULL REFERENCES prospects(id),
+                 platform TEXT NOT NULL,
+                 url TEXT NOT NULL,
+                 PRIMARY KEY (prospect_id, platform)) WITHOUT ROWID''')
+    # Reverse indexes for filtering prospects by system or platform
+    c.execute("CREATE INDEX IF NOT EXISTS idx_prospect_systems_system ON prospect_systems(system, prospect_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_social_links_platform ON social_links(platform, prospect_id)")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS prospect_links_delete AFTER DELETE ON prospects BEGIN
+                    DELETE FROM prospect_systems WHERE prospect_id = old.id;
+                    DELETE FROM social_links WHERE prospect_id = old.id;
+                 END''')
+
+    existing = {row[1] for row in c.execute("PRAGMA table_info(prospects)")}
+    if 'current_systems' in existing:
+        c.execute('''INSERT OR IGNORE INTO prospect_systems (prospect_id, system)
+                     SELECT p.id, j.value FROM prospects p, json_each(p.current_systems) j
+                     WHERE json_valid(p.current_systems) AND json_type(p.current_systems) = 'array'
+                       AND length(COALESCE(j.value, '')) > 0''')
+    if 'social_media' in existing:
+        c.execute('''INSERT OR IGNORE INTO social_links (prospect_id, platform, url)
+                     SELECT p.id, j.key, j.value FROM prospects p, json_each(p.social_media) j
+                     WHERE json_valid(p.social_media) AND json_type(p.social_media) = 'object'
+                       AND length(COALESCE(j.value, '')) > 0''')
+    for column in LEGACY_JSON_COLUMNS:
+        if column in existing:
+            c.execute(f"ALTER TABLE prospects DROP COLUMN {column}")
+
+def save_links(conn, prospect_id, systems, social_media):
+    """Replace a prospect's systems and social links"""
+    conn.execute("DELETE FROM prospect_systems WHERE prospect_id=?", (prospect_id,))
+    conn.execute("DELETE FROM social_links WHERE prospect_id=?", (prospect_id,))
+    conn.executemany("INSERT OR IGNORE INTO prospect_systems (prospect_id, system) VALUES (?, ?)",
+                     [(prospect_id, system) for system in systems or () if system])
+    conn.executemany("INSERT INTO social_links (prospect_id, platform, url) VALUES (?, ?, ?)",
+                     [(prospect_id, platform, url) for platform, url in (social_media or {}).items() if url])
+
+def load_prospects(conn, rows):
+    """Build Prospect records from PROSPECT_COLUMNS rows, fetching their links in two queries"""
+    prospects = [Prospect(*row) for row in rows]
+    if not prospects:
+        return prospects
+    by_id = {prospect.id: prospect for prospect in prospects}
+    placeholders = ','.join('?' * len(by_id))
+    systems = {}
+    for prospect_id, system in conn.execute(
+            f"SELECT prospect_id, system FROM prospect_systems WHERE prospect_id IN ({placeholders}) "
+            f"ORDER BY prospect_id, system", list(by_id)):
+        systems.setdefault(prospect_id, []).append(system)
+    for prospect_id, values in systems.items():
+        by_id[prospect_id].current_systems = tuple(values)
+    for prospect_id, platform, url in conn.execute(
+            f"SELECT prospect_id, platform, url FROM social_links WHERE prospect_id IN ({placeholders})",
+            list(by_id)):
+        by_id[prospect_id].social_media[platform] = url
+    return prospects
@@ -0,0 +1,127 @@
+"""Incrementally maintained CRM reporting aggregates.
+
+``campaign_stats`` holds sent/bounced/failed/response counts per campaign
+subject, per prospect state and per week (keyed by the Monday the email was
+sent, or queued if it was never sent). ``pipeline_stats`` holds active and
+Do-Not-Contact prospect counts per state. Triggers keep both up to date as rows
+change, so reports read a handful of rows instead of scanning the CRM. An email
+counts towards the state its prospect was in when its status changed;
+``rebuild_stats`` re-attributes everything to the current states.
+"""
+
+# Statuses counted in campaign_stats; each has a column of the same name
+COUNTED_STATUSES = ('sent', 'bounced', 'failed')
+DIMENSIONS = ('subject', 'state', 'week')
+
+def _keys(row):
+    """SQL expressions for the (subject, state, week) keys of an email_campaigns row in a trigger"""
+    return {
+        'subject': f"COALESCE({row}.email_subject, '')",
+        'state': f"COALESCE((SELECT state FROM prospects WHERE id = {row}.prospect_id), '')",
+        'week': f"COALESCE(date(COALESCE({row}.sent_date, {row}.queued_at), '-6 days', 'weekday 1'), '')",
+    }
+
+def _bump(row, column, delta):
+    """Statements adding ``delta`` to ``column`` for every dimension of ``row``"""
+    return '\n'.join(
+        f'''INSERT INTO campaign_stats (dimension, key, {column}) VALUES ('{dimension}', {key}, {delta})
+            ON CONFLICT(dimension, key) DO UPDATE SET {column} = {column} + {delta};'''
+        for dimension, key in _keys(row).items())
+
+def _has_response(row):
+    return f"COALESCE({row}.response, '') != ''"
+
+def _pipeline(row, delta):
+    return f'''INSERT INTO pipeline_stats (state, prospects, do_not_contact)
+               VALUES (COALESCE({row}.state, ''), {delta} * ({row}.removed = 0),
+                       {delta} * ({row}.removed = 0 AND {row}.do_not_contact = 1))
+               ON CONFLICT(state) DO UPDATE SET prospects = prospects + excluded.prospects,
+                                                do_not_contact = do_not_contact + excluded.do_not_contact;'''
+
+def init_stats(c):
+    """Create the aggregate tables and their triggers, filling them from existing rows when new"""
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='campaign_stats'").fetchone()
+    c.execute('''CREATE TABLE IF NOT EXISTS campaign_stats
+                (dimension TEXT NOT NULL,
+                 key TEXT NOT NULL,
+                 sent INTEGER NOT NULL DEFAULT 0,
+                 bounced INTEGER NOT NULL DEFAULT 0,
+                 failed INTEGER NOT NULL DEFAULT 0,
+                 responses INTEGER NOT NULL DEFAULT 0,
+                 PRIMARY KEY (dimension, key)) WITHOUT ROWID''')
+    c.execute('''CREATE TABLE IF NOT EXISTS pipeline_stats
+                (state TEXT PRIMARY KEY,
+                 prospects INTEGER NOT NULL DEFAULT 0,
+                 do_not_contact INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID''')
+
+    for status in COUNTED_STATUSES:
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS campaign_stats_enter_{status}
+                     AFTER UPDATE OF status ON email_campaigns
+                     WHEN new.status = '{status}' AND old.status IS NOT '{status}' BEGIN
+                         {_bump('new', status, 1)}
+                     END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS campaign_stats_leave_{status}
+                     AFTER UPDATE OF status ON email_campaigns
+                     WHEN old.status = '{status}' AND new.status IS NOT '{status}' BEGIN
+                         {_bump('old', status, -1)}
+                     END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS campaign_stats_insert_{status}
+                     AFTER INSERT ON email_campaigns WHEN new.status = '{status}' BEGIN
+                         {_bump('new', status, 1)}
+                     END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS campaign_stats_delete_{status}
+                     AFTER DELETE ON email_campaigns WHEN old.status = '{status}' BEGIN
+                         {_bump('old', status, -1)}
+                     END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS campaign_stats_response
+                 AFTER UPDATE OF response ON email_campaigns
+                 WHEN {_has_response('new')} != {_has_response('old')} BEGIN
+                     {_bump('new', 'responses', f"(CASE WHEN {_has_response('new')} THEN 1 ELSE -1 END)")}
+                 END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS campaign_stats_delete_response
+                 AFTER DELETE ON email_campaigns WHEN {_has_response('old')} BEGIN
+                     {_bump('old', 'responses', -1)}
+                 END''')
+
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS pipeline_stats_insert AFTER INSERT ON prospects BEGIN
+                     {_pipeline('new', 1)}
+                 END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS pipeline_stats_delete AFTER DELETE ON prospects BEGIN
+                     {_pipeline('old', -1)}
+                 END''')
+    c.execute(f'''CREATE TRIGGER IF NOT EXISTS pipeline_stats_update
+                 AFTER UPDATE OF state, removed, do_not_contact ON prospects BEGIN
+                     {_pipeline('old', -1)}
+                     {_pipeline('new', 1)}
+                 END''')
+
+    if not exists:
+        rebuild_stats(c)
+
+def rebuild_stats(c):
+    """Recompute both aggregate tables from scratch, e.g. after editing rows outside the CRM"""
+    c.execute("DELETE FROM campaign_stats")
+    counts = ', '.join(f"SUM(e.status = '{status}')" for status in COUNTED_STATUSES)
+    response = "SUM(COALESCE(e.response, '') != '')"
+    for dimension, key in _keys('e').items():
+        c.execute(f'''INSERT INTO campaign_stats (dimension, key, {', '.join(COUNTED_STATUSES)}, responses)
+                     SELECT '{dimension}', {key}, {counts}, {response}
+                     FROM email_campaigns e GROUP BY 2''')
+    c.execute("DELETE FROM pipeline_stats")
+    c.execute('''INSERT INTO pipeline_stats (state, prospects, do_not_contact)
+                 SELECT COALESCE(state, ''), SUM(removed = 0), SUM(removed = 0 AND do_not_contact = 1)
+                 FROM prospects GROUP BY 1''')
+
+def campaign_stats(conn, dimension, limit=None):
+    """Rows of (key, sent, bounced, failed, responses, response_rate) for one dimension"""
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unknown campaign stats dimension: {dimension}")
+    order = "key DESC" if dimension == 'week' else "sent DESC, key"
+    sql = f'''SELECT key, sent, bounced, failed, responses,
+                     CASE WHEN sent > 0 THEN ROUND(1.0 * responses / sent, 4) ELSE 0 END AS response_rate
+              FROM campaign_stats WHERE dimension = ? ORDER BY {order}'''
+    params = [dimension]
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
@@ -5,215 +5,558 @@ from datetime import datetime
 import json
 from pathlib import Path
 import os
-from search_engine import NonprofitSearchEngine
-import chardet
+import re
+import threading
+from crm_journal import ChangeJournal, CSVCompactor
+from crm_db import CRMDatabase
+from suppression import SuppressionList, normalize_ein
+from crm_mailer import CampaignMailer
+from crm_stats import campaign_stats, init_stats
+from crm_prospects import PROSPECT_COLUMNS, init_link_tables, load_prospects, save_links
+from email_quality import default_filter
+import dataset
+
+# SQL used on every request, kept constant so each pooled connection compiles it once
+INSERT_PROSPECT_SQL = '''INSERT INTO prospects 
+                        (organization_name, ein, contact_name, phone, email, 
+                         city, state, country, website, notes, do_not_contact, removed)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+UPDATE_PROSPECT_SQL = '''UPDATE prospects 
+                        SET organization_name=?, contact_name=?, phone=?, email=?,
+                            city=?, state=?, country=?, website=?,
+                            notes=?, do_not_contact=?, removed=?, updated_at=CURRENT_TIMESTAMP
+                        WHERE id=?'''
+DELETE_PROSPECT_SQL = "DELETE FROM prospects WHERE ein=?"
+
+# Bulk import upsert: imported values fill in or replace CRM fields, but an empty
+# imported value never wipes data entered in the CRM
+UPSERT_PROSPECT_SQL = '''INSERT INTO prospects
+                        (organization_name, ein, contact_name, phone, email,
+                         city, state, country, website, notes, do_not_contact, removed)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0)
+                        ON CONFLICT(ein) DO UPDATE SET
+                            organization_name=COALESCE(NULLIF(excluded.organization_name, ''), organization_name),
+                            contact_name=COALESCE(NULLIF(excluded.contact_name, ''), contact_name),
+                            phone=COALESCE(NULLIF(excluded.phone, ''), phone),
+                            email=COALESCE(NULLIF(excluded.email, ''), email),
+                            city=COALESCE(NULLIF(excluded.city, ''), city),
+                            state=COALESCE(NULLIF(excluded.state, ''), state),
+                            country=COALESCE(NULLIF(excluded.country, ''), country),
+                            website=COALESCE(NULLIF(excluded.website, ''), website),
+                            notes=COALESCE(NULLIF(excluded.notes, ''), notes),
+                            updated_at=CURRENT_TIMESTAMP'''
+IMPORT_FIELDS = ('organization_name', 'ein', 'contact_name', 'phone', 'email',
+                 'city', 'state', 'country', 'website', 'notes')
+IMPORT_CSV_COLUMNS = dict(zip(IMPORT_FIELDS, (
+    'Organization Name', 'EIN', 'Contact Name', 'Phone', 'Email Addresses',
+    'City', 'State', 'Country', 'Website', 'Notes')))
+# Source file columns understood by the bulk importer
+IMPORT_COLUMN_MAP = {
+    'EIN': 'ein', 'Organization Name': 'organization_name', 'Contact Name': 'contact_name',
+    'Phone': 'phone', 'Email Addresses': 'email', 'Email': 'email', 'City': 'city',
+    'State': 'state', 'Country': 'country', 'Website': 'website', 'URL': 'website', 'Notes': 'notes',
+}
+# SQLite's default limit on bound parameters per statement is 999
+SQL_VARIABLE_CHUNK = 900
+
+# Choices offered for a prospect's current systems
+SYSTEM_CHOICES = ["CRM", "ERP", "Accounting", "HR", "Project Management", "Other"]
+
+# Columns added to email_campaigns for the outbound send queue
+CAMPAIGN_QUEUE_COLUMNS = {
+    'recipient': 'TEXT',
+    'attempts': 'INTEGER DEFAULT 0',
+    'next_attempt_at': 'REAL DEFAULT 0',
+    'last_error': 'TEXT',
+    'queued_at': 'TIMESTAMP',
+}
+
+# Columns in the prospects full-text index and their bm25 weights
+FTS_COLUMNS = ('organization_name', 'contact_name', 'city', 'notes', 'email')
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0, 3.0)
+FTS_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+class SearchEngineLoader:
+    """Builds the semantic search engine in a background thread, once per process.
+
+    Importing the model libraries, loading the data and encoding the corpus take
+    a long time, and only the Search page needs them, so nothing is loaded
+    until ``start()`` is first called.
+    """
+
+    STAGES = ("Loading the language model", "Loading nonprofit data", "Encoding nonprofits and building the index")
+
+    _instance = None
+    _instance_guard = threading.Lock()
+
+    def __init__(self, suppression=None):
+        self.suppression = suppression
+        self.engine = None
+        self.stage = 0
+        self.error = None
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, suppression=None):
+        with cls._instance_guard:
+            if cls._instance is None:
+                cls._instance = cls(suppression)
+            return cls._instance
+
+    @property
+    def ready(self):
+        return self.engine is not None
+
+    def start(self):
+        """Start loading if nothing is loaded or loading yet; a failed load stays failed until ``retry``"""
+        with self._lock:
+            if self.ready or self.error is not None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._ready.clear()
+            self._thread = threading.Thread(target=self._load, name="crm-search-loader", daemon=True)
+            self._thread.start()
+
+    def retry(self):
+        """Forget a failed load and start again"""
+        with self._lock:
+            self.error = None
+        self.start()
+
+    def _load(self):
+        try:
+            self.stage = 0
+            from search_engine import NonprofitSearchEngine
+            engine = NonprofitSearchEngine(suppression=self.suppression)
+            self.stage = 1
+            engine.load_data()
+            self.stage = 2
+            engine.build_index()
+            self.engine = engine
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    def wait(self, timeout=None):
+        """Block until loading finishes or ``timeout`` passes; True once the engine is ready"""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def get(self):
+        """The search engine, loading it first if necessary"""
+        self.start()
+        self.wait()
+        if self.error is not None:
+            raise self.error
+        return self.engine
 
 class CRMSystem:
     def __init__(self):
         self.db_path = "crm_database.db"
+        self.db = CRMDatabase.shared(self.db_path)
         self.init_database()
-        self.search_engine = NonprofitSearchEngine()
-        self.search_engine.load_data()
-        self.search_engine.build_index()
+        # Do-Not-Contact index shared with the search engine
+        self.suppression = SuppressionList.shared(self.db_path)
+        # The semantic search engine loads in the background on first use of the Search page
+        self.search_loader = SearchEngineLoader.shared(self.suppression)
+        # Campaign emails are queued here and sent by a background worker
+        self.mailer = CampaignMailer.shared(self.db, self.suppression)
         self.csv_paths = {
             'international': Path("international nonprofits/international_nonprofits_with_emails.csv"),
             'ia': Path("IA nonprofits/ia_nonprofits.csv")
         }
+        # CSV exports are updated from an append-only journal in the background
+        self.journal = ChangeJournal("crm_changes.jsonl")
+        self.compactor = CSVCompactor.shared(self.journal, self.csv_paths.values())
 
     def init_database(self):
         """Initialize SQLite database with required tables"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-
-        # Create prospects table
-        c.execute('''CREATE TABLE IF NOT EXISTS prospects
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     organization_name TEXT,
-                     ein TEXT UNIQUE,
-                     contact_name TEXT,
-                     phone TEXT,
-                     email TEXT,
-                     city TEXT,
-                     state TEXT,
-                     country TEXT,
-                     website TEXT,
-                     current_systems TEXT,
-                     social_media TEXT,
-                     notes TEXT,
-                     do_not_contact INTEGER DEFAULT 0,
-                     removed INTEGER DEFAULT 0,
-                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-
-        # Create email campaigns table
-        c.execute('''CREATE TABLE IF NOT EXISTS email_campaigns
-                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                     prospect_id INTEGER,
-                     email_subject TEXT,
-                     email_content TEXT,
-                     sent_date TIMESTAMP,
-                     status TEXT,
-                     response TEXT,
-                     FOREIGN KEY (prospect_id) REFERENCES prospects(id))''')
-
-        conn.commit()
-        conn.close()
-
-    def detect_encoding(self, file_path):
-        with open(file_path, 'rb') as f:
-            result = chardet.detect(f.read())
-        return result['encoding']
+        with self.db.transaction("init_database") as conn:
+            c = conn.cursor()
+            # Create prospects table
+            c.execute('''CREATE TABLE IF NOT EXISTS prospects
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         organization_name TEXT,
+                         ein TEXT UNIQUE,
+                         contact_name TEXT,
+                         phone TEXT,
+                         email TEXT,
+                         city TEXT,
+                         state TEXT,
+                         country TEXT,
+                         website TEXT,
+                         notes TEXT,
+                         do_not_contact INTEGER DEFAULT 0,
+                         removed INTEGER DEFAULT 0,
+                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+            # Current systems and social links, one row each
+            init_link_tables(c)
+
+            # Create email campaigns table
+            c.execute('''CREATE TABLE IF NOT EXISTS email_campaigns
+                        (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                         prospect_id INTEGER,
+                         email_subject TEXT,
+                         email_content TEXT,
+                         sent_date TIMESTAMP,
+                         status TEXT,
+                         response TEXT,
+                         FOREIGN KEY (prospect_id) REFERENCES prospects(id))''')
+
+            # Outbound queue columns for databases created before the send queue
+            existing = {row[1] for row in c.execute("PRAGMA table_info(email_campaigns)")}
+            for column, definition in CAMPAIGN_QUEUE_COLUMNS.items():
+                if column not in existing:
+                    c.execute(f"ALTER TABLE email_campaigns ADD COLUMN {column} {definition}")
+            if 'recipient' not in existing:
+                c.execute("UPDATE email_campaigns SET status='sent' WHERE status='Sent'")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_email_campaigns_queue ON email_campaigns(status, next_attempt_at)")
+
+            # Indexes for the list filters, keyset pagination and per-prospect campaign lookups
+            c.execute("CREATE INDEX IF NOT EXISTS idx_prospects_removed ON prospects(removed, id)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_prospects_do_not_contact ON prospects(do_not_contact)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_prospects_state ON prospects(state)")
+            c.execute("CREATE INDEX IF NOT EXISTS idx_email_campaigns_prospect_id ON email_campaigns(prospect_id)")
+
+            # Full-text index over prospects, kept in sync by triggers. It is an
+            # external-content table, so the text itself is stored only once.
+            fts_exists = c.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='prospects_fts'").fetchone()
+            columns = ', '.join(FTS_COLUMNS)
+            new_columns = ', '.join(f"new.{col}" for col in FTS_COLUMNS)
+            old_columns = ', '.join(f"old.{col}" for col in FTS_COLUMNS)
+            c.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS prospects_fts USING fts5
+                        ({columns}, content='prospects', content_rowid='id',
+                         tokenize='unicode61 remove_diacritics 2', prefix='2 3')''')
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS prospects_fts_insert AFTER INSERT ON prospects BEGIN
+                            INSERT INTO prospects_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+                         END''')
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS prospects_fts_delete AFTER DELETE ON prospects BEGIN
+                            INSERT INTO prospects_fts(prospects_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                         END''')
+            c.execute(f'''CREATE TRIGGER IF NOT EXISTS prospects_fts_update AFTER UPDATE OF {columns} ON prospects BEGIN
+                            INSERT INTO prospects_fts(prospects_fts, rowid, {columns}) VALUES ('delete', old.id, {old_columns});
+                            INSERT INTO prospects_fts(rowid, {columns}) VALUES (new.id, {new_columns});
+                         END''')
+            if not fts_exists:
+                # Index prospects created before the full-text table existed
+                c.execute("INSERT INTO prospects_fts(prospects_fts) VALUES ('rebuild')")
+
+            # Reporting aggregates maintained by triggers
+            init_stats(c)
+
+    @property
+    def search_engine(self):
+        """The semantic search engine, blocking until it has loaded"""
+        return self.search_loader.get()
+
+    @staticmethod
+    def csv_row(data):
+        """Map CRM prospect fields onto the CSV export columns"""
+        return {
+            'Organization Name': data['organization_name'],
+            'City': data['city'],
+            'State': data['state'],
+            'Country': data['country'],
+            'Website': data['website'],
+            'Email Addresses': data['email'],
+            'Contact Name': data['contact_name'],
+            'Phone': data['phone'],
+            'Current Systems': json.dumps(data['current_systems']),
+            'Social Media': json.dumps(data['social_media']),
+            'Notes': data['notes'],
+            'Do Not Contact': int(data.get('do_not_contact', 0)),
+            'Removed': int(data.get('removed', 0))
+        }
 
     def update_csv(self, data):
-        """Update CSV files with new prospect data"""
-        for csv_path in self.csv_paths.values():
-            if csv_path.exists():
-                try:
-                    encoding = self.detect_encoding(csv_path)
-                    df = pd.read_csv(csv_path, encoding=encoding)
-                    mask = df['EIN'] == data['ein']
-                    # Add new columns if they don't exist
-                    for col in ['Contact Name', 'Phone', 'Current Systems', 'Social Media', 'Notes', 'Do Not Contact', 'Removed']:
-                        if col not in df.columns:
-                            df[col] = ''
-                    if mask.any():
-                        # Update existing row
-                        df.loc[mask, 'Organization Name'] = data['organization_name']
-                        df.loc[mask, 'City'] = data['city']
-                        df.loc[mask, 'State'] = data['state']
-                        df.loc[mask, 'Country'] = data['country']
-                        df.loc[mask, 'Website'] = data['website']
-                        df.loc[mask, 'Email Addresses'] = data['email']
-                        df.loc[mask, 'Contact Name'] = data['contact_name']
-                        df.loc[mask, 'Phone'] = data['phone']
-                        df.loc[mask, 'Current Systems'] = json.dumps(data['current_systems'])
-                        df.loc[mask, 'Social Media'] = json.dumps(data['social_media'])
-                        df.loc[mask, 'Notes'] = data['notes']
-                        df.loc[mask, 'Do Not Contact'] = int(data.get('do_not_contact', 0))
-                        df.loc[mask, 'Removed'] = int(data.get('removed', 0))
-                    else:
-                        new_row = pd.DataFrame({
-                            'EIN': [data['ein']],
-                            'Organization Name': [data['organization_name']],
-                            'City': [data['city']],
-                            'State': [data['state']],
-                            'Country': [data['country']],
-                            'Website': [data['website']],
-                            'Email Addresses': [data['email']],
-                            'Contact Name': [data['contact_name']],
-                            'Phone': [data['phone']],
-                            'Current Systems': [json.dumps(data['current_systems'])],
-                            'Social Media': [json.dumps(data['social_media'])],
-                            'Notes': [data['notes']],
-                            'Do Not Contact': [int(data.get('do_not_contact', 0))],
-                            'Removed': [int(data.get('removed', 0))]
-                        })
-                        df = pd.concat([df, new_row], ignore_index=True)
-                    df.to_csv(csv_path, index=False, encoding=encoding)
-                except Exception as e:
-                    st.error(f"Error updating CSV file {csv_path}: {str(e)}")
+        """Queue a prospect change for the CSV exports.
+
+        The change is appended to the journal and folded into the CSV files by
+        the background compactor, so the exports are eventually consistent.
+        """
+        self.journal.append('upsert', data['ein'], self.csv_row(data))
+        self.compactor.changes_appended()
+
+    def flush_exports(self):
+        """Bring the CSV exports up to date with every journaled change now"""
+        self.compactor.compact()
 
     def add_prospect(self, data):
         """Add a new prospect to the database and update CSV files"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        # Store EINs in the nine-digit form the Do-Not-Contact index uses
+        data = dict(data, ein=normalize_ein(data['ein']))
         try:
-            c.execute('''INSERT INTO prospects 
-                        (organization_name, ein, contact_name, phone, email, 
-                         city, state, country, website, current_systems, 
-                         social_media, notes, do_not_contact, removed)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                     (data['organization_name'], data['ein'], data['contact_name'],
-                      data['phone'], data['email'], data['city'], data['state'],
-                      data['country'], data['website'], json.dumps(data['current_systems']),
-                      json.dumps(data['social_media']), data['notes'],
-                      int(data.get('do_not_contact', 0)), int(data.get('removed', 0))))
-            conn.commit()
-            self.update_csv(data)
-            return True
+            with self.db.transaction("add_prospect") as conn:
+                cursor = conn.execute(INSERT_PROSPECT_SQL,
+                         (data['organization_name'], data['ein'], data['contact_name'],
+                          data['phone'], data['email'], data['city'], data['state'],
+                          data['country'], data['website'], data['notes'],
+                          int(data.get('do_not_contact', 0)), int(data.get('removed', 0))))
+                save_links(conn, cursor.lastrowid, data['current_systems'], data['social_media'])
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
+        if data.get('do_not_contact'):
+            self.suppression.suppress(data['ein'], data['email'], reason='prospect')
+        self.update_csv(data)
+        return True
+
+    @staticmethod
+    def records_from_dataframe(df):
+        """Map a nonprofit CSV/dataset frame onto bulk import records"""
+        columns = {col: field for col, field in IMPORT_COLUMN_MAP.items() if col in df.columns}
+        df = df[list(columns)].rename(columns=columns)
+        df = df.loc[:, ~df.columns.duplicated()]
+        return df.fillna('').astype(str).to_dict('records')
+
+    def bulk_import_prospects(self, records):
+        """Insert or update many prospects in a single transaction.
+
+        Records are dicts with any of IMPORT_FIELDS; ``ein`` is required. Email
+        lists go through email_quality first, so junk addresses are never
+        imported. Rows are upserted with one ``executemany`` on ``ON CONFLICT(ein)``. Returns
+        counts of inserted, updated and skipped records (no EIN, repeated
+        within the batch, or on the Do-Not-Contact list).
+        """
+        rows = {}
+        skipped = 0
+        email_filter = default_filter()
+        for record in records:
+            ein = normalize_ein(record.get('ein'))
+            if not ein or ein in rows or self.suppression.is_ein_suppressed(ein):
+                skipped += 1
+                continue
+            # Scraped lists keep only plausible contacts, best first
+            record = dict(record, email=email_filter.filter_field(str(record.get('email') or ''),
+                                                                  str(record.get('website') or '')))
+            rows[ein] = tuple(str(record.get(field) or '').strip() if field != 'ein' else ein
+                              for field in IMPORT_FIELDS)
+        if not rows:
+            return {'inserted': 0, 'updated': 0, 'skipped': skipped}
+
+        eins = list(rows)
+        with self.db.transaction("bulk_import_prospects") as conn:
+            existing = set()
+            for start in range(0, len(eins), SQL_VARIABLE_CHUNK):
+                chunk = eins[start:start + SQL_VARIABLE_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                existing.update(ein for (ein,) in conn.execute(
+                    f"SELECT ein FROM prospects WHERE ein IN ({placeholders})", chunk))
+            conn.executemany(UPSERT_PROSPECT_SQL, rows.values())
+
+        # One journal write for the whole batch; only non-empty fields reach the CSV exports
+        self.journal.append_many(
+            ('upsert', ein, {IMPORT_CSV_COLUMNS[field]: value for field, value in zip(IMPORT_FIELDS, row)
+                             if value and field != 'ein'})
+            for ein, row in rows.items())
+        self.compactor.changes_appended(len(rows))
+
+        return {'inserted': len(rows) - len(existing), 'updated': len(existing), 'skipped': skipped}
 
     def update_prospect(self, prospect_id, data):
         """Update prospect information in database and CSV files"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
         try:
-            c.execute('''UPDATE prospects 
-                        SET organization_name=?, contact_name=?, phone=?, email=?,
-                            city=?, state=?, country=?, website=?, current_systems=?,
-                            social_media=?, notes=?, do_not_contact=?, removed=?, updated_at=CURRENT_TIMESTAMP
-                        WHERE id=?''',
-                     (data['organization_name'], data['contact_name'], data['phone'],
-                      data['email'], data['city'], data['state'], data['country'],
-                      data['website'], json.dumps(data['current_systems']),
-                      json.dumps(data['social_media']), data['notes'],
-                      int(data.get('do_not_contact', 0)), int(data.get('removed', 0)), prospect_id))
-            conn.commit()
-            self.update_csv(data)
-            return True
+            with self.db.transaction("update_prospect") as conn:
+                conn.execute(UPDATE_PROSPECT_SQL,
+                         (data['organization_name'], data['contact_name'], data['phone'],
+                          data['email'], data['city'], data['state'], data['country'],
+                          data['website'], data['notes'],
+                          int(data.get('do_not_contact', 0)), int(data.get('removed', 0)), prospect_id))
+                save_links(conn, prospect_id, data['current_systems'], data['social_media'])
         except Exception as e:
             st.error(f"Error updating prospect: {str(e)}")
             return False
-        finally:
-            conn.close()
+        if data.get('do_not_contact'):
+            self.suppression.suppress(data['ein'], data['email'], reason='prospect')
+        elif self.suppression.is_suppressed(data['ein'], data['email']):
+            self.suppression.unsuppress(data['ein'], data['email'])
+        self.update_csv(data)
+        return True
+
+    def suppress_contact(self, ein, emails=(), reason='search'):
+        """Put an organization on the Do-Not-Contact list and flag it in the CRM if it is a prospect"""
+        self.suppression.suppress(ein, emails, reason=reason)
+        with self.db.transaction("suppress_contact") as conn:
+            conn.execute("UPDATE prospects SET do_not_contact=1, updated_at=CURRENT_TIMESTAMP WHERE ein=?",
+                         (str(ein),))
 
     def add_email_campaign(self, prospect_id, subject, content):
-        """Add a new email campaign entry"""
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        
-        c.execute('''INSERT INTO email_campaigns 
-                    (prospect_id, email_subject, email_content, sent_date, status)
-                    VALUES (?, ?, ?, CURRENT_TIMESTAMP, 'Sent')''',
-                 (prospect_id, subject, content))
-        
-        conn.commit()
-        conn.close()
+        """Queue a campaign email to one prospect, refusing prospects on the Do-Not-Contact list"""
+        return self.queue_campaign(subject, content, prospect_ids=[prospect_id])['queued'] == 1
+
+    def queue_campaign(self, subject, content, prospect_ids=None, state=None):
+        """Queue a campaign email to many prospects without waiting for it to be sent.
+
+        Targets the given prospects, or every active prospect (optionally in one
+        state). Prospects without an email address or on the Do-Not-Contact
+        list are skipped. Returns counts of queued and skipped prospects.
+        """
+        where, params = ["removed = 0"], []
+        if prospect_ids is not None:
+            where.append(f"id IN ({','.join('?' * len(prospect_ids))})")
+            params.extend(int(prospect_id) for prospect_id in prospect_ids)
+        if state:
+            where.append("state = ?")
+            params.append(state)
+        with self.db.connection("queue_campaign_targets") as conn:
+            targets = conn.execute(f"SELECT id, ein, email, do_not_contact FROM prospects WHERE {' AND '.join(where)}",
+                                   params).fetchall()
+
+        rows = []
+        for prospect_id, ein, email, do_not_contact in targets:
+            if do_not_contact or self.suppression.is_ein_suppressed(ein):
+                continue
+            # Send to the first address that is not suppressed
+            recipients = self.suppression.filter_emails(email)
+            if recipients:
+                rows.append((prospect_id, recipients[0], subject, content))
+        queued = self.mailer.enqueue(rows)
+        skipped = len(targets) - queued
+        if prospect_ids is not None and skipped:
+            st.warning(f"{skipped} prospect(s) skipped: no email address or on the Do-Not-Contact list.")
+        return {'queued': queued, 'skipped': skipped}
 
     def get_prospects(self, include_removed=False):
         """Get all prospects, optionally including removed ones"""
-        conn = sqlite3.connect(self.db_path)
-        if include_removed:
-            df = pd.read_sql_query("SELECT * FROM prospects", conn)
-        else:
-            df = pd.read_sql_query("SELECT * FROM prospects WHERE removed=0", conn)
-        conn.close()
-        return df
+        with self.db.connection("get_prospects") as conn:
+            if include_removed:
+                return pd.read_sql_query("SELECT * FROM prospects", conn)
+            return pd.read_sql_query("SELECT * FROM prospects WHERE removed=0", conn)
+
+    def get_prospects_page(self, after_id=None, limit=50, include_removed=False, state=None,
+                           system=None, platform=None):
+        """Get one page of prospects ordered by id, starting after ``after_id``.
+
+        Keyset pagination: the cost of a page does not grow with how far into
+        the list it is. ``system`` and ``platform`` keep prospects using that
+        system or with a link on that social platform. Returns a list of
+        Prospect records and the cursor for the next page, or None when this
+        is the last page.
+        """
+        where, params = ["id > ?"], [after_id or 0]
+        if not include_removed:
+            where.append("removed = 0")
+        if state:
+            where.append("state = ?")
+            params.append(state)
+        if system:
+            where.append("id IN (SELECT prospect_id FROM prospect_systems WHERE system = ?)")
+            params.append(system)
+        if platform:
+            where.append("id IN (SELECT prospect_id FROM social_links WHERE platform = ?)")
+            params.append(platform)
+        # Fetch one extra row to learn whether there is a next page
+        params.append(limit + 1)
+        sql = f"SELECT {', '.join(PROSPECT_COLUMNS)} FROM prospects WHERE {' AND '.join(where)} ORDER BY id LIMIT ?"
+
+        with self.db.connection("get_prospects_page") as conn:
+            rows = conn.execute(sql, params).fetchall()
+            prospects = load_prospects(conn, rows[:limit])
+        next_cursor = prospects[-1].id if len(rows) > limit else None
+        return prospects, next_cursor
+
+    def get_prospect_filters(self):
+        """Systems and social platforms in use, for the list filters"""
+        with self.db.connection("get_prospect_filters") as conn:
+            systems = [row[0] for row in conn.execute("SELECT DISTINCT system FROM prospect_systems ORDER BY system")]
+            platforms = [row[0] for row in conn.execute("SELECT DISTINCT platform FROM social_links ORDER BY platform")]
+        return systems, platforms
+
+    @staticmethod
+    def fts_query(text):
+        """Turn free text into an FTS5 query: every word must match, the last one as a prefix"""
+        words = FTS_TOKEN.findall(text)
+        if not words:
+            return None
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search_prospects(self, query, offset=0, limit=50, include_removed=False, system=None, platform=None):
+        """Full-text search over prospect names, contacts, cities, notes and emails.
+
+        Results are ranked by bm25, with matches in the organization name
+        weighted highest. Returns a list of Prospect records and the offset of
+        the next page, or None when this is the last page.
+        """
+        match = self.fts_query(query)
+        if match is None:
+            return [], None
+
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        where, params = ["prospects_fts MATCH ?"], [match]
+        if not include_removed:
+            where.append("p.removed = 0")
+        if system:
+            where.append("p.id IN (SELECT prospect_id FROM prospect_systems WHERE system = ?)")
+            params.append(system)
+        if platform:
+            where.append("p.id IN (SELECT prospect_id FROM social_links WHERE platform = ?)")
+            params.append(platform)
+        sql = f'''SELECT {', '.join(f"p.{col}" for col in PROSPECT_COLUMNS)}
+                  FROM prospects_fts JOIN prospects p ON p.id = prospects_fts.rowid
+                  WHERE {' AND '.join(where)}
+                  ORDER BY bm25(prospects_fts, {weights}), p.id
+                  LIMIT ? OFFSET ?'''
+        # Fetch one extra row to learn whether there is a next page
+        params.extend([limit + 1, offset])
+        with self.db.connection("search_prospects") as conn:
+            rows = conn.execute(sql, params).fetchall()
+            prospects = load_prospects(conn, rows[:limit])
+        next_offset = offset + limit if len(rows) > limit else None
+        return prospects, next_offset
+
+    def count_prospects(self, include_removed=False, state=None):
+        """Count prospects using the removed/state indexes"""
+        where, params = ["1=1"], []
+        if not include_removed:
+            where.append("removed = 0")
+        if state:
+            where.append("state = ?")
+            params.append(state)
+        with self.db.connection("count_prospects") as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM prospects WHERE {' AND '.join(where)}", params).fetchone()[0]
+
+    def record_response(self, campaign_id, response):
+        """Record a prospect's reply to a campaign email"""
+        with self.db.transaction("record_response") as conn:
+            return conn.execute("UPDATE email_campaigns SET response=? WHERE id=?",
+                                (response, campaign_id)).rowcount == 1
+
+    def get_campaign_stats(self, dimension, limit=None):
+        """Sends, bounces, failures and responses per subject, state or week from the aggregate table"""
+        with self.db.connection("get_campaign_stats") as conn:
+            rows = campaign_stats(conn, dimension, limit)
+        return pd.DataFrame(rows, columns=[dimension, 'sent', 'bounced', 'failed', 'responses', 'response_rate'])
+
+    def get_pipeline_stats(self):
+        """Active and Do-Not-Contact prospects per state from the aggregate table"""
+        with self.db.connection("get_pipeline_stats") as conn:
+            return pd.read_sql_query('''SELECT state, prospects, do_not_contact FROM pipeline_stats
+                                         WHERE prospects > 0 ORDER BY prospects DESC''', conn)
 
     def get_email_campaigns(self, prospect_id=None):
         """Get email campaigns, optionally filtered by prospect"""
-        conn = sqlite3.connect(self.db_path)
-        if prospect_id:
-            df = pd.read_sql_query(
-                "SELECT * FROM email_campaigns WHERE prospect_id = ?", 
-                conn, params=[prospect_id]
-            )
-        else:
-            df = pd.read_sql_query("SELECT * FROM email_campaigns", conn)
-        conn.close()
-        return df
+        with self.db.connection("get_email_campaigns") as conn:
+            if prospect_id:
+                return pd.read_sql_query(
+                    "SELECT * FROM email_campaigns WHERE prospect_id = ?", 
+                    conn, params=[prospect_id]
+                )
+            return pd.read_sql_query("SELECT * FROM email_campaigns", conn)
 
     def delete_prospect(self, ein):
         """Permanently delete a prospect from both the database and CSV by EIN"""
         # Delete from DB
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("DELETE FROM prospects WHERE ein=?", (ein,))
-        conn.commit()
-        conn.close()
-        # Delete from CSVs
-        for csv_path in self.csv_paths.values():
-            if csv_path.exists():
-                try:
-                    encoding = self.detect_encoding(csv_path)
-                    df = pd.read_csv(csv_path, encoding=encoding)
-                    df = df[df['EIN'] != ein]
-                    df.to_csv(csv_path, index=False, encoding=encoding)
-                except Exception as e:
-                    st.error(f"Error deleting from CSV file {csv_path}: {str(e)}")
+        with self.db.transaction("delete_prospect") as conn:
+            conn.execute(DELETE_PROSPECT_SQL, (ein,))
+        # Delete from CSVs on the next compaction
+        self.journal.append('delete', ein)
+        self.compactor.changes_appended()
 
 def main():
     st.set_page_config(page_title="One Kind Network CRM", layout="wide")
@@ -224,14 +567,43 @@ def main():
 
     # Sidebar navigation
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Search Prospects", "Add Prospect", "View Prospects"])
+    page = st.sidebar.radio("Go to", ["Search Prospects", "Add Prospect", "Bulk Import", "View Prospects", "Campaigns", "Dashboard"])
+
+    with st.sidebar.expander("Database latency"):
+        stats = st.session_state.crm.db.stats()
+        if stats:
+            st.dataframe(pd.DataFrame.from_dict(stats, orient='index'))
+        else:
+            st.caption("No database operations yet.")
 
     if page == "Search Prospects":
         st.title("Search Prospects")
+        loader = st.session_state.crm.search_loader
+        loader.start()
+        if loader.error is not None:
+            st.error(f"Error loading the search engine: {loader.error}")
+            if st.button("Retry"):
+                loader.retry()
+                st.rerun()
+            st.stop()
+        if not loader.ready:
+            # Other pages stay usable while the index builds; this page polls until it is ready
+            st.progress(loader.stage / len(loader.STAGES), text=f"{loader.STAGES[loader.stage]}...")
+            loader.wait(timeout=1.0)
+            st.rerun()
+
         query = st.text_input("Search for prospects:", "")
+        num_results = st.slider("Number of results", 10, 200, 10, step=10)
         
         if query:
-            results = st.session_state.crm.search_engine.search(query)
+            results = loader.engine.search(query, k=num_results)
+
+            # Bulk add: tick results, then import them in one transaction
+            selected = [row for idx, row in results.iterrows() if st.session_state.get(f"select_{row['EIN']}_{idx}")]
+            if st.button(f"Add {len(selected)} selected to CRM", disabled=not selected):
+                counts = st.session_state.crm.bulk_import_prospects(
+                    CRMSystem.records_from_dataframe(pd.DataFrame(selected)))
+                st.success(f"Imported: {counts['inserted']} new, {counts['updated']} updated, {counts['skipped']} skipped.")
             
             for idx, row in results.iterrows():
                 with st.expander(f"{row['Organization Name']} (Score: {row['similarity_score']:.2f})"):
@@ -241,11 +613,12 @@ def main():
                         st.write(f"**Website:** {row['Website']}")
                     if row['Email Addresses']:
                         st.write(f"**Email:** {row['Email Addresses']}")
+                    st.checkbox("Select for bulk add", key=f"select_{row['EIN']}_{idx}")
                     dnc = st.checkbox("Do Not Contact", key=f"dnc_{row['EIN']}_{idx}")
                     if st.button("Add to CRM", key=f"add_{row['EIN']}"):
                         if dnc:
-                            st.session_state.crm.delete_prospect(row['EIN'])
-                            st.success("Prospect permanently deleted as DNC (Do Not Contact compliance).")
+                            st.session_state.crm.suppress_contact(row['EIN'], row['Email Addresses'])
+                            st.success("Added to the Do-Not-Contact list; it will no longer appear in searches or campaigns.")
                             st.rerun()
                         else:
                             prospect_data = {
@@ -286,7 +659,7 @@ def main():
                 website = st.text_input("Website")
             current_systems = st.multiselect(
                 "Current Systems",
-                ["CRM", "ERP", "Accounting", "HR", "Project Management", "Other"]
+                SYSTEM_CHOICES
             )
             social_media = {}
             st.subheader("Social Media")
@@ -321,32 +694,66 @@ def main():
                 else:
                     st.error("Prospect with this EIN already exists!")
 
+    elif page == "Bulk Import":
+        st.title("Bulk Import Prospects")
+        crm = st.session_state.crm
+        source = st.radio("Import from", ["CSV file", "State file"], horizontal=True)
+        records = None
+        if source == "CSV file":
+            st.caption("Columns used: " + ", ".join(sorted(IMPORT_COLUMN_MAP)) + ". EIN is required.")
+            uploaded = st.file_uploader("CSV file", type=["csv"])
+            if uploaded is not None:
+                df = pd.read_csv(uploaded, dtype=str, keep_default_na=False, encoding_errors='replace')
+                st.write(f"{len(df)} rows, columns: {', '.join(df.columns)}")
+                records = CRMSystem.records_from_dataframe(df)
+        else:
+            if dataset.dataset_available():
+                locations = sorted(dataset.load_manifest()['locations'])
+                location = st.selectbox("State or territory", locations)
+                if location:
+                    records = CRMSystem.records_from_dataframe(dataset.load_dataset(locations=[location]))
+            else:
+                files = sorted(Path("nonprofit by state").glob("nonprofits_*.csv"))
+                state_file = st.selectbox("State file", files, format_func=lambda path: path.name)
+                if state_file:
+                    records = CRMSystem.records_from_dataframe(pd.read_csv(state_file, dtype=str, keep_default_na=False))
+            if records is not None:
+                st.write(f"{len(records)} nonprofits")
+        if records and st.button(f"Import {len(records)} prospects"):
+            with st.spinner("Importing..."):
+                counts = crm.bulk_import_prospects(records)
+            st.success(f"Imported: {counts['inserted']} new, {counts['updated']} updated, {counts['skipped']} skipped.")
+
     elif page == "View Prospects":
         st.title("View Prospects")
-        prospects = st.session_state.crm.get_prospects()
-        if not prospects.empty:
+        crm = st.session_state.crm
+        # Stack of keyset cursors: the last entry is where the current page starts
+        if 'prospect_cursors' not in st.session_state:
+            st.session_state.prospect_cursors = [None]
+        total = crm.count_prospects()
+        if total:
             if 'edit_prospect' in st.session_state and st.session_state.edit_prospect is not None:
                 prospect = st.session_state.edit_prospect
-                st.subheader(f"Edit Prospect: {prospect['organization_name']}")
+                st.subheader(f"Edit Prospect: {prospect.organization_name}")
                 with st.form("edit_prospect_form"):
                     col1, col2 = st.columns(2)
                     with col1:
-                        organization_name = st.text_input("Organization Name", value=prospect['organization_name'])
-                        ein = st.text_input("EIN", value=prospect['ein'], disabled=True)
-                        contact_name = st.text_input("Contact Name", value=prospect['contact_name'])
-                        phone = st.text_input("Phone", value=prospect['phone'])
-                        email = st.text_input("Email", value=prospect['email'])
+                        organization_name = st.text_input("Organization Name", value=prospect.organization_name)
+                        ein = st.text_input("EIN", value=prospect.ein, disabled=True)
+                        contact_name = st.text_input("Contact Name", value=prospect.contact_name)
+                        phone = st.text_input("Phone", value=prospect.phone)
+                        email = st.text_input("Email", value=prospect.email)
                     with col2:
-                        city = st.text_input("City", value=prospect['city'])
-                        state = st.text_input("State", value=prospect['state'])
-                        country = st.text_input("Country", value=prospect['country'])
-                        website = st.text_input("Website", value=prospect['website'])
+                        city = st.text_input("City", value=prospect.city)
+                        state = st.text_input("State", value=prospect.state)
+                        country = st.text_input("Country", value=prospect.country)
+                        website = st.text_input("Website", value=prospect.website)
                     current_systems = st.multiselect(
                         "Current Systems",
-                        ["CRM", "ERP", "Accounting", "HR", "Project Management", "Other"],
-                        default=json.loads(prospect['current_systems']) if prospect['current_systems'] else []
+                        SYSTEM_CHOICES + [system for system in prospect.current_systems if system not in SYSTEM_CHOICES],
+                        default=list(prospect.current_systems)
                     )
-                    social_media = json.loads(prospect['social_media']) if prospect['social_media'] else {}
+                    social_media = prospect.social_media
                     st.subheader("Social Media")
                     col1, col2 = st.columns(2)
                     with col1:
@@ -355,8 +762,8 @@ def main():
                     with col2:
                         facebook = st.text_input("Facebook", value=social_media.get('facebook', ''))
                         instagram = st.text_input("Instagram", value=social_media.get('instagram', ''))
-                    notes = st.text_area("Notes", value=prospect['notes'])
-                    do_not_contact = st.checkbox("Do Not Contact", value=bool(prospect.get('do_not_contact', 0)))
+                    notes = st.text_area("Notes", value=prospect.notes)
+                    do_not_contact = st.checkbox("Do Not Contact", value=bool(prospect.do_not_contact))
                     if st.form_submit_button("Save Changes"):
                         updated_data = {
                             'organization_name': organization_name,
@@ -370,6 +777,7 @@ def main():
                             'website': website,
                             'current_systems': current_systems,
                             'social_media': {
+                                **social_media,
                                 'linkedin': linkedin,
                                 'twitter': twitter,
                                 'facebook': facebook,
@@ -379,7 +787,7 @@ def main():
                             'do_not_contact': int(do_not_contact),
                             'removed': 0
                         }
-                        st.session_state.crm.update_prospect(prospect['id'], updated_data)
+                        st.session_state.crm.update_prospect(prospect.id, updated_data)
                         st.success("Prospect updated successfully!")
                         st.session_state.edit_prospect = None
                         st.rerun()
@@ -387,37 +795,136 @@ def main():
                     st.session_state.edit_prospect = None
                     st.rerun()
             else:
-                for _, prospect in prospects.iterrows():
-                    with st.expander(f"{prospect['organization_name']}"):
+                search_query = st.text_input("Search prospects and notes", key="prospect_search")
+                systems, platforms = crm.get_prospect_filters()
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    system = st.selectbox("Uses system", ["Any"] + systems)
+                with col2:
+                    platform = st.selectbox("Has social link", ["Any"] + platforms)
+                with col3:
+                    page_size = st.selectbox("Prospects per page", [25, 50, 100], index=1)
+                system = None if system == "Any" else system
+                platform = None if platform == "Any" else platform
+                # A new query, filter or page size starts again from the first page
+                list_key = (search_query, system, platform, page_size)
+                if st.session_state.get('prospect_list_key') != list_key:
+                    st.session_state.prospect_list_key = list_key
+                    st.session_state.prospect_cursors = [None]
+                cursors = st.session_state.prospect_cursors
+                if search_query.strip():
+                    prospects, next_cursor = crm.search_prospects(search_query, offset=cursors[-1] or 0, limit=page_size,
+                                                                  system=system, platform=platform)
+                    st.caption(f"Page {len(cursors)} · matches for \"{search_query}\"")
+                else:
+                    prospects, next_cursor = crm.get_prospects_page(after_id=cursors[-1], limit=page_size,
+                                                                    system=system, platform=platform)
+                    st.caption(f"Page {len(cursors)} · {total} prospects")
+                col1, col2 = st.columns(2)
+                with col1:
+                    if st.button("Previous page", disabled=len(cursors) == 1):
+                        cursors.pop()
+                        st.rerun()
+                with col2:
+                    if st.button("Next page", disabled=next_cursor is None):
+                        cursors.append(next_cursor)
+                        st.rerun()
+                for prospect in prospects:
+                    with st.expander(f"{prospect.organization_name}"):
                         col1, col2 = st.columns(2)
                         with col1:
-                            st.write(f"**Contact:** {prospect['contact_name']}")
-                            st.write(f"**Phone:** {prospect['phone']}")
-                            st.write(f"**Email:** {prospect['email']}")
-                            st.write(f"**Location:** {prospect['city']}, {prospect['state']}, {prospect['country']}")
+                            st.write(f"**Contact:** {prospect.contact_name}")
+                            st.write(f"**Phone:** {prospect.phone}")
+                            st.write(f"**Email:** {prospect.email}")
+                            st.write(f"**Location:** {prospect.city}, {prospect.state}, {prospect.country}")
                         with col2:
-                            st.write(f"**Website:** {prospect['website']}")
-                            st.write(f"**Current Systems:** {', '.join(json.loads(prospect['current_systems']))}")
-                            social_media = json.loads(prospect['social_media'])
+                            st.write(f"**Website:** {prospect.website}")
+                            st.write(f"**Current Systems:** {', '.join(prospect.current_systems)}")
                             st.write("**Social Media:**")
-                            for platform, url in social_media.items():
+                            for platform, url in prospect.social_media.items():
                                 if url:
                                     st.write(f"- {platform}: {url}")
-                        st.write(f"**Notes:** {prospect['notes']}")
-                        if prospect.get('do_not_contact', 0):
+                        st.write(f"**Notes:** {prospect.notes}")
+                        if prospect.do_not_contact:
                             st.markdown('<span style="color:red;font-weight:bold;">DO NOT CONTACT</span>', unsafe_allow_html=True)
-                        if st.button("Edit", key=f"edit_{prospect['id']}"):
+                        if st.button("Edit", key=f"edit_{prospect.id}"):
                             st.session_state.edit_prospect = prospect
                             st.rerun()
                         # Soft remove: hide from Prospects but retain in DB/CSV
-                        if st.button("Remove from Prospects", key=f"remove_{prospect['id']}"):
-                            updated_data = dict(prospect)
+                        if st.button("Remove from Prospects", key=f"remove_{prospect.id}"):
+                            updated_data = prospect.to_dict()
                             updated_data['removed'] = 1
-                            st.session_state.crm.update_prospect(prospect['id'], updated_data)
+                            st.session_state.crm.update_prospect(prospect.id, updated_data)
                             st.success("Prospect removed from prospects (data retained in DB and CSV).")
                             st.rerun()
         else:
             st.info("No prospects found in the database.")
 
+    elif page == "Campaigns":
+        st.title("Campaigns")
+        crm = st.session_state.crm
+        with st.form("queue_campaign_form"):
+            subject = st.text_input("Subject")
+            content = st.text_area("Message")
+            state = st.text_input("Only prospects in state (optional)")
+            if st.form_submit_button("Queue campaign"):
+                if subject and content:
+                    counts = crm.queue_campaign(subject, content, state=state.strip().upper() or None)
+                    st.success(f"Queued {counts['queued']} emails ({counts['skipped']} prospects skipped).")
+                else:
+                    st.error("Subject and message are required!")
+
+        st.subheader("Send queue")
+        counts = crm.mailer.status_counts()
+        columns = st.columns(5)
+        for column, status in zip(columns, ['queued', 'sending', 'sent', 'bounced', 'failed']):
+            column.metric(status.title(), counts.get(status, 0))
+        if counts.get('failed') and st.button("Retry failed"):
+            st.success(f"Re-queued {crm.mailer.retry_failed()} emails.")
+            st.rerun()
+        with crm.db.connection("recent_campaign_problems") as conn:
+            problems = pd.read_sql_query('''SELECT id, recipient, email_subject, status, attempts, last_error
+                                            FROM email_campaigns WHERE status IN ('failed', 'bounced')
+                                            ORDER BY id DESC LIMIT 50''', conn)
+        if not problems.empty:
+            st.write("**Recent failures and bounces**")
+            st.dataframe(problems)
+
+        st.subheader("Record a response")
+        with st.form("record_response_form"):
+            campaign_id = st.number_input("Campaign email ID", min_value=1, step=1)
+            response = st.text_area("Response")
+            if st.form_submit_button("Save response"):
+                if response and crm.record_response(int(campaign_id), response):
+                    st.success("Response recorded!")
+                else:
+                    st.error("No campaign email with that ID, or the response is empty.")
+
+    elif page == "Dashboard":
+        st.title("Dashboard")
+        crm = st.session_state.crm
+        # Everything here comes from the trigger-maintained aggregate tables
+        pipeline = crm.get_pipeline_stats()
+        weeks = crm.get_campaign_stats('week', limit=26)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Active prospects", int(pipeline['prospects'].sum()))
+        sent, responses = int(weeks['sent'].sum()), int(weeks['responses'].sum())
+        col2.metric("Emails sent (26 weeks)", sent)
+        col3.metric("Response rate (26 weeks)", f"{responses / sent:.1%}" if sent else "–")
+
+        st.subheader("By week")
+        if not weeks.empty:
+            st.line_chart(weeks.set_index('week').sort_index()[['sent', 'responses']])
+        st.dataframe(weeks)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("By campaign")
+            st.dataframe(crm.get_campaign_stats('subject', limit=50))
+        with col2:
+            st.subheader("By state")
+            st.dataframe(crm.get_campaign_stats('state', limit=60))
+        st.subheader("Pipeline by state")
+        st.dataframe(pipeline)
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+
+# Versioned, normalized nonprofit dataset written by ingest.py
+DATASET_ROOT = Path(__file__).resolve().parent / "data" / "nonprofits"
+DATASET_FILE = "nonprofits.parquet"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+SCHEMA_VERSION = 1
+
+# Normalized schema. Location is the shard a record belongs to: a two-letter
+# state/territory code from the state files, or INT for international records.
+COLUMNS = [
+    'EIN', 'Organization Name', 'City', 'State', 'Country', 'PC',
+    'Website', 'Email Addresses', 'Location', 'Sources',
+]
+
+def current_version(root=DATASET_ROOT):
+    """Return the version id the CURRENT pointer names, or None if nothing was ingested"""
+    pointer = Path(root) / CURRENT_FILE
+    if not pointer.exists():
+        return None
+    version = pointer.read_text().strip()
+    return version if (Path(root) / version / DATASET_FILE).exists() else None
+
+def dataset_available(root=DATASET_ROOT):
+    return current_version(root) is not None
+
+def load_manifest(version=None, root=DATASET_ROOT):
+    """Load the manifest for a version (the current one by default)"""
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No dataset found under {root}; run `python ingest.py` first")
+    with open(Path(root) / version / MANIFEST_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def load_dataset(columns=None, locations=None, version=None, root=DATASET_ROOT):
+    """Load the normalized dataset as a DataFrame.
+
+    ``columns`` projects the read to just those columns and ``locations``
+    keeps only records in the given Location shards, both pushed down to
+    the Parquet reader so unused data is never decoded.
+    """
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No dataset found under {root}; run `python ingest.py` first")
+    filters = [('Location', 'in', list(locations))] if locations else None
+    df = pd.read_parquet(Path(root) / version / DATASET_FILE, columns=columns, filters=filters)
+    return df.fillna('')
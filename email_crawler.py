@@ -1,15 +1,30 @@
+import argparse
+import asyncio
 import csv
+import glob
+import hashlib
+import multiprocessing
 import re
 import time
-import random
-import requests
-from bs4 import BeautifulSoup
+import chardet
+import lxml.html
+from lxml.etree import ParserError
 from fake_useragent import UserAgent
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
 from datetime import datetime
 from urllib.parse import urlparse, urljoin
 import os
-import shutil
+from crawl_frontier import DEFAULT_PAGE_BUDGET, ContactFrontier, link_score
+from crawl_journal import CrawlJournal
+from crawl_metrics import CrawlMetrics
+from crawl_scheduler import ROBOTS_TTL, HostScheduler, robots_url
+from email_quality import EmailFilter, MXChecker
+from crawl_cache import DEFAULT_CACHE_DIR, ResponseCache
+from crawl_http import DEFAULT_MAX_BYTES, FetchError, HTTPClient, create_requests_session, fetch
+from suppression import load_suppression
 
 # Configure logging
 logging.basicConfig(
@@ -21,21 +36,185 @@ logging.basicConfig(
     ]
 )
 
+# Files crawled when none are given; files without a URL column are skipped
+REPO_ROOT = Path(__file__).resolve().parent
+DEFAULT_INPUTS = tuple(str(REPO_ROOT / pattern) for pattern in (
+    'international nonprofits/international_nonprofits.csv',
+    'IA nonprofits/nonprofits_IA_with_websites.csv',
+    'nonprofit by state/nonprofits_*.csv'))
+URL_COLUMNS = ('Website', 'URL')
+OUTPUT_SUFFIX = '_with_emails.csv'
+DEFAULT_STATE_DIR = 'crawl_state'
+
+EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+# An address this plausible (a role address on the site's own domain) ends the site's crawl
+CONFIDENT_SCORE = 0.9
+# Requests per page when a host answers 429/503, each after the scheduler's backoff
+MAX_ATTEMPTS = 3
+HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+def is_valid_url(url):
+    """Check if the URL is valid"""
+    try:
+        result = urlparse(url)
+        return all([result.scheme, result.netloc])
+    except ValueError:
+        return False
+
+def detect_encoding(path):
+    """UTF-8 when the file decodes cleanly, otherwise chardet's guess"""
+    raw = Path(path).read_bytes()
+    try:
+        raw.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return chardet.detect(raw)['encoding']
+
+def normalize_url(value):
+    """A website cell as a crawlable URL, adding https:// to bare domains"""
+    url = (value or '').strip()
+    if url and not url.startswith(('http://', 'https://')) and '.' in url:
+        url = 'https://' + url
+    return url
+
+def shard_of(url, shards):
+    """Stable shard number for a URL's domain, the same in every process and on every machine"""
+    host = urlparse(url).netloc.lower().split(':')[0]
+    if host.startswith('www.'):
+        host = host[4:]
+    return int.from_bytes(hashlib.blake2b(host.encode(), digest_size=8).digest(), 'big') % shards
+
+@dataclass
+class CrawlSource:
+    """One input CSV, the columns holding its URLs and EINs, and where its results go"""
+    path: Path
+    output: Path
+    url_column: str
+    ein_column: str = None
+    _encoding: str = field(default=None, repr=False)
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            self._encoding = detect_encoding(self.path)
+        return self._encoding
+
+    def rows(self):
+        """The header, then each data row"""
+        with open(self.path, 'r', newline='', encoding=self.encoding) as f:
+            yield from csv.reader(f)
+
+    def urls(self, suppression=None):
+        """Crawlable URLs in file order, leaving out Do-Not-Contact organizations"""
+        rows = self.rows()
+        header = next(rows, [])
+        url_index = header.index(self.url_column)
+        ein_index = header.index(self.ein_column) if self.ein_column in header else None
+        for row in rows:
+            if len(row) <= url_index:
+                continue
+            if suppression and ein_index is not None and suppression.is_ein_suppressed(row[ein_index]):
+                continue
+            url = normalize_url(row[url_index])
+            if url:
+                yield url
+
+def discover_sources(patterns, output_dir=None, url_column=None, ein_column='EIN'):
+    """Expand input files/globs into CrawlSources, skipping earlier outputs and files without URLs"""
+    sources, seen, skipped = [], set(), []
+    for pattern in patterns:
+        for name in sorted(glob.glob(pattern)) or [pattern]:
+            path = Path(name)
+            if path in seen or path.name.endswith((OUTPUT_SUFFIX, '_backup.csv')) or not path.is_file():
+                continue
+            seen.add(path)
+            with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+                header = next(csv.reader(f), [])
+            column = url_column if url_column else next((c for c in URL_COLUMNS if c in header), None)
+            if column not in header:
+                skipped.append(path.name)
+                continue
+            output = Path(output_dir or path.parent) / f"{path.stem}{OUTPUT_SUFFIX}"
+            sources.append(CrawlSource(path, output, column, ein_column))
+    if skipped:
+        logging.info(f"Skipping {len(skipped)} file(s) without a URL column: {', '.join(skipped[:10])}"
+                     f"{' ...' if len(skipped) > 10 else ''}")
+    return sources
+
+def journal_paths(state_dir):
+    """Every shard's crawl journal in ``state_dir``"""
+    return sorted(Path(state_dir).glob('*_crawl.jsonl'))
+
+def unique_urls(sources, suppression=None, shard=None):
+    """URLs across all sources, each once, optionally only those in shard (index, count)"""
+    urls = {}
+    for source in sources:
+        for url in source.urls(suppression):
+            urls.setdefault(url, None)
+    if shard:
+        index, count = shard
+        return [url for url in urls if shard_of(url, count) == index]
+    return list(urls)
+
+def parse_page(html, base_url, find_links=True):
+    """Parse ``html`` once and return (emails, {contact link: score}).
+
+    Emails come from the raw markup and from mailto: links; contact links are
+    anchors whose href or text mentions a contact keyword, scored by
+    crawl_frontier.link_score. A plain function so it can run in a worker
+    process.
+    """
+    emails = set(EMAIL_RE.findall(html))
+    contact_links = {}
+    try:
+        doc = lxml.html.fromstring(html.encode('utf-8', errors='replace'), parser=HTML_PARSER)
+    except (ParserError, ValueError):
+        return emails, contact_links
+    for link in doc.iter('a'):
+        href = link.get('href')
+        if not href:
+            continue
+        if href.startswith('mailto:'):
+            email = href[7:]  # Remove 'mailto:' prefix
+            if EMAIL_RE.match(email):
+                emails.add(email)
+        elif find_links:
+            score = link_score(href, link.text_content())
+            full_url = urljoin(base_url, href)
+            if score and is_valid_url(full_url):
+                contact_links[full_url] = max(score, contact_links.get(full_url, 0))
+    return emails, contact_links
+
 class EmailCrawler:
-    def __init__(self):
+    def __init__(self, state_dir=DEFAULT_STATE_DIR, shard=None):
         self.ua = UserAgent()
-        self.email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
-        self.delay_range = (2, 5)  # Random delay between 2-5 seconds
+        # robots.txt rules and per-host pacing, adapted to each host's latency and 429/503 answers
+        self.scheduler = HostScheduler()
         self.found_emails = {}  # Dictionary to store emails by URL
         self.processed_urls = set()
-        self.checkpoint_interval = 10  # Save results every 10 URLs
-        self.output_file = 'international_nonprofits_with_emails.csv'
-        
-    def random_delay(self):
-        """Add random delay between requests"""
-        delay = random.uniform(*self.delay_range)
-        logging.info(f"Waiting for {delay:.2f} seconds...")
-        time.sleep(delay)
+        self.progress_interval = 10  # Log progress every 10 URLs
+        # Pooled connections: a site's homepage and contact pages share one keep-alive connection
+        self.session = create_requests_session()
+        self.max_bytes = DEFAULT_MAX_BYTES
+        # Optional crawl_cache.ResponseCache; offline serves every page from it
+        self.cache = None
+        self.offline = False
+        # Resume state: one journal line per finished URL, one journal per shard; CSVs are exported at the end
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        name = f"emails_shard{shard[0]}of{shard[1]}" if shard else 'emails'
+        self.journal = CrawlJournal(self.state_dir / f"{name}_crawl.jsonl")
+        self.fetch_errors = {}
+        # Do-Not-Contact index from the CRM, if there is one
+        self.suppression = load_suppression()
+        # Drops tracking IDs and other junk and ranks what is left when results are exported
+        self.email_filter = EmailFilter()
+        # Pages fetched per site, homepage included, while looking for contact pages
+        self.page_budget = DEFAULT_PAGE_BUDGET
+        # Optional process pool so parsing large pages doesn't hold up the event loop
+        self.parse_pool = None
+        # Fetch, parse and politeness statistics, summarized in the log every 30 seconds
+        self.metrics = CrawlMetrics(label=f"shard {shard[0]}/{shard[1]}: " if shard else '')
         
     def get_random_headers(self):
         """Generate random headers for requests"""
@@ -46,68 +225,90 @@ class EmailCrawler:
             'Connection': 'keep-alive',
         }
             
-    def extract_emails_from_text(self, text):
-        """Extract email addresses from text"""
-        # First try to find emails in mailto: links
-        mailto_emails = set()
-        soup = BeautifulSoup(text, 'html.parser')
-        for link in soup.find_all('a', href=True):
-            if link['href'].startswith('mailto:'):
-                email = link['href'][7:]  # Remove 'mailto:' prefix
-                if re.match(self.email_pattern, email):
-                    mailto_emails.add(email)
-        
-        # Then find emails in the text
-        text_emails = set(re.findall(self.email_pattern, text))
-        
-        # Combine and return all found emails
-        all_emails = mailto_emails.union(text_emails)
-        if all_emails:
-            logging.info(f"Found {len(all_emails)} email(s): {', '.join(all_emails)}")
-        return all_emails
-        
-    def is_valid_url(self, url):
-        """Check if the URL is valid"""
-        try:
-            result = urlparse(url)
-            return all([result.scheme, result.netloc])
-        except:
-            return False
-            
+    def parse_page(self, html, base_url, find_links=True):
+        """Extract emails and contact links from a page, logging what was found"""
+        started = time.monotonic()
+        emails, contact_links = parse_page(html, base_url, find_links)
+        self.metrics.observe_parse(time.monotonic() - started)
+        self.log_found(emails, contact_links)
+        return emails, contact_links
+
+    async def parse_page_async(self, html, base_url, find_links=True):
+        """parse_page, run in the process pool when there is one"""
+        if self.parse_pool is None:
+            return self.parse_page(html, base_url, find_links)
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        emails, contact_links = await loop.run_in_executor(self.parse_pool, parse_page, html, base_url, find_links)
+        self.metrics.observe_parse(time.monotonic() - started)
+        self.log_found(emails, contact_links)
+        return emails, contact_links
+
+    def log_found(self, emails, contact_links):
+        if emails:
+            logging.info(f"Found {len(emails)} email(s): {', '.join(emails)}")
+        for link in contact_links:
+            logging.debug(f"Found contact link: {link}")
+
     def get_page_content(self, url):
-        """Get page content with error handling"""
+        """Get page content with error handling, once robots.txt and the host's pacing allow it"""
+        # Fresh cached pages need no request, so they skip robots.txt and pacing
+        cached = self.in_cache(url)
+        if not cached:
+            if self.scheduler.needs_robots(url):
+                self.load_robots(url)
+            if not self.scheduler.allowed(url):
+                logging.info(f"Skipping {url}: disallowed by robots.txt")
+                self.fetch_errors[url] = 'disallowed by robots.txt'
+                return None
+        for attempt in range(MAX_ATTEMPTS):
+            if not cached:
+                self.metrics.add_sleep(self.scheduler.wait_turn_sync(url))
+            started = time.monotonic()
+            try:
+                result = fetch(self.session, url, self.get_random_headers(), timeout=10, max_bytes=self.max_bytes,
+                               cache=self.cache, offline=self.offline, metrics=self.metrics)
+            except FetchError as e:
+                self.scheduler.observe(url, time.monotonic() - started)
+                logging.error(f"Failed to fetch {url}: {str(e)}")
+                self.fetch_errors[url] = str(e)
+                return None
+            if not cached:
+                self.scheduler.observe(url, time.monotonic() - started, result.status, result.headers.get('Retry-After'))
+            if result.status not in self.scheduler.backoff_statuses:
+                break
+        return self.page_text(url, result)
+
+    def load_robots(self, url):
+        """Fetch and apply the robots.txt of ``url``'s host"""
+        if not self.in_cache(robots_url(url), ROBOTS_TTL):
+            self.metrics.add_sleep(self.scheduler.wait_turn_sync(url))
         try:
-            response = requests.get(url, headers=self.get_random_headers(), timeout=10)
-            response.raise_for_status()
-            return response.text
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Failed to fetch {url}: {str(e)}")
+            result = fetch(self.session, robots_url(url), self.get_random_headers(), timeout=10,
+                           max_bytes=self.max_bytes, cache=self.cache, offline=self.offline, ttl=ROBOTS_TTL)
+        except FetchError:
+            self.scheduler.record_robots(url)
+            return
+        self.scheduler.record_robots(url, result.status, result.text)
+
+    def in_cache(self, url, ttl=None):
+        """Whether ``url`` would be served from the cache without a request"""
+        entry = self.cache.lookup(url, ttl) if self.cache else None
+        return entry is not None and (self.offline or entry.fresh)
+
+    def page_text(self, url, result):
+        """The text of a fetched page, or None with the error recorded"""
+        if result.status >= 400:
+            logging.error(f"Failed to fetch {url}: HTTP {result.status}")
+            self.fetch_errors[url] = f"HTTP {result.status}"
             return None
-            
-    def find_contact_links(self, soup, base_url):
-        """Find contact-related links in the page"""
-        contact_keywords = ['contact', 'about', 'connect', 'reach', 'get in touch', 'email', 'mail']
-        contact_links = set()
-        
-        # Find all links
-        for link in soup.find_all('a', href=True):
-            href = link['href'].lower()
-            text = link.get_text().lower()
-            
-            # Check if link text or URL contains contact-related keywords
-            if any(keyword in href or keyword in text for keyword in contact_keywords):
-                full_url = urljoin(base_url, link['href'])
-                if self.is_valid_url(full_url):
-                    contact_links.add(full_url)
-                    logging.info(f"Found contact link: {full_url}")
-                    
-        return contact_links
+        return result.text
             
     def process_url(self, url):
         """Process a single URL to find email addresses"""
         try:
             # Validate URL
-            if not self.is_valid_url(url):
+            if not is_valid_url(url):
                 logging.warning(f"Skipping invalid URL: {url}")
                 return
                 
@@ -116,124 +317,353 @@ class EmailCrawler:
             # Get main page content
             main_content = self.get_page_content(url)
             if main_content:
-                # Extract emails from main page
-                emails = self.extract_emails_from_text(main_content)
+                # Extract emails and contact links from the main page in one parse
+                emails, contact_links = self.parse_page(main_content, url)
                 self.found_emails[url] = emails
+                frontier = self.contact_frontier(url, contact_links)
                 
-                # Parse the page with BeautifulSoup
-                soup = BeautifulSoup(main_content, 'html.parser')
-                
-                # Find and process contact links
-                contact_links = self.find_contact_links(soup, url)
-                for contact_url in contact_links:
-                    contact_content = self.get_page_content(contact_url)
-                    if contact_content:
-                        contact_emails = self.extract_emails_from_text(contact_content)
-                        self.found_emails[url].update(contact_emails)
-                        self.random_delay()
-                    
-            self.processed_urls.add(url)
-            self.random_delay()
+                # Visit the most promising contact pages, best first, until the budget runs out
+                while (page := frontier.pop()) is not None:
+                    link, depth = page
+                    content = self.get_page_content(link)
+                    self.fetch_errors.pop(link, None)
+                    if content:
+                        parsed = None
+                        if depth is not None:
+                            parsed = self.parse_page(content, link, depth < frontier.max_depth)
+                        self.explore_page(url, frontier, content, link, depth, parsed)
+                self.finish_url(url)
+            else:
+                self.finish_url(url, self.fetch_errors.pop(url, 'fetch failed'))
             
         except Exception as e:
             logging.error(f"Error processing {url}: {str(e)}")
+            self.finish_url(url, str(e))
             
-    def save_results(self):
-        """Save results to a copy of the original CSV with an additional email column"""
-        # Create a backup of the original file if it doesn't exist
-        if not os.path.exists('international_nonprofits_backup.csv'):
-            shutil.copy2('international_nonprofits.csv', 'international_nonprofits_backup.csv')
-            
-        # Read the original CSV and create a new one with the email column
-        with open('international_nonprofits.csv', 'r', newline='') as infile, \
-             open(self.output_file, 'w', newline='') as outfile:
-            
-            reader = csv.reader(infile)
+    async def fetch_async(self, client, url):
+        """Fetch a page once robots.txt and the host's pacing allow it"""
+        # Fresh cached pages need no request, so they skip robots.txt and pacing
+        result = client.cached(url)
+        if result is None:
+            async with self.scheduler.semaphore(url):
+                if self.scheduler.needs_robots(url):
+                    await self.load_robots_async(client, url)
+                if not self.scheduler.allowed(url):
+                    logging.info(f"Skipping {url}: disallowed by robots.txt")
+                    self.fetch_errors[url] = 'disallowed by robots.txt'
+                    return None
+                for attempt in range(MAX_ATTEMPTS):
+                    self.metrics.add_sleep(await self.scheduler.wait_turn(url))
+                    started = time.monotonic()
+                    try:
+                        result = await client.get(url, headers=self.get_random_headers())
+                    except FetchError as e:
+                        self.scheduler.observe(url, time.monotonic() - started)
+                        logging.error(f"Failed to fetch {url}: {e}")
+                        self.fetch_errors[url] = str(e)
+                        return None
+                    self.scheduler.observe(url, time.monotonic() - started, result.status,
+                                           result.headers.get('Retry-After'))
+                    if result.status not in self.scheduler.backoff_statuses:
+                        break
+        return self.page_text(url, result)
+
+    async def load_robots_async(self, client, url):
+        """Fetch and apply the robots.txt of ``url``'s host"""
+        if not self.in_cache(robots_url(url), ROBOTS_TTL):
+            self.metrics.add_sleep(await self.scheduler.wait_turn(url))
+        try:
+            result = await client.get(robots_url(url), headers=self.get_random_headers(), ttl=ROBOTS_TTL)
+        except FetchError:
+            self.scheduler.record_robots(url)
+            return
+        self.scheduler.record_robots(url, result.status, result.text)
+
+    async def process_url_async(self, client, url):
+        """Process a single URL, fetching its contact pages concurrently"""
+        if not is_valid_url(url):
+            logging.warning(f"Skipping invalid URL: {url}")
+            return
+        logging.info(f"Processing URL: {url}")
+        try:
+            main_content = await self.fetch_async(client, url)
+            if main_content:
+                self.found_emails[url], contact_links = await self.parse_page_async(main_content, url)
+                frontier = self.contact_frontier(url, contact_links)
+                # One page at a time, so the site's crawl can stop as soon as a good address turns up
+                while (page := frontier.pop()) is not None:
+                    link, depth = page
+                    content = await self.fetch_async(client, link)
+                    self.fetch_errors.pop(link, None)
+                    if content:
+                        parsed = None
+                        if depth is not None:
+                            parsed = await self.parse_page_async(content, link, depth < frontier.max_depth)
+                        self.explore_page(url, frontier, content, link, depth, parsed)
+                self.finish_url(url)
+            else:
+                self.finish_url(url, self.fetch_errors.pop(url, 'fetch failed'))
+        except Exception as e:
+            logging.error(f"Error processing {url}: {str(e)}")
+            self.finish_url(url, str(e))
+
+    def contact_frontier(self, url, contact_links):
+        """The queue of contact pages to visit after ``url``'s homepage"""
+        frontier = ContactFrontier(url, self.page_budget, sitemaps=self.scheduler.sitemaps(url))
+        frontier.add(contact_links)
+        if self.email_filter.best_score(self.found_emails[url], url) >= CONFIDENT_SCORE:
+            frontier.stop()
+        return frontier
+
+    def explore_page(self, url, frontier, content, link, depth, parsed):
+        """Record what a fetched contact page or sitemap adds to ``url``'s crawl"""
+        if depth is None:
+            frontier.add_sitemap(content)
+            return
+        emails, contact_links = parsed
+        self.found_emails[url].update(emails)
+        frontier.add(contact_links, depth + 1)
+        if self.email_filter.best_score(self.found_emails[url], url) >= CONFIDENT_SCORE:
+            logging.info(f"Found a likely contact address for {url}; skipping its remaining pages")
+            frontier.stop()
+
+    def finish_url(self, url, error=None):
+        """Journal a finished URL so a restarted crawl skips it"""
+        self.journal.record(url, 'failed' if error else 'ok', self.found_emails.get(url, ()), error)
+        self.processed_urls.add(url)
+        self.metrics.observe_site(len(self.found_emails.get(url, ())), failed=bool(error))
+        self.metrics.maybe_log()
+
+    async def crawl_async(self, urls, concurrency=20, max_per_host=1, timeout=10, pool_size=100, http2=False):
+        """Crawl ``urls`` with up to ``concurrency`` sites in flight, paced per host by the scheduler"""
+        pending = asyncio.Queue()
+        for url in urls:
+            if url not in self.processed_urls:
+                pending.put_nowait(url)
+        total = pending.qsize()
+        done = 0
+
+        async def worker(client):
+            nonlocal done
+            while True:
+                try:
+                    url = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                self.metrics.set_queue(pending.qsize(), total - done - pending.qsize())
+                await self.process_url_async(client, url)
+                done += 1
+                self.metrics.set_queue(pending.qsize(), total - done - pending.qsize())
+                if done % self.progress_interval == 0:
+                    logging.info(f"Progress: {done}/{total} URLs processed")
+
+        async with HTTPClient(pool_size=pool_size, per_host=max_per_host, timeout=timeout,
+                              max_bytes=self.max_bytes, http2=http2, cache=self.cache, offline=self.offline,
+                              metrics=self.metrics) as client:
+            await asyncio.gather(*(worker(client) for _ in range(min(concurrency, total) or 1)))
+
+    def save_results(self, source):
+        """Export results to a copy of ``source`` with an additional email column"""
+        source.output.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = source.output.with_name(source.output.name + '.tmp')
+        rows = source.rows()
+        with open(tmp_file, 'w', newline='', encoding=source.encoding) as outfile:
             writer = csv.writer(outfile)
             
             # Read and write header row
-            header = next(reader)
-            header.append('Email Addresses')  # Add email column
-            writer.writerow(header)
+            header = next(rows)
+            url_index = header.index(source.url_column)
+            writer.writerow(header + ['Email Addresses'])  # Add email column
             
             # Process each row
-            for row in reader:
-                if row and row[-1].strip():  # Check if there's a URL
-                    url = row[-1].strip()
-                    if not url.startswith(('http://', 'https://')) and '.' in url:
-                        url = 'https://' + url
-                    
-                    # Get emails for this URL
-                    emails = self.found_emails.get(url, set())
-                    row.append(','.join(sorted(emails)))  # Add emails as comma-separated string
-                else:
-                    row.append('')  # Add empty email field if no URL
-                
+            for row in rows:
+                url = normalize_url(row[url_index]) if len(row) > url_index else ''
+                # Get plausible emails for this URL, best first, leaving out suppressed addresses
+                emails = self.email_filter.rank(self.found_emails.get(url, ()), url)
+                if self.suppression:
+                    emails = self.suppression.filter_emails(emails)
+                row.append(','.join(emails))  # Add emails as comma-separated string
                 writer.writerow(row)
+        os.replace(tmp_file, source.output)
                 
-        logging.info(f"Saved results to {self.output_file}")
-                
-    def load_checkpoint(self):
-        """Load previously found emails and processed URLs"""
-        if os.path.exists(self.output_file):
-            with open(self.output_file, 'r', newline='') as f:
+        logging.info(f"Saved results to {source.output}")
+
+    def load_checkpoint(self, retry_failed=False):
+        """Load found emails and processed URLs from every shard's journal"""
+        entries = {}
+        for path in journal_paths(self.state_dir):
+            for url, entry in CrawlJournal(path).load().items():
+                if url not in entries or entry['ts'] > entries[url]['ts']:
+                    entries[url] = entry
+        for url, entry in entries.items():
+            if entry['status'] == 'ok':
+                self.found_emails[url] = set(entry['emails'])
+            if entry['status'] == 'ok' or not retry_failed:
+                self.processed_urls.add(url)
+        failed = sum(entry['status'] == 'failed' for entry in entries.values())
+        logging.info(f"Loaded {len(entries)} previously processed URLs ({failed} failed) from {self.state_dir}")
+
+    def import_legacy_outputs(self, sources):
+        """Seed the journal from output CSVs written before crawls were journaled"""
+        for source in sources:
+            if not source.output.exists():
+                continue
+            with open(source.output, 'r', newline='', encoding=detect_encoding(source.output)) as f:
                 reader = csv.reader(f)
-                header = next(reader)  # Skip header
+                header = next(reader, [])
+                if 'Email Addresses' not in header or source.url_column not in header:
+                    continue
                 email_col_index = header.index('Email Addresses')
-                
+                url_col_index = header.index(source.url_column)
                 for row in reader:
-                    if row and row[-2].strip():  # Check URL column (second to last)
-                        url = row[-2].strip()
-                        if not url.startswith(('http://', 'https://')) and '.' in url:
-                            url = 'https://' + url
-                        emails = set(row[email_col_index].split(',')) if row[email_col_index] else set()
-                        self.found_emails[url] = emails
-                        self.processed_urls.add(url)
-                        
-            logging.info(f"Loaded {len(self.found_emails)} previously processed URLs with emails")
-                
-def main():
-    crawler = EmailCrawler()
-    
-    # Try to load previous results
-    crawler.load_checkpoint()
-    
-    # Read URLs from the source file
+                    url = normalize_url(row[url_col_index]) if len(row) > email_col_index else ''
+                    if url:
+                        emails = [email for email in row[email_col_index].split(',') if email]
+                        self.journal.record(url, 'ok', emails)
+            logging.info(f"Imported {source.output} into {self.journal.path}")
+
+def build_crawler(args, shard=None):
+    crawler = EmailCrawler(args.state_dir, shard)
+    crawler.scheduler = HostScheduler(*args.delay, max_per_host=args.per_host)
+    crawler.max_bytes = args.max_page_kb * 1024
+    crawler.page_budget = args.page_budget
+    crawler.metrics.interval = args.metrics_interval
+    if args.metrics_port:
+        # Each worker process gets its own port, counting up from --metrics-port
+        crawler.metrics.serve(args.metrics_port + (shard[0] if shard and args.workers > 1 else 0))
+    if not args.no_cache:
+        crawler.cache = ResponseCache(args.cache_dir)
+    if args.offline:
+        crawler.offline = True
+        crawler.scheduler = HostScheduler(0, 0, max_per_host=args.per_host)
+    return crawler
+
+def run_shard(args, sources, shard=None):
+    """Crawl the URLs of ``sources`` that fall in ``shard`` (all of them when None)"""
+    crawler = build_crawler(args, shard)
+    # Try to load previous results; an offline run re-extracts every cached page instead
+    if not args.offline:
+        crawler.load_checkpoint(args.retry_failed)
     try:
-        with open('international_nonprofits.csv', 'r', newline='') as f:
-            reader = csv.reader(f)
-            # Skip header row if it exists
-            next(reader, None)
-            # Get URLs from the last column and filter out invalid ones
-            urls = []
-            for row in reader:
-                if row and row[-1].strip():
-                    url = row[-1].strip()
-                    # Add https:// if no scheme is present and it looks like a domain
-                    if not url.startswith(('http://', 'https://')) and '.' in url:
-                        url = 'https://' + url
-                    urls.append(url)
-            
-        logging.info(f"Found {len(urls)} URLs to process")
-        
-        # Process each URL
-        for i, url in enumerate(urls, 1):
-            if url not in crawler.processed_urls:  # Skip already processed URLs
-                crawler.process_url(url)
-                
-                # Save results periodically
-                if i % crawler.checkpoint_interval == 0:
-                    crawler.save_results()
-                    logging.info(f"Progress: {i}/{len(urls)} URLs processed")
-            
-        # Final save
-        crawler.save_results()
-        logging.info(f"Completed processing all URLs. Total unique emails found: {sum(len(emails) for emails in crawler.found_emails.values())}")
+        urls = unique_urls(sources, crawler.suppression, shard)
+        label = f"shard {shard[0]}/{shard[1]}: " if shard else ''
+        logging.info(f"{label}Found {len(urls)} unique URLs to process")
         
+        if args.sequential:
+            # Process each URL
+            for i, url in enumerate(urls, 1):
+                if url not in crawler.processed_urls:  # Skip already processed URLs
+                    crawler.metrics.set_queue(len(urls) - i, 1)
+                    crawler.process_url(url)
+                    
+                    if i % crawler.progress_interval == 0:
+                        logging.info(f"Progress: {i}/{len(urls)} URLs processed")
+        else:
+            if args.parse_workers:
+                crawler.parse_pool = ProcessPoolExecutor(args.parse_workers)
+            try:
+                asyncio.run(crawler.crawl_async(urls, args.concurrency, args.per_host,
+                                                pool_size=args.pool_size, http2=args.http2))
+            finally:
+                if crawler.parse_pool:
+                    crawler.parse_pool.shutdown()
+        if crawler.cache:
+            logging.info(f"{label}Cache: {crawler.cache.hits} pages served from cache "
+                         f"({crawler.cache.revalidated} revalidated), {crawler.cache.stored} stored")
+        logging.info(crawler.metrics.summary())
     except Exception as e:
         logging.error(f"Error in main process: {str(e)}")
-        # Save results in case of error
-        crawler.save_results()
+    finally:
+        crawler.journal.close()
+        crawler.metrics.close()
+
+def export_all(args, sources):
+    """Write every source's output CSV from all shards' journals"""
+    crawler = EmailCrawler(args.state_dir)
+    mx_checker = MXChecker.create(args.nameserver or ('127.0.0.53',)) if args.check_mx else None
+    crawler.email_filter = EmailFilter(min_score=args.min_score, max_emails=args.max_emails, mx_checker=mx_checker)
+    crawler.load_checkpoint()
+    for source in sources:
+        crawler.save_results(source)
+    logging.info(f"Exported {len(sources)} file(s). Total unique emails found: "
+                 f"{sum(len(emails) for emails in crawler.found_emails.values())}")
+
+def parse_shard(value):
+    index, _, count = value.partition('/')
+    if not (index.isdigit() and count.isdigit() and int(index) < int(count)):
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, e.g. 0/4")
+    return int(index), int(count)
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl nonprofit websites for email addresses')
+    parser.add_argument('inputs', nargs='*', default=DEFAULT_INPUTS,
+                        help='Input CSV files or globs (default: the international, IA and per-state lists)')
+    parser.add_argument('--output-dir', help='Where to write <input>_with_emails.csv (default: next to each input)')
+    parser.add_argument('--url-column', help=f"Column holding the website (default: the first of {', '.join(URL_COLUMNS)})")
+    parser.add_argument('--ein-column', default='EIN', help='Column holding the EIN, for Do-Not-Contact checks')
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR, help='Where crawl journals are kept')
+    parser.add_argument('--workers', type=int, default=1, help='Crawl in this many processes, split by domain')
+    parser.add_argument('--shard', type=parse_shard, metavar='INDEX/COUNT',
+                        help='Crawl only the domains in this shard, e.g. 0/4 on the first of four machines')
+    parser.add_argument('--export-only', action='store_true',
+                        help="Write the output CSVs from the journals without crawling, e.g. after all shards finish")
+    parser.add_argument('--concurrency', type=int, default=20, help='Sites crawled at the same time')
+    parser.add_argument('--per-host', type=int, default=1, help='Requests in flight to any one host')
+    parser.add_argument('--delay', type=float, nargs=2, default=(1, 60), metavar=('MIN', 'MAX'),
+                        help="Bounds on the seconds between requests to one host; slow or throttling hosts get "
+                             "more, and a robots.txt Crawl-delay always wins")
+    parser.add_argument('--sequential', action='store_true', help='Crawl one page at a time (the original mode)')
+    parser.add_argument('--pool-size', type=int, default=100, help='Open connections kept across all hosts')
+    parser.add_argument('--http2', action='store_true', help='Use HTTP/2 where servers support it (needs httpx[http2])')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='Processes for HTML parsing (0 parses in the crawler process)')
+    parser.add_argument('--retry-failed', action='store_true', help='Crawl URLs that failed in earlier runs again')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Where fetched pages are cached')
+    parser.add_argument('--no-cache', action='store_true', help='Fetch every page, ignoring the cache')
+    parser.add_argument('--offline', action='store_true',
+                        help='Re-run extraction from cached pages only, without any requests')
+    parser.add_argument('--min-score', type=float, default=0.5,
+                        help='Drop exported emails scoring below this (0.5 keeps every non-junk address)')
+    parser.add_argument('--max-emails', type=int, default=10, help='Keep at most this many emails per website')
+    parser.add_argument('--check-mx', action='store_true',
+                        help='Drop emails whose domain has no mail server (needs dnspython)')
+    parser.add_argument('--nameserver', action='append',
+                        help='Resolver for --check-mx, repeatable (default: the local stub at 127.0.0.53)')
+    parser.add_argument('--page-budget', type=int, default=DEFAULT_PAGE_BUDGET,
+                        help='Pages fetched per site while looking for contacts, homepage and sitemap included')
+    parser.add_argument('--metrics-interval', type=float, default=30,
+                        help='Seconds between metrics summaries in the log (0 logs only the final one)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics while crawling (PORT+N for worker N)')
+    parser.add_argument('--max-page-kb', type=int, default=DEFAULT_MAX_BYTES // 1024,
+                        help='Abandon pages larger than this many kilobytes')
+    args = parser.parse_args()
+
+    sources = discover_sources(args.inputs, args.output_dir, args.url_column, args.ein_column)
+    logging.info(f"Crawling {len(sources)} file(s): {', '.join(str(source.path) for source in sources)}")
+
+    # Outputs from before crawls were journaled count as done
+    if not journal_paths(args.state_dir):
+        legacy = EmailCrawler(args.state_dir)
+        legacy.import_legacy_outputs(sources)
+        legacy.journal.close()
+
+    if not args.export_only:
+        if args.workers > 1:
+            workers = [multiprocessing.Process(target=run_shard, args=(args, sources, (index, args.workers)))
+                       for index in range(args.workers)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        else:
+            run_shard(args, sources, args.shard)
+
+    if args.shard and not args.export_only:
+        logging.info("Shard finished; run with --export-only once every shard is done to write the CSVs")
+    else:
+        # Export the CSVs once, from everything journaled so far
+        export_all(args, sources)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""Classify and rank scraped email addresses.
+
+Crawled pages yield plenty of strings that look like addresses but are not
+contacts: Sentry error-tracking DSNs (``<hex>@sentry.wixpress.com``), retina
+image names (``logo@2x.png``), placeholder and no-reply addresses. ``EmailFilter``
+cleans each candidate and drops these, then scores the rest (an address on the
+organization's own domain ranks first) and keeps the best few. Optionally it
+also drops domains without MX records, using dnspython against a local stub
+resolver.
+"""
+import logging
+import re
+import threading
+from urllib.parse import unquote, urlparse
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:
+    dns = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when filtering rules change so ingest.py rebuilds the dataset
+FILTER_VERSION = 1
+
+# Domains that never hold real contacts; a listed domain also covers its subdomains
+DEFAULT_DENYLIST = (
+    'sentry.io', 'wixpress.com', 'sentry-next.wixpress.com', 'sentry.wixpress.com',
+    'example.com', 'example.org', 'example.net', 'domain.com', 'yourdomain.com', 'yoursite.com',
+    'mysite.com', 'website.com', 'company.com',
+)
+# File extensions that show up as a "TLD" when an image name like logo@2x.png is scraped
+FILE_EXTENSIONS = frozenset(('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg', 'bmp', 'ico', 'tif', 'tiff',
+                             'css', 'js', 'json', 'pdf', 'mp4', 'webm', 'woff', 'woff2', 'ttf'))
+NO_REPLY_RE = re.compile(r'^(?:no-?reply|do-?not-?reply|mailer-daemon|bounces?)(?:[+._-].*)?$')
+ROLE_LOCAL_PARTS = frozenset(('info', 'contact', 'office', 'hello', 'admin', 'director', 'executive',
+                              'development', 'donate', 'giving', 'programs', 'volunteer', 'outreach'))
+FREE_MAIL_DOMAINS = frozenset(('gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com', 'icloud.com',
+                               'live.com', 'msn.com', 'protonmail.com', 'yahoo.ca', 'hotmail.ca'))
+# Second-level labels under a country code that act like a TLD (bbc.co.uk, cbn.gov.ng)
+SECOND_LEVEL_LABELS = frozenset(('co', 'com', 'org', 'net', 'gov', 'ac', 'edu', 'or', 'ne', 'go', 'gob', 'nic'))
+
+EMAIL_RE = re.compile(r'[a-z0-9._%+-]+@(?:[a-z0-9-]+\.)+[a-z]{2,24}')
+HEX_LOCAL_RE = re.compile(r'[0-9a-f]{16,}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+EMAIL_SPLIT = re.compile(r'[,;\s]+')
+
+class DomainTrie:
+    """Set of domains matched by suffix: a domain matches if it or any parent domain was added"""
+
+    def __init__(self, domains=()):
+        self._root = {}
+        for domain in domains:
+            self.add(domain)
+
+    def add(self, domain):
+        node = self._root
+        for label in reversed(domain.lower().strip('.').split('.')):
+            node = node.setdefault(label, {})
+        node[None] = True
+
+    def __contains__(self, domain):
+        node = self._root
+        for label in reversed(domain.lower().split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if None in node:
+                return True
+        return False
+
+def registrable_domain(host):
+    """Approximate registrable domain: example.org for www.example.org, cbn.gov.ng for www.cbn.gov.ng"""
+    labels = host.lower().strip('.').split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL_LABELS:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def website_domain(website):
+    if not website:
+        return ''
+    if '://' not in website:
+        website = 'https://' + website
+    host = urlparse(website.strip()).hostname or ''
+    return registrable_domain(host) if '.' in host else ''
+
+class MXChecker:
+    """Cached MX lookups through dnspython, pointed at a local stub resolver by default"""
+
+    def __init__(self, nameservers=('127.0.0.53',), timeout=2.0, port=53):
+        self.resolver = dns.resolver.Resolver(configure=not nameservers)
+        if nameservers:
+            self.resolver.nameservers = list(nameservers)
+        self.resolver.port = port
+        self.resolver.lifetime = timeout
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def has_mx(self, domain):
+        """True/False for a definite answer, None when the resolver could not say"""
+        with self._lock:
+            if domain in self._cache:
+                return self._cache[domain]
+        try:
+            self.resolver.resolve(domain, 'MX')
+            result = True
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            # No MX; mail still goes to the A record if there is one
+            result = self._has_address(domain)
+        except dns.exception.DNSException:
+            result = None
+        with self._lock:
+            self._cache[domain] = result
+        return result
+
+    def _has_address(self, domain):
+        try:
+            self.resolver.resolve(domain, 'A')
+            return True
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return False
+        except dns.exception.DNSException:
+            return None
+
+    @classmethod
+    def create(cls, nameservers=('127.0.0.53',), timeout=2.0, port=53):
+        """An MXChecker, or None with a warning when dnspython is not installed"""
+        if dns is None:
+            logger.warning("dnspython is not installed; skipping MX validation")
+            return None
+        return cls(nameservers, timeout, port)
+
+class EmailFilter:
+    """Clean, classify and rank candidate addresses found for one organization.
+
+    Junk (denylisted domains, file names, hex tracking IDs, no-reply
+    addresses, domains without mail servers) scores 0 and is dropped. Anything
+    else starts at 0.5 and gains for matching the website's domain, being a
+    role address such as info@ and having a confirmed MX record. ``rank``
+    keeps addresses scoring at least ``min_score``, best first, at most
+    ``max_emails`` of them.
+    """
+
+    def __init__(self, denylist=DEFAULT_DENYLIST, min_score=0.5, max_emails=10, mx_checker=None):
+        self.denylist = DomainTrie(denylist)
+        self.min_score = min_score
+        self.max_emails = max_emails
+        self.mx_checker = mx_checker
+
+    @staticmethod
+    def clean(raw):
+        """Normalized address from a scraped string, or None if it is not one"""
+        email = unquote(raw or '').strip().lower()
+        if email.startswith('mailto:'):
+            email = email[7:]
+        email = email.split('?')[0].strip(' \t\r\n.,;:<>()[]"\'')
+        return email if EMAIL_RE.fullmatch(email) else None
+
+    def score(self, email, site_domain=''):
+        """0 for junk, otherwise a plausibility score between 0.5 and 1"""
+        local, _, domain = email.rpartition('@')
+        if domain.rsplit('.', 1)[-1] in FILE_EXTENSIONS or domain in self.denylist:
+            return 0.0
+        if HEX_LOCAL_RE.fullmatch(local) or NO_REPLY_RE.match(local):
+            return 0.0
+        score = 0.5
+        if site_domain and registrable_domain(domain) == site_domain:
+            score += 0.3
+        elif domain in FREE_MAIL_DOMAINS:
+            score += 0.05
+        if local in ROLE_LOCAL_PARTS:
+            score += 0.1
+        if self.mx_checker is not None:
+            has_mx = self.mx_checker.has_mx(domain)
+            if has_mx is False:
+                return 0.0
+            if has_mx:
+                score += 0.1
+        return round(score, 2)
+
+    def rank(self, emails, website=''):
+        """Plausible addresses from ``emails``, best first"""
+        site_domain = website_domain(website)
+        scored = {}
+        for raw in emails:
+            email = self.clean(raw)
+            if email and email not in scored:
+                scored[email] = self.score(email, site_domain)
+        ranked = sorted((email for email, score in scored.items() if score and score >= self.min_score),
+                        key=lambda email: (-scored[email], email))
+        return ranked[:self.max_emails] if self.max_emails else ranked
+
+    def best_score(self, emails, website=''):
+        """Score of the most plausible address in ``emails``, 0 if there is none"""
+        site_domain = website_domain(website)
+        cleaned = (self.clean(raw) for raw in emails)
+        return max((self.score(email, site_domain) for email in cleaned if email), default=0.0)
+
+    def filter_field(self, value, website=''):
+        """rank() for a comma/semicolon separated cell, returned in the same form"""
+        if not value:
+            return ''
+        return ','.join(self.rank(EMAIL_SPLIT.split(value), website))
+
+_default_filter = None
+
+def default_filter():
+    """The process-wide EmailFilter with default settings"""
+    global _default_filter
+    if _default_filter is None:
+        _default_filter = EmailFilter()
+    return _default_filter
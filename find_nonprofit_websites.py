@@ -1,12 +1,24 @@
 import csv
-import time
 import os
 import sys
 import re
 import random
+import argparse
+import threading
 import requests
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
 from urllib.parse import quote_plus, urlparse, parse_qs
+from crawl_cache import DAY, ResponseCache
+from crawl_http import FetchError, create_requests_session, fetch
+from crawl_metrics import CrawlMetrics
+from crawl_scheduler import ROBOTS_TTL, HostScheduler, TokenBucket, robots_url
+from suppression import load_suppression
+
+# Search results change slowly; reuse cached result pages for a month
+SEARCH_TTL = 30 * DAY
+DEFAULT_WORKERS = 4
 
 # List of user agents to rotate through
 USER_AGENTS = [
@@ -18,6 +30,44 @@ USER_AGENTS = [
     'Mozilla/5.0 (iPhone; CPU iPhone OS 14_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1'
 ]
 
+# Result domains that are directories or social profiles rather than the organization's own site
+EXCLUDED_DOMAINS = [
+    'facebook.com', 'twitter.com', 'linkedin.com', 'instagram.com',
+    'guidestar.org', 'charity', 'irs.gov', 'wikipedia.org', 'youtube.com',
+    'charitynavigator.org', 'propublica.org', 'candid.org', 'cause', 'charity',
+    'pinterest', '990finder', 'greatnonprofits', 'nonprofitfacts', 
+    'faqs.org', 'nccsweb', 'amazonaws', 'taxexemptworld', 'duckduckgo.com'
+]
+
+@dataclass
+class SearchProvider:
+    """A search engine and the token bucket that paces every search sent to it.
+
+    ``rate`` is the starting rate in searches per second. The bucket halves it
+    whenever the engine answers one of ``backoff_statuses`` and raises it again
+    while searches succeed, so workers run as fast as the engine really allows.
+    """
+    name: str
+    base_url: str
+    rate: float
+    burst: int = 1
+    # DuckDuckGo answers 202 instead of results when it wants us to slow down
+    backoff_statuses: tuple = (202, 429, 503)
+    bucket: TokenBucket = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.bucket = TokenBucket(self.rate, self.burst)
+
+    def search_url(self, org_name, state="Iowa"):
+        query = f"{org_name} {state} nonprofit official website"
+        return f"{self.base_url}?q={quote_plus(query)}"
+
+DUCKDUCKGO = SearchProvider('duckduckgo', 'https://html.duckduckgo.com/html/', rate=0.5, burst=2)
+
+# robots.txt rules per search host; the provider's bucket does the pacing
+search_robots = HostScheduler(0, 0)
+_robots_lock = threading.Lock()
+
 def clean_url(url):
     """Clean tracking parameters from URLs and get the base domain."""
     if not url:
@@ -39,16 +89,61 @@ def clean_url(url):
     
     return base_url
 
-def search_organization_website(org_name, state="Iowa", max_retries=3):
-    """Search for an organization's website using DuckDuckGo with retry mechanism."""
+def search_allowed(url, provider, session, cache=None):
+    """Whether the provider's robots.txt allows ``url``, fetching it on first use.
+
+    A Crawl-delay in it caps the provider's rate.
+    """
+    with _robots_lock:
+        if search_robots.needs_robots(url):
+            provider.bucket.acquire()
+            try:
+                response = fetch(session, robots_url(url), headers={'User-Agent': random.choice(USER_AGENTS)},
+                                 timeout=30, cache=cache, ttl=ROBOTS_TTL)
+                search_robots.record_robots(url, response.status, response.text)
+            except FetchError:
+                search_robots.record_robots(url)
+            crawl_delay = search_robots.delay(url)
+            if crawl_delay:
+                provider.bucket.limit(1 / crawl_delay)
+    return search_robots.allowed(url)
+
+def pick_website(html):
+    """The first search result that looks like the organization's own site, or an empty string"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for result in soup.find_all('a', class_='result__url'):
+        website = result.get('href')
+        if not website:
+            continue
+        # Clean the URL to remove tracking parameters
+        clean_website = clean_url(website)
+        if any(domain in clean_website.lower() for domain in EXCLUDED_DOMAINS):
+            continue
+        return clean_website
+    return ""
+
+def search_organization_website(org_name, state="Iowa", max_retries=3, session=None, cache=None, metrics=None,
+                                provider=None):
+    """Search for an organization's website, retrying while the search engine pushes back.
+
+    Safe to call from many threads: every search takes a token from the
+    provider's bucket, so together they never outrun it.
+    """
+    session = session or requests
+    provider = provider or DUCKDUCKGO
+    url = provider.search_url(org_name, state)
+    cached = cache.lookup(url, SEARCH_TTL) if cache else None
+    # Cached searches make no request, so they need no token
+    from_cache = cached is not None and cached.fresh
+    if not from_cache and not search_allowed(url, provider, session, cache):
+        print(f"robots.txt disallows {url}; skipping {org_name}")
+        return ""
     for attempt in range(max_retries):
         try:
-            # Format the search query
-            query = f"{org_name} {state} nonprofit official website"
-            encoded_query = quote_plus(query)
-            
-            # Create the DuckDuckGo search URL
-            url = f"https://html.duckduckgo.com/html/?q={encoded_query}"
+            if not from_cache:
+                waited = provider.bucket.acquire()
+                if metrics:
+                    metrics.add_sleep(waited)
             
             # Add headers to mimic a browser request - use random user agent
             headers = {
@@ -61,74 +156,59 @@ def search_organization_website(org_name, state="Iowa", max_retries=3):
                 'Referer': 'https://duckduckgo.com/'
             }
             
-            # Make the request
-            response = requests.get(url, headers=headers)
+            # Make the request, or reuse a cached result page
+            response = fetch(session, url, headers=headers, timeout=30, cache=cache, ttl=SEARCH_TTL, metrics=metrics)
             
-            if response.status_code == 202:
-                print(f"Received 202 status for {org_name} - Attempt {attempt+1}/{max_retries}")
-                # Longer wait for 202 status
-                retry_delay = random.uniform(20, 30)
-                print(f"Waiting {retry_delay:.2f} seconds before retry...")
-                time.sleep(retry_delay)
+            if response.status in provider.backoff_statuses:
+                provider.bucket.backoff(response.headers.get('Retry-After'))
+                print(f"Received {response.status} status for {org_name} - Attempt {attempt+1}/{max_retries}")
+                print(f"Slowing {provider.name} down to {provider.bucket.rate:.2f} searches a second")
                 continue
+            if not from_cache:
+                provider.bucket.recover()
                 
-            if response.status_code != 200:
-                print(f"Error: Received status code {response.status_code} for {org_name}")
+            if response.status != 200:
+                print(f"Error: Received status code {response.status} for {org_name}")
                 return ""
             
-            # Parse the HTML response
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract all result URLs
-            results = soup.find_all('a', class_='result__url')
-            
-            # List of domains to exclude
-            excluded_domains = [
-                'facebook.com', 'twitter.com', 'linkedin.com', 'instagram.com',
-                'guidestar.org', 'charity', 'irs.gov', 'wikipedia.org', 'youtube.com',
-                'charitynavigator.org', 'propublica.org', 'candid.org', 'cause', 'charity',
-                'pinterest', '990finder', 'greatnonprofits', 'nonprofitfacts', 
-                'faqs.org', 'nccsweb', 'amazonaws', 'taxexemptworld', 'duckduckgo.com'
-            ]
-            
-            if results:
-                for result in results:
-                    # Get the URL text
-                    website = result.get('href')
-                    
-                    # Skip empty urls
-                    if not website:
-                        continue
-                    
-                    # Clean the URL to remove tracking parameters
-                    clean_website = clean_url(website)
-                    
-                    # Skip excluded domains
-                    if any(domain in clean_website.lower() for domain in excluded_domains):
-                        continue
-                    
-                    # If we made it here, return this URL
-                    return clean_website
-            
-            # If no suitable results found, return empty string
-            return ""
+            return pick_website(response.text)
             
         except Exception as e:
             print(f"Error searching for {org_name}: {e}")
+            provider.bucket.backoff()
             if attempt < max_retries - 1:
-                retry_delay = random.uniform(15, 25)
-                print(f"Retrying in {retry_delay:.2f} seconds... (Attempt {attempt+1}/{max_retries})")
-                time.sleep(retry_delay)
+                print(f"Retrying at {provider.bucket.rate:.2f} searches a second... (Attempt {attempt+1}/{max_retries})")
             else:
                 return ""
+    return ""
+
+def write_output(output_file, header, data):
+    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)  # Write the header row
+        writer.writerows(data)   # Write the data rows
 
 def main():
+    parser = argparse.ArgumentParser(description="Find each nonprofit's website with a web search")
+    parser.add_argument('--input', default=os.path.join("IA nonprofits", "nonprofits_IA.csv"))
+    parser.add_argument('--output', default=os.path.join("IA nonprofits", "nonprofits_IA_with_websites.csv"))
+    parser.add_argument('--name-column', default='Organization Name', help='Column holding the organization name')
+    parser.add_argument('--state', default="Iowa", help='State added to every search query')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Searches in flight at once')
+    parser.add_argument('--rate', type=float, default=DUCKDUCKGO.rate,
+                        help='Searches per second to start at; halved whenever the engine pushes back')
+    parser.add_argument('--burst', type=int, default=DUCKDUCKGO.burst, help='Searches allowed back to back')
+    parser.add_argument('--search-url', default=DUCKDUCKGO.base_url,
+                        help='Search endpoint, e.g. a local search_testserver.py')
+    parser.add_argument('--limit', type=int, help='Look up at most this many organizations')
+    args = parser.parse_args()
+
     print("Script starting...")
     print(f"Current directory: {os.getcwd()}")
     
     # Set the input and output file paths
-    input_file = os.path.join("IA nonprofits", "nonprofits_IA.csv")
-    output_file = os.path.join("IA nonprofits", "nonprofits_IA_with_websites.csv")
+    input_file = args.input
+    output_file = args.output
     
     # Read the input CSV file
     with open(input_file, 'r', newline='', encoding='utf-8') as infile:
@@ -137,96 +217,88 @@ def main():
         data = list(reader)  # Get all the data rows
     
     print(f"Successfully read {len(data)} rows from the input file.")
+
+    if args.name_column not in header:
+        parser.error(f"{input_file} has no {args.name_column!r} column; pick one with --name-column")
+    name_index = header.index(args.name_column)
+
+    # Organizations on the CRM's Do-Not-Contact list are not looked up
+    suppression = load_suppression()
+    ein_index = header.index('EIN') if 'EIN' in header else None
+
+    # One keep-alive session shared by the workers; result pages are cached on disk
+    session = create_requests_session(pool_size=args.workers)
+    cache = ResponseCache()
+    # Search latency, status codes and time spent waiting, summarized with every progress save
+    metrics = CrawlMetrics(interval=0)
+    provider = replace(DUCKDUCKGO, base_url=args.search_url, rate=args.rate, burst=args.burst)
     
     # Add the "Website" column to the header if not already there
     if "Website" not in header:
         header.append('Website')
+    website_index = len(header) - 1
     
-    # Check if output file exists and find the last processed row
-    resume_from_row = 0
+    # Pick up an earlier run's output; its searches are answered from the cache
     if os.path.exists(output_file):
         with open(output_file, 'r', newline='', encoding='utf-8') as outfile:
             output_reader = csv.reader(outfile)
-            output_header = next(output_reader)
+            next(output_reader)
             output_data = list(output_reader)
-            
-            # Find the last row that has a website
-            for i, row in enumerate(output_data):
-                if len(row) > len(header) - 1 and row[len(header) - 1]:
-                    resume_from_row = i + 1
-            
-            # If we found a partially processed file, use its data
             if output_data:
                 data = output_data
-                print(f"Found existing output file. Resuming from row {resume_from_row}")
+                print("Found existing output file. Searching only for organizations it has no website for")
     
-    # Process each row and find the website
-    max_rows = len(data)  # Process all rows by default
+    # Rows still needing a website, minus Do-Not-Contact organizations and rows without a name
+    pending = []
+    for i, row in enumerate(data):
+        if len(row) > website_index and row[website_index]:
+            continue
+        if suppression and ein_index is not None and len(row) > ein_index and suppression.is_ein_suppressed(row[ein_index]):
+            continue
+        if len(row) > name_index and row[name_index]:  # Make sure we have the organization name
+            pending.append(i)
+    if args.limit is not None:
+        pending = pending[:args.limit]
     
-    start_row = resume_from_row
-    end_row = min(start_row + max_rows, len(data))
-    
-    print(f"Processing rows {start_row} to {end_row-1} (total: {end_row-start_row} organizations)")
-    print("Using randomized delays between requests to avoid rate limiting")
+    print(f"Searching for {len(pending)} organizations with {args.workers} workers, "
+          f"starting at {provider.bucket.rate:g} searches a second")
     
+    pool = ThreadPoolExecutor(max_workers=args.workers)
     try:
-        for i in range(start_row, end_row):
-            row = data[i]
+        futures = {pool.submit(search_organization_website, data[i][name_index], args.state, session=session, cache=cache,
+                               metrics=metrics, provider=provider): i for i in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            row = data[futures[future]]
+            website = future.result()
             
-            # Skip rows that already have a website
-            if len(row) > len(header) - 1 and row[len(header) - 1]:
-                continue
-                
-            if len(row) >= 1:  # Make sure we have at least the organization name
-                org_name = row[0]  # Organization Name is in the first column
-                
-                print(f"Processing {i+1}/{end_row}: {org_name}")
-                
-                # Search for the website
-                website = search_organization_website(org_name)
-                
-                # Ensure the row has enough elements
-                while len(row) < len(header) - 1:
-                    row.append("")
-                
-                # Add website or update if already exists
-                if len(row) < len(header):
-                    row.append(website)
-                else:
-                    row[len(header) - 1] = website
-                
-                print(f"Found website: {website}")
-                
-                # Save progress every 5 organizations
-                if (i - start_row + 1) % 5 == 0:
-                    with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-                        writer = csv.writer(outfile)
-                        writer.writerow(header)  # Write the header row
-                        writer.writerows(data)   # Write the data rows
-                    print(f"Progress saved at row {i+1}")
-                
-                # Add a randomized delay to avoid rate limiting
-                # Random delay between 8 and 15 seconds
-                delay = random.uniform(8, 15)
-                print(f"Waiting {delay:.2f} seconds before next request...")
-                time.sleep(delay)
-                
-                # Occasionally add a longer pause (25% chance)
-                if random.random() < 0.25:
-                    long_delay = random.uniform(25, 40)
-                    print(f"Taking a longer break: {long_delay:.2f} seconds...")
-                    time.sleep(long_delay)
+            # Ensure the row has enough elements
+            while len(row) < website_index:
+                row.append("")
+            
+            # Add website or update if already exists
+            if len(row) < len(header):
+                row.append(website)
+            else:
+                row[website_index] = website
+            
+            print(f"{done}/{len(pending)} {row[name_index]}: {website or 'no website found'}")
+            
+            # Save progress every 5 organizations
+            if done % 5 == 0:
+                write_output(output_file, header, data)
+                print(f"Progress saved after {done} organizations")
+                print(metrics.summary())
     
     except KeyboardInterrupt:
         print("Process interrupted by user. Saving progress...")
     finally:
+        # Searches already running finish; queued ones are dropped
+        pool.shutdown(wait=True, cancel_futures=True)
         # Write the output CSV file
-        with open(output_file, 'w', newline='', encoding='utf-8') as outfile:
-            writer = csv.writer(outfile)
-            writer.writerow(header)  # Write the header row
-            writer.writerows(data)   # Write the data rows
+        write_output(output_file, header, data)
         
         print(f"Completed processing. Results saved to {output_file}")
+        print(metrics.summary())
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
@@ -0,0 +1,280 @@
+"""Normalize every nonprofit source file into one versioned dataset.
+
+    python ingest.py            # ingest if any source changed
+    python ingest.py --force    # re-ingest even if nothing changed
+
+Each source is streamed once, mapped onto the schema in dataset.COLUMNS,
+deduplicated by EIN (earlier sources win per field, email addresses are
+filtered for junk by email_quality and merged) and written as a Parquet file with a manifest under
+data/nonprofits/<version>/. The CURRENT pointer is switched only after the new
+version is complete, so readers never see a partial dataset.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+
+import chardet
+import pandas as pd
+
+from dataset import (COLUMNS, CURRENT_FILE, DATASET_FILE, DATASET_ROOT,
+                     MANIFEST_FILE, SCHEMA_VERSION)
+from email_quality import FILTER_VERSION, default_filter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+REPO_ROOT = Path(__file__).resolve().parent
+
+# Source globs in priority order: when two sources disagree on a field for the
+# same EIN, the non-empty value from the earlier source is kept.
+SOURCES = [
+    ("international nonprofits/international_nonprofits_with_emails.csv", 'csv'),
+    ("international nonprofits/international_nonprofits.csv", 'csv'),
+    ("IA nonprofits/*.csv", 'csv'),
+    ("nonprofit by state/nonprofits_*.csv", 'csv'),
+    ("nonprofit by state/nonprofits_*.txt", 'txt'),
+]
+
+CHUNK_SIZE = 100_000
+EMAIL_SPLIT = re.compile(r'[,;\s]+')
+STATE_CODE = re.compile(r'^[A-Z]{2}$')
+
+def detect_encoding(file_path):
+    """Use UTF-8 when the file decodes cleanly, otherwise ask chardet"""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    try:
+        raw.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return chardet.detect(raw)['encoding']
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def location_for(file_path):
+    """Shard for a source file: its state code, or INT for the international lists"""
+    name = Path(file_path).stem
+    if name.startswith('nonprofits_'):
+        code = name.split('_')[1]
+        if STATE_CODE.match(code):
+            return code
+    return 'INT'
+
+def discover_sources(root=REPO_ROOT):
+    """List (path, kind) for every source file, in priority order, without repeats"""
+    seen = set()
+    sources = []
+    for pattern, kind in SOURCES:
+        for path in sorted(root.glob(pattern)):
+            if path not in seen:
+                seen.add(path)
+                sources.append((path, kind))
+    return sources
+
+def read_csv_chunks(file_path):
+    """Stream a CSV source as string-typed chunks with the common column names"""
+    encoding = detect_encoding(file_path)
+    for chunk in pd.read_csv(file_path, dtype=str, keep_default_na=False, encoding=encoding, chunksize=CHUNK_SIZE):
+        yield chunk.rename(columns={'URL': 'Website'})
+
+def read_txt_chunks(file_path):
+    """Stream a state listing (`=== City ===` headers followed by EIN|Name|Country|PC lines)"""
+    location = location_for(file_path)
+    state = location if location != 'INT' else ''
+    city = ''
+    rows = []
+    with open(file_path, 'r', encoding=detect_encoding(file_path), errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('===') and line.endswith('==='):
+                city = line.strip('= ').strip()
+                continue
+            parts = line.split('|')
+            if len(parts) != 4:
+                # Blank lines and "Total: N nonprofits" footers
+                continue
+            ein, name, country, pc = parts
+            rows.append({'EIN': ein, 'Organization Name': name, 'City': city,
+                         'State': state, 'Country': country, 'PC': pc})
+            if len(rows) >= CHUNK_SIZE:
+                yield pd.DataFrame(rows)
+                rows = []
+    if rows:
+        yield pd.DataFrame(rows)
+
+def normalize_emails(value):
+    """Lowercase, dedupe and sort a comma/semicolon/space separated email list"""
+    if not value:
+        return ''
+    emails = {email.strip().lower() for email in EMAIL_SPLIT.split(value) if '@' in email}
+    return ','.join(sorted(emails))
+
+def normalize_chunk(chunk, file_path, priority):
+    """Map one source chunk onto the normalized schema"""
+    df = pd.DataFrame(index=chunk.index)
+    for col in COLUMNS:
+        if col in chunk.columns:
+            df[col] = chunk[col].fillna('').astype(str).str.strip()
+        else:
+            df[col] = ''
+
+    # EINs are nine digits; restore leading zeros lost by numeric round trips
+    df['EIN'] = df['EIN'].str.replace(r'\D', '', regex=True)
+    df.loc[df['EIN'] != '', 'EIN'] = df.loc[df['EIN'] != '', 'EIN'].str.zfill(9)
+
+    website = df['Website']
+    needs_scheme = (website != '') & ~website.str.match(r'^https?://') & website.str.contains('.', regex=False)
+    df.loc[needs_scheme, 'Website'] = 'https://' + website[needs_scheme]
+
+    # Keep only plausible contacts (no tracking IDs, image names, placeholders), then normalize
+    has_email = df['Email Addresses'] != ''
+    email_filter = default_filter()
+    df.loc[has_email, 'Email Addresses'] = [
+        normalize_emails(email_filter.filter_field(emails, website))
+        for emails, website in zip(df.loc[has_email, 'Email Addresses'], df.loc[has_email, 'Website'])]
+
+    df['Location'] = location_for(file_path)
+    df['Sources'] = str(Path(file_path).relative_to(REPO_ROOT))
+    df['_priority'] = priority
+    return df
+
+def merge_records(frames):
+    """Deduplicate by EIN: first non-empty value per field wins, emails and sources are unioned"""
+    combined = pd.concat(frames, ignore_index=True)
+    skipped = int((combined['EIN'] == '').sum())
+    combined = combined[combined['EIN'] != '']
+    combined = combined.sort_values('_priority', kind='stable')
+
+    scalar_columns = [col for col in COLUMNS if col not in ('EIN', 'Email Addresses', 'Sources')]
+    merged = combined[['EIN'] + scalar_columns].replace('', None).groupby('EIN', sort=False).first()
+
+    with_email = combined[combined['Email Addresses'] != '']
+    emails = with_email.groupby('EIN', sort=False)['Email Addresses'].agg(
+        lambda values: normalize_emails(','.join(values)))
+    # Join source names column by column (nth source per EIN) instead of per group in Python
+    pairs = combined[['EIN', 'Sources']].drop_duplicates()
+    position = pairs.groupby('EIN', sort=False).cumcount()
+    sources = pairs[position == 0].set_index('EIN')['Sources']
+    for n in range(1, int(position.max()) + 1 if len(position) else 1):
+        nth = pairs[position == n].set_index('EIN')['Sources'].reindex(sources.index)
+        sources = sources.where(nth.isna(), sources + ';' + nth)
+
+    merged['Email Addresses'] = emails
+    merged['Sources'] = sources
+    merged = merged.reset_index().fillna('')[COLUMNS]
+    # Group shards together so Location filters can skip whole row groups
+    merged = merged.sort_values('Location', kind='stable').reset_index(drop=True)
+    return merged, len(combined), skipped
+
+def existing_version(fingerprint, root):
+    """Return a previously ingested version built from exactly these sources"""
+    if not root.exists():
+        return None
+    for manifest_path in sorted(root.glob(f"*/{MANIFEST_FILE}"), reverse=True):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                if json.load(f).get('fingerprint') == fingerprint:
+                    return manifest_path.parent.name
+        except (OSError, ValueError):
+            continue
+    return None
+
+def write_pointer(root, version):
+    tmp = root / f".{CURRENT_FILE}.tmp"
+    tmp.write_text(version + '\n')
+    os.replace(tmp, root / CURRENT_FILE)
+
+def prune_versions(root, keep, current):
+    """Delete all but the newest ``keep`` versions, never the current one"""
+    versions = sorted((p for p in root.iterdir() if p.is_dir() and not p.name.startswith('.')), reverse=True)
+    for path in versions[keep:]:
+        if path.name != current:
+            shutil.rmtree(path)
+            logging.info(f"Removed old dataset version {path.name}")
+
+def ingest(output_root=DATASET_ROOT, force=False, keep=3):
+    output_root = Path(output_root)
+    sources = discover_sources()
+    logging.info(f"Found {len(sources)} source files")
+
+    source_info = [{'path': str(path.relative_to(REPO_ROOT)), 'format': kind,
+                    'size': path.stat().st_size, 'sha256': file_sha256(path)}
+                   for path, kind in sources]
+    fingerprint = hashlib.sha256(json.dumps(
+        {'schema_version': SCHEMA_VERSION, 'email_filter': FILTER_VERSION,
+         'sources': [(s['path'], s['sha256']) for s in source_info]},
+        sort_keys=True).encode()).hexdigest()
+
+    if not force:
+        version = existing_version(fingerprint, output_root)
+        if version:
+            write_pointer(output_root, version)
+            logging.info(f"Sources unchanged; dataset version {version} is current")
+            return version
+
+    frames = []
+    for priority, ((path, kind), info) in enumerate(zip(sources, source_info)):
+        reader = read_csv_chunks if kind == 'csv' else read_txt_chunks
+        rows = 0
+        for chunk in reader(path):
+            frames.append(normalize_chunk(chunk, path, priority))
+            rows += len(chunk)
+        info['rows'] = rows
+        logging.info(f"Read {rows} rows from {info['path']}")
+
+    merged, total_rows, skipped = merge_records(frames)
+
+    created = datetime.now(timezone.utc)
+    version = f"{created.strftime('%Y%m%dT%H%M%SZ')}-{fingerprint[:12]}"
+    output_root.mkdir(parents=True, exist_ok=True)
+    staging = output_root / f".{version}.tmp"
+    if staging.exists():
+        shutil.rmtree(staging)
+    staging.mkdir()
+
+    merged.to_parquet(staging / DATASET_FILE, index=False, compression='zstd', row_group_size=CHUNK_SIZE)
+    manifest = {
+        'version': version,
+        'schema_version': SCHEMA_VERSION,
+        'created_at': created.isoformat(),
+        'fingerprint': fingerprint,
+        'columns': COLUMNS,
+        'rows': len(merged),
+        'input_rows': total_rows,
+        'skipped_rows_without_ein': skipped,
+        'duplicates_merged': total_rows - len(merged),
+        'locations': {code: int(count) for code, count in merged['Location'].value_counts().sort_index().items()},
+        'sources': source_info,
+    }
+    with open(staging / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(staging, output_root / version)
+    write_pointer(output_root, version)
+    logging.info(f"Wrote dataset version {version}: {len(merged)} nonprofits "
+                 f"({total_rows - len(merged)} duplicates merged, {skipped} rows without EIN skipped)")
+
+    if keep:
+        prune_versions(output_root, keep, version)
+    return version
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default=str(DATASET_ROOT), help='Dataset root directory')
+    parser.add_argument('--force', action='store_true', help='Re-ingest even if no source changed')
+    parser.add_argument('--keep', type=int, default=3, help='Number of dataset versions to keep (0 keeps all)')
+    args = parser.parse_args()
+    ingest(args.output, force=args.force, keep=args.keep)
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,29 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Blueprint, Response, g, render_template, request, jsonify, stream_with_context
 import pandas as pd
 import os
 import glob
 import traceback
 import logging
 import re
+import sys
+import json
+import heapq
+import threading
+import time
+from search_index import SearchIndex
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# The shared dataset loader (written by ingest.py) lives at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dataset
+
+# Configure logging: one line per request at INFO, per-shard detail at DEBUG
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+# Data files live next to this module unless overridden
+DATA_DIR = os.environ.get('NONPROFIT_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+bp = Blueprint('search', __name__)
 
 def clean_text(text):
     """Clean and normalize text for searching"""
@@ -28,18 +41,19 @@ def search_in_text(text, query):
     return cleaned_query in cleaned_text
 
 # Load all CSV files into memory
-def load_data():
+def load_data(data_dir=DATA_DIR):
     data = {}
     
     # First load international data
     try:
-        logger.info("Loading international nonprofits data...")
+        logger.debug("Loading international nonprofits data...")
         # Try both possible international file names
         intl_files = ['international_nonprofits.csv', 'nonprofits_International_websites.csv']
         intl_df = None
         for file in intl_files:
+            file = os.path.join(data_dir, file)
             if os.path.exists(file):
-                logger.info(f"Attempting to load {file}...")
+                logger.debug(f"Attempting to load {file}...")
                 try:
                     intl_df = pd.read_csv(file)
                     # Ensure consistent column names
@@ -55,8 +69,8 @@ def load_data():
                     if 'PC' not in intl_df.columns:
                         intl_df['PC'] = 'FORGN'
                     
-                    logger.info(f"Successfully loaded {file} with {len(intl_df)} records")
-                    logger.info(f"Columns in {file}: {list(intl_df.columns)}")
+                    logger.debug(f"Successfully loaded {file} with {len(intl_df)} records")
+                    logger.debug(f"Columns in {file}: {list(intl_df.columns)}")
                     break
                 except Exception as e:
                     logger.error(f"Error loading {file}: {e}")
@@ -67,7 +81,7 @@ def load_data():
             for col in intl_df.select_dtypes(include=['object']).columns:
                 intl_df[col] = intl_df[col].apply(clean_text)
             data['INT'] = intl_df
-            logger.info(f"Loaded international data with {len(intl_df)} records")
+            logger.debug(f"Loaded international data with {len(intl_df)} records")
         else:
             logger.warning("No international nonprofits file found")
     except Exception as e:
@@ -75,20 +89,20 @@ def load_data():
         logger.error(traceback.format_exc())
     
     # Then load state and territory files (both CSV and TXT)
-    csv_files = glob.glob('nonprofits_*.csv')
-    txt_files = glob.glob('nonprofits_*.txt')
+    csv_files = glob.glob(os.path.join(data_dir, 'nonprofits_*.csv'))
+    txt_files = glob.glob(os.path.join(data_dir, 'nonprofits_*.txt'))
     all_files = csv_files + txt_files
     logger.info(f"Found {len(all_files)} files to process ({len(csv_files)} CSV, {len(txt_files)} TXT)")
     
     for file in all_files:
         # Skip only the empty state file
-        if file == 'nonprofits_.csv' or file == 'nonprofits_.txt':
-            logger.info(f"Skipping file: {file}")
+        if os.path.basename(file) in ('nonprofits_.csv', 'nonprofits_.txt'):
+            logger.debug(f"Skipping file: {file}")
             continue
             
-        state_code = file.split('_')[1].split('.')[0]
+        state_code = os.path.basename(file).split('_')[1].split('.')[0]
         try:
-            logger.info(f"Loading {state_code} data from {file}...")
+            logger.debug(f"Loading {state_code} data from {file}...")
             # Handle both CSV and TXT files
             if file.endswith('.csv'):
                 df = pd.read_csv(file)
@@ -107,7 +121,7 @@ def load_data():
             for col in df.select_dtypes(include=['object']).columns:
                 df[col] = df[col].apply(clean_text)
             data[state_code] = df
-            logger.info(f"Loaded {state_code} data with {len(df)} records")
+            logger.debug(f"Loaded {state_code} data with {len(df)} records")
         except Exception as e:
             logger.error(f"Error loading {file}: {e}")
             logger.error(traceback.format_exc())
@@ -115,120 +129,307 @@ def load_data():
     logger.info(f"Successfully loaded data for {len(data)} locations")
     return data
 
-# Load data at startup
-logger.info("Starting application...")
-nonprofit_data = load_data()
-logger.info("Data loading complete")
+# Columns the search app serves from the normalized dataset
+APP_COLUMNS = ['EIN', 'Organization Name', 'City', 'State', 'Country', 'PC', 'Website', 'Location']
+
+def load_dataset_shards():
+    """Split the ingested dataset into per-location frames, international first"""
+    df = dataset.load_dataset(columns=APP_COLUMNS)
+    # Convert all string columns to lowercase for case-insensitive search
+    for col in df.columns:
+        if col not in ('EIN', 'Location'):
+            df[col] = df[col].str.lower().str.strip()
+
+    data = {code: shard.drop(columns='Location').reset_index(drop=True) for code, shard in df.groupby('Location')}
+    return dict(sorted(data.items(), key=lambda item: (item[0] != 'INT', item[0])))
+
+# Shared, read-only search data. Under gunicorn with preload_app this is filled
+# once in the master, and forked workers share the pages copy-on-write.
+nonprofit_data = {}
+search_index = None
+data_state = {
+    'status': 'pending',
+    'locations': 0,
+    'records': 0,
+    'tokens': 0,
+    'source': None,
+    'load_seconds': None,
+    'loaded_at': None,
+    'error': None,
+}
+_data_lock = threading.Lock()
+
+def init_data(data_dir=DATA_DIR):
+    """Load the nonprofit data once per process and record the load state"""
+    with _data_lock:
+        if data_state['status'] in ('loading', 'ready'):
+            return nonprofit_data
+        data_state.update(status='loading', error=None)
+
+    started = time.perf_counter()
+    try:
+        version = dataset.current_version()
+        if version and data_dir == DATA_DIR:
+            logger.info(f"Loading nonprofit dataset version {version}...")
+            data = load_dataset_shards()
+            data_state['source'] = f"dataset:{version}"
+        else:
+            logger.info(f"Loading nonprofit data from {data_dir} (run ingest.py to load a prebuilt dataset instead)...")
+            data = load_data(data_dir)
+            data_state['source'] = f"csv:{data_dir}"
+    except Exception as e:
+        logger.error(f"Error loading nonprofit data: {e}")
+        logger.error(traceback.format_exc())
+        data_state.update(status='failed', error=str(e))
+        return nonprofit_data
+
+    nonprofit_data.update(data)
+    global search_index
+    search_index = SearchIndex(nonprofit_data)
+    data_state.update(
+        status='ready',
+        locations=len(data),
+        records=sum(len(df) for df in data.values()),
+        tokens=len(search_index.vocabulary),
+        load_seconds=round(time.perf_counter() - started, 3),
+        loaded_at=time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    )
+    logger.info(f"Data loading complete: {data_state['records']} records in {data_state['locations']} locations ({data_state['load_seconds']}s)")
+    return nonprofit_data
+
+def create_app(data_dir=DATA_DIR, background=False):
+    """Application factory.
+
+    Data is loaded before the app is returned, so ``gunicorn --preload`` loads it
+    once in the master. Pass ``background=True`` to start serving immediately and
+    load in a thread instead; ``/readyz``, ``/search`` and ``/facets`` answer 503
+    until loading finishes.
+    """
+    app = Flask(__name__)
+    app.register_blueprint(bp)
+
+    if background:
+        threading.Thread(target=init_data, args=(data_dir,), name='data-loader', daemon=True).start()
+    else:
+        init_data(data_dir)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def log_request(response):
+        elapsed_ms = (time.perf_counter() - g.get('request_started', time.perf_counter())) * 1000
+        logger.info(f"{request.method} {request.full_path.rstrip('?')} {response.status_code} {elapsed_ms:.1f}ms")
+        return response
+
+    return app
+
+@bp.route('/healthz')
+def healthz():
+    # Liveness only: the process is up and serving requests
+    return jsonify({'status': 'ok', 'pid': os.getpid()})
 
-@app.route('/')
+@bp.route('/readyz')
+def readyz():
+    # Readiness: the search data has finished loading
+    state = dict(data_state, pid=os.getpid())
+    return jsonify(state), (200 if data_state['status'] == 'ready' else 503)
+
+def not_ready():
+    """A 503 response while the search data is still loading (or failed to), else None"""
+    if data_state['status'] != 'ready':
+        return jsonify({'error': 'Search data is not loaded yet', 'status': data_state['status']}), 503
+    return None
+
+@bp.route('/')
 def index():
     # Get list of available states/territories for the dropdown
     states = sorted([code for code in nonprofit_data.keys() if code != 'INT'])
     return render_template('index.html', states=states)
 
-@app.route('/search', methods=['GET'])
+def location_codes(state='', international_only=False):
+    """Location codes a request covers, or None for every location"""
+    if state == 'INT' or international_only:
+        codes = ['INT']
+    elif state:
+        codes = [state]
+    else:
+        return None
+
+    for code in codes:
+        if code not in nonprofit_data:
+            if code == 'INT':
+                logger.warning("No international data available")
+            else:
+                logger.warning(f"State {code} not found in data")
+    return codes
+
+def search_shards(query, state='', international_only=False, foundation_type=''):
+    """Yield (location code, matching rows) for every data shard the request covers."""
+    rows = search_index.match(query, location_codes(state, international_only), foundation_type)
+    for code, positions in search_index.split_by_location(rows):
+        matches = nonprofit_data[code].iloc[positions]
+        logger.debug(f"Found {len(matches)} results in {code}")
+        yield code, matches
+
+def relevance_score(x, query_words):
+    """Calculate relevance score based on number of matches and field importance"""
+    score = 0
+
+    # Special handling for international organizations
+    is_international = x.get('Country', '').lower() != 'united states'
+
+    # Organization name matches are most important
+    org_name = clean_text(x.get('Organization Name', ''))
+    if org_name:
+        score += sum(1 for word in query_words if word in org_name) * (4 if is_international else 3)
+
+    # Country matches are second most important
+    country = clean_text(x.get('Country', ''))
+    if country:
+        score += sum(1 for word in query_words if word in country) * (3 if is_international else 2)
+
+    # City and State matches are third most important
+    city = clean_text(x.get('City', ''))
+    state_val = clean_text(x.get('State', ''))
+    if city:
+        score += sum(1 for word in query_words if word in city) * (2 if is_international else 1)
+    if state_val:
+        score += sum(1 for word in query_words if word in state_val)
+
+    # Other fields contribute to the score
+    for key, value in x.items():
+        if key not in ['Organization Name', 'Country', 'City', 'State']:
+            text = clean_text(value)
+            if text:
+                score += sum(1 for word in query_words if word in text) * (1 if is_international else 0.5)
+
+    return score
+
+def display_record(result):
+    """Convert a matched row back to original case for display"""
+    for key in result:
+        if isinstance(result[key], str):
+            result[key] = result[key].title()
+        elif not isinstance(result[key], (list, dict)) and pd.isna(result[key]):
+            result[key] = None
+    return result
+
+def stream_results(query, state, international_only, limit=0, chunk_size=50, foundation_type=''):
+    """Yield ranked results as newline-delimited JSON, one shard at a time.
+
+    Every record carries its ``_score`` so the client can keep its list in rank
+    order as chunks arrive. When ``limit`` is set, a min-heap of the best scores
+    seen so far is kept and a record is only emitted if it enters the current
+    top-k, so later shards never send rows the client would immediately drop.
+    Rows already sent are not taken back when a later shard beats them, so more
+    than ``limit`` rows can arrive: clients keep the best ``limit`` by ``_score``.
+    The final record reports ``total`` matches and how many rows were ``sent``.
+    """
+    query_words = query.split()
+    top_scores = []
+    total = 0
+    sent = 0
+    for code, matches in search_shards(query, state, international_only, foundation_type):
+        scored = [(relevance_score(record, query_words), record) for record in matches.to_dict('records')]
+        scored.sort(key=lambda item: item[0], reverse=True)
+        total += len(scored)
+
+        chunk = []
+        for score, record in scored:
+            if limit:
+                if len(top_scores) < limit:
+                    heapq.heappush(top_scores, score)
+                elif score > top_scores[0]:
+                    heapq.heapreplace(top_scores, score)
+                else:
+                    # Shard rows are sorted, so nothing after this can enter the top-k
+                    break
+            record = display_record(record)
+            record['_score'] = score
+            chunk.append(json.dumps(record, default=str))
+            sent += 1
+            if len(chunk) >= chunk_size:
+                yield '\n'.join(chunk) + '\n'
+                chunk = []
+        if chunk:
+            yield '\n'.join(chunk) + '\n'
+
+    logger.debug(f"Results streamed for '{query}': {sent} of {total}")
+    yield json.dumps({'_done': True, 'total': total, 'sent': sent}) + '\n'
+
+@bp.route('/search', methods=['GET'])
 def search():
+    unavailable = not_ready()
+    if unavailable:
+        return unavailable
     try:
         query = request.args.get('q', '').lower().strip()
         state = request.args.get('state', '').upper()
         international_only = request.args.get('international_only', 'false').lower() == 'true'
-        
-        logger.info(f"Search request - Query: '{query}', State: '{state}', International Only: {international_only}")
-        
+        foundation_type = request.args.get('pc', '').upper()
+        stream = request.args.get('stream', 'false').lower() in ('1', 'true', 'ndjson')
+        limit = request.args.get('limit', 0, type=int)
+
+        logger.debug(f"Search request - Query: '{query}', State: '{state}', International Only: {international_only}, Stream: {stream}")
+
+        if stream:
+            if not query:
+                return Response(json.dumps({'_done': True, 'total': 0, 'sent': 0}) + '\n', mimetype='application/x-ndjson')
+            return Response(
+                stream_with_context(stream_results(query, state, international_only, limit, foundation_type=foundation_type)),
+                mimetype='application/x-ndjson',
+                headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'}
+            )
+
         if not query:
-            logger.info("Empty query received, returning empty results")
+            logger.debug("Empty query received, returning empty results")
             return jsonify([])
-            
+
         results = []
-        
-        # If state is INT or international_only is true, only search international data
-        if state == 'INT' or international_only:
-            if 'INT' in nonprofit_data:
-                df = nonprofit_data['INT']
-                # Search across all columns
-                mask = pd.Series(False, index=df.index)
-                for col in df.columns:
-                    mask |= df[col].apply(lambda x: search_in_text(x, query))
-                
-                results = df[mask].to_dict('records')
-                logger.info(f"Found {len(results)} international results")
-            else:
-                logger.warning("No international data available")
-        # If state is specified, only search that state's data
-        elif state:
-            if state in nonprofit_data:
-                df = nonprofit_data[state]
-                # Search across all columns
-                mask = pd.Series(False, index=df.index)
-                for col in df.columns:
-                    mask |= df[col].apply(lambda x: search_in_text(x, query))
-                
-                results = df[mask].to_dict('records')
-                logger.info(f"Found {len(results)} results in state {state}")
-            else:
-                logger.warning(f"State {state} not found in data")
-        else:
-            # Search all states and international data
-            for state_code, df in nonprofit_data.items():
-                # Search across all columns
-                mask = pd.Series(False, index=df.index)
-                for col in df.columns:
-                    mask |= df[col].apply(lambda x: search_in_text(x, query))
-                
-                state_results = df[mask].to_dict('records')
-                results.extend(state_results)
-                logger.info(f"Found {len(state_results)} results in {state_code}")
-        
+        for _, matches in search_shards(query, state, international_only, foundation_type):
+            results.extend(matches.to_dict('records'))
+
         # Sort results by relevance
-        def get_sort_key(x):
-            # Calculate relevance score based on number of matches and field importance
-            score = 0
-            query_words = query.split()
-            
-            # Special handling for international organizations
-            is_international = x.get('Country', '').lower() != 'united states'
-            
-            # Organization name matches are most important
-            org_name = clean_text(x.get('Organization Name', ''))
-            if org_name:
-                score += sum(1 for word in query_words if word in org_name) * (4 if is_international else 3)
-            
-            # Country matches are second most important
-            country = clean_text(x.get('Country', ''))
-            if country:
-                score += sum(1 for word in query_words if word in country) * (3 if is_international else 2)
-            
-            # City and State matches are third most important
-            city = clean_text(x.get('City', ''))
-            state_val = clean_text(x.get('State', ''))
-            if city:
-                score += sum(1 for word in query_words if word in city) * (2 if is_international else 1)
-            if state_val:
-                score += sum(1 for word in query_words if word in state_val)
-            
-            # Other fields contribute to the score
-            for key, value in x.items():
-                if key not in ['Organization Name', 'Country', 'City', 'State']:
-                    text = clean_text(value)
-                    if text:
-                        score += sum(1 for word in query_words if word in text) * (1 if is_international else 0.5)
-            
-            return score
-        
-        results.sort(key=get_sort_key, reverse=True)
-        
-        # Convert back to original case for display
-        for result in results:
-            for key in result:
-                if isinstance(result[key], str):
-                    result[key] = result[key].title()
-        
-        logger.info(f"Total results found: {len(results)}")
+        query_words = query.split()
+        results.sort(key=lambda x: relevance_score(x, query_words), reverse=True)
+        if limit:
+            results = results[:limit]
+
+        results = [display_record(result) for result in results]
+
+        logger.debug(f"Total results found: {len(results)}")
         return jsonify(results)
     except Exception as e:
         logger.error(f"Error in search: {e}")
         logger.error(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/facets', methods=['GET'])
+def facets():
+    """Match counts per location, top cities and PC/PF split, without building result rows"""
+    unavailable = not_ready()
+    if unavailable:
+        return unavailable
+    try:
+        query = request.args.get('q', '').lower().strip()
+        state = request.args.get('state', '').upper()
+        international_only = request.args.get('international_only', 'false').lower() == 'true'
+        foundation_type = request.args.get('pc', '').upper()
+        top = request.args.get('top', 10, type=int)
+
+        if not query:
+            return jsonify({'query': '', 'total': 0, 'states': {}, 'cities': [], 'foundation_type': {}})
+
+        rows = search_index.match(query, location_codes(state, international_only), foundation_type)
+        counts = search_index.facet_counts(rows, top_cities=top)
+        return jsonify(dict(query=query, total=int(len(rows)), **counts))
+    except Exception as e:
+        logger.error(f"Error in facets: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
+    # Development server only; use `gunicorn -c gunicorn.conf.py wsgi:app` in production
+    create_app().run(host='0.0.0.0', port=5000, debug=os.environ.get('FLASK_DEBUG', '0') == '1') 
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""Gunicorn settings for the nonprofit search app.
+
+Every value can be overridden with the matching environment variable so the
+same file works for local load testing and for deployment.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Load the app (and its data) in the master before forking workers
+preload_app = True
+
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads let one worker keep serving while another request streams results
+worker_class = os.environ.get('WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('THREADS', 4))
+timeout = int(os.environ.get('TIMEOUT', 60))
+keepalive = 5
+
+# Request lines are logged by the app itself at INFO
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+accesslog = None
+errorlog = '-'
+
+
+def when_ready(server):
+    # Move everything loaded so far into the permanent generation so the
+    # collector in the workers never writes to (and so never copies) those pages.
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,100 @@
+"""Measure search throughput and latency under concurrent load.
+
+    python loadtest.py --url http://localhost:5000 --concurrency 16 --requests 500
+
+Uses only the standard library so it can run from any machine that can reach
+the server. Reports requests/second, latency percentiles and, for streamed
+searches, time to the first result line.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_QUERIES = [
+    'food bank', 'church', 'foundation', 'school', 'animal', 'hospital',
+    'red cross', 'education', 'veterans', 'library', 'youth', 'canada',
+]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def run_request(base_url, query, state, stream, timeout):
+    """Issue one search and return (ok, total seconds, seconds to first line)"""
+    params = {'q': query, 'state': state}
+    if stream:
+        params['stream'] = '1'
+    url = f"{base_url.rstrip('/')}/search?{urllib.parse.urlencode(params)}"
+    started = time.perf_counter()
+    first_line = None
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            if stream:
+                for _ in response:
+                    if first_line is None:
+                        first_line = time.perf_counter() - started
+            else:
+                response.read()
+                first_line = time.perf_counter() - started
+        return True, time.perf_counter() - started, first_line
+    except Exception as e:
+        print(f"Request failed for '{query}': {e}", file=sys.stderr)
+        return False, time.perf_counter() - started, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of the running app')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='Total number of searches to send')
+    parser.add_argument('--state', default='', help='Restrict searches to one location code')
+    parser.add_argument('--stream', action='store_true', help='Use the NDJSON streaming mode')
+    parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for query selection')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [rng.choice(DEFAULT_QUERIES) for _ in range(args.requests)]
+
+    # Fail fast if the server is not ready to serve searches
+    try:
+        urllib.request.urlopen(f"{args.url.rstrip('/')}/readyz", timeout=args.timeout).read()
+    except Exception as e:
+        print(f"Server at {args.url} is not ready: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Sending {args.requests} searches with concurrency {args.concurrency} to {args.url}...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(
+            lambda query: run_request(args.url, query, args.state, args.stream, args.timeout),
+            queries,
+        ))
+    wall = time.perf_counter() - started
+
+    latencies = [elapsed for ok, elapsed, _ in results if ok]
+    first_lines = [first for ok, _, first in results if ok and first is not None]
+    errors = sum(1 for ok, _, _ in results if not ok)
+
+    print(f"Completed: {len(latencies)} ok, {errors} failed in {wall:.2f}s")
+    print(f"Throughput: {len(latencies) / wall:.1f} requests/s")
+    if latencies:
+        print(f"Latency (ms): mean {statistics.mean(latencies) * 1000:.1f}, "
+              f"p50 {percentile(latencies, 50) * 1000:.1f}, "
+              f"p95 {percentile(latencies, 95) * 1000:.1f}, "
+              f"p99 {percentile(latencies, 99) * 1000:.1f}")
+    if first_lines and args.stream:
+        print(f"Time to first result (ms): p50 {percentile(first_lines, 50) * 1000:.1f}, "
+              f"p95 {percentile(first_lines, 95) * 1000:.1f}")
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
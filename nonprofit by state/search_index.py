@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndex:
+    """Token posting lists over every loaded location, plus facet codes.
+
+    Each (token, row) occurrence is stored in two flat int32 arrays, so a query
+    word is resolved by scanning the (much smaller) vocabulary for tokens that
+    contain it and gathering their rows in one vectorized pass. Rows are global
+    ids across all locations; ``offsets`` maps them back to per-location
+    positions. Facet columns are factorized once so counts for a match set are
+    a ``bincount`` over integer codes instead of a walk over materialized rows.
+    """
+
+    def __init__(self, data, facet_columns=('City', 'PC'), cache_size=64):
+        started = time.perf_counter()
+        self.data = data
+        self.codes = list(data.keys())
+        sizes = [len(df) for df in data.values()]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.num_rows = int(self.offsets[-1])
+        # Location id for every global row
+        self.location_ids = np.repeat(np.arange(len(self.codes), dtype=np.int32), sizes)
+
+        tokens = []
+        rows = []
+        for offset, df in zip(self.offsets, data.values()):
+            for col in df.columns:
+                values = df[col]
+                values = values[values.notna()].astype(str).str.lower()
+                exploded = values.str.split().explode().dropna()
+                positions = df.index.get_indexer(exploded.index)
+                tokens.append(exploded.to_numpy())
+                rows.append((positions + offset).astype(np.int32))
+
+        token_codes, vocabulary = pd.factorize(np.concatenate(tokens)) if tokens else (np.array([], dtype=np.int64), pd.Index([]))
+        self.entry_tokens = token_codes.astype(np.int32)
+        self.entry_rows = np.concatenate(rows) if rows else np.array([], dtype=np.int32)
+        self.vocabulary = pd.Series(vocabulary, dtype=object)
+
+        self.facets = {}
+        for col in facet_columns:
+            values = pd.concat(
+                [df[col] if col in df.columns else pd.Series([None] * len(df), dtype=object) for df in data.values()],
+                ignore_index=True,
+            )
+            facet_codes, labels = pd.factorize(values.where(values.notna() & (values.astype(str) != ''), None))
+            self.facets[col] = (facet_codes.astype(np.int32), np.asarray(labels, dtype=object))
+
+        # LRU of recent query words, shared by the worker's request threads
+        self._word_cache = OrderedDict()
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        logger.info(f"Built search index over {self.num_rows} records: {len(self.vocabulary)} tokens, "
+                    f"{len(self.entry_rows)} postings ({time.perf_counter() - started:.2f}s)")
+
+    def _word_rows(self, word):
+        """Boolean mask of global rows with a token containing ``word``"""
+        with self._cache_lock:
+            cached = self._word_cache.get(word)
+            if cached is not None:
+                self._word_cache.move_to_end(word)
+                return cached
+
+        token_mask = self.vocabulary.str.contains(word, regex=False).to_numpy(dtype=bool)
+        row_mask = np.zeros(self.num_rows, dtype=bool)
+        if token_mask.any():
+            row_mask[self.entry_rows[token_mask[self.entry_tokens]]] = True
+
+        with self._cache_lock:
+            self._word_cache[word] = row_mask
+            if len(self._word_cache) > self._cache_size:
+                self._word_cache.popitem(last=False)
+        return row_mask
+
+    def candidates(self, query, codes=None, foundation_type=None):
+        """Global row ids with a token containing every query word.
+
+        Optionally restricted to the location ``codes`` and to one PC/PF value.
+        """
+        words = query.lower().split()
+        if not words:
+            return np.array([], dtype=np.int64)
+        mask = self._word_rows(words[0]).copy()
+        for word in words[1:]:
+            mask &= self._word_rows(word)
+        if codes is not None:
+            wanted = [self.codes.index(code) for code in codes if code in self.codes]
+            mask &= np.isin(self.location_ids, wanted)
+        if foundation_type and 'PC' in self.facets:
+            pc_codes, pc_labels = self.facets['PC']
+            wanted = [i for i, label in enumerate(pc_labels) if str(label).lower() == foundation_type.lower()]
+            mask &= np.isin(pc_codes, wanted)
+        return np.flatnonzero(mask)
+
+    def match(self, query, codes=None, foundation_type=None):
+        """Sorted global row ids where some column contains the query phrase.
+
+        A single word is answered exactly by the posting lists. For several
+        words the posting-list intersection is a superset (the words may sit in
+        different columns or be out of order), so only those candidate rows are
+        checked for the whole phrase.
+        """
+        query = query.lower().strip()
+        rows = self.candidates(query, codes, foundation_type)
+        if len(query.split()) < 2 or not len(rows):
+            return rows
+
+        keep = np.zeros(len(rows), dtype=bool)
+        start = 0
+        for code, positions in self.split_by_location(rows):
+            subset = self.data[code].iloc[positions]
+            found = np.zeros(len(positions), dtype=bool)
+            for col in subset.columns:
+                values = subset[col]
+                found |= (values.notna() & values.astype(str).str.lower().str.contains(query, regex=False)).to_numpy(dtype=bool)
+            keep[start:start + len(positions)] = found
+            start += len(positions)
+        return rows[keep]
+
+    def split_by_location(self, rows):
+        """Yield (location code, positions within that location) for sorted global rows"""
+        bounds = np.searchsorted(rows, self.offsets)
+        for i, code in enumerate(self.codes):
+            local = rows[bounds[i]:bounds[i + 1]]
+            if len(local):
+                yield code, local - self.offsets[i]
+
+    def facet_counts(self, rows, top_cities=10):
+        """Counts per location, top (city, location) pairs and PC/PF split for a set of rows"""
+        location_counts = np.bincount(self.location_ids[rows], minlength=len(self.codes))
+        states = {code: int(count) for code, count in zip(self.codes, location_counts) if count}
+
+        cities = []
+        if 'City' in self.facets:
+            city_codes, city_labels = self.facets['City']
+            matched = city_codes[rows]
+            keep = matched >= 0
+            pairs = matched[keep].astype(np.int64) * len(self.codes) + self.location_ids[rows][keep]
+            keys, counts = np.unique(pairs, return_counts=True)
+            for i in np.argsort(-counts, kind='stable')[:top_cities]:
+                city, location = divmod(int(keys[i]), len(self.codes))
+                cities.append({'city': str(city_labels[city]).title(), 'state': self.codes[location], 'count': int(counts[i])})
+
+        foundation_type = {}
+        if 'PC' in self.facets:
+            pc_codes, pc_labels = self.facets['PC']
+            matched = pc_codes[rows]
+            counts = np.bincount(matched[matched >= 0], minlength=len(pc_labels))
+            foundation_type = {str(label).upper(): int(count) for label, count in zip(pc_labels, counts) if count}
+
+        return {'states': states, 'cities': cities, 'foundation_type': foundation_type}
@@ -31,9 +31,16 @@ function updateThemeButton(theme) {
     themeToggle.innerHTML = `<i class="${icon.className}"></i> ${text}`;
 }
 
+// Foundation type (PC/PF) filter, set by clicking a facet
+let foundationType = '';
+
+// Results shown per search; the server streams only rows that can still make the top RESULT_LIMIT
+const RESULT_LIMIT = 100;
+
 // Search functionality
 document.getElementById('searchForm').addEventListener('submit', function(e) {
     e.preventDefault();
+    foundationType = '';
     performSearch();
 });
 
@@ -45,6 +52,7 @@ function performSearch() {
     if (!query) {
         const resultsDiv = document.getElementById('results');
         resultsDiv.innerHTML = '<div class="alert alert-info">Please enter a search term</div>';
+        document.getElementById('facets').innerHTML = '';
         return;
     }
     
@@ -58,16 +66,27 @@ function performSearch() {
     searchButton.disabled = true;
     searchButton.innerHTML = '<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> Searching...';
 
-    // Perform the search
-    fetch(`/search?q=${encodeURIComponent(query)}&state=${encodeURIComponent(state)}&international_only=${internationalOnly}`)
+    // Perform the search, rendering results as each NDJSON chunk arrives
+    const params = `q=${encodeURIComponent(query)}&state=${encodeURIComponent(state)}&international_only=${internationalOnly}&pc=${encodeURIComponent(foundationType)}`;
+    let received = 0;
+    loadFacets(params);
+    fetch(`/search?${params}&stream=1&limit=${RESULT_LIMIT}`)
         .then(response => {
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
-            return response.json();
+            return readNdjson(response, records => {
+                const results = records.filter(record => !record._done);
+                if (results.length) {
+                    displayResults(results, query, internationalOnly, received > 0);
+                    received += results.length;
+                }
+            });
         })
-        .then(data => {
-            displayResults(data, query, internationalOnly);
+        .then(() => {
+            if (received === 0) {
+                displayResults([], query, internationalOnly);
+            }
         })
         .catch(error => {
             console.error('Error:', error);
@@ -86,7 +105,90 @@ function performSearch() {
         });
 }
 
-function displayResults(results, query, internationalOnly) {
+// Fetch match counts per location, city and foundation type for the current search
+function loadFacets(params) {
+    const facetsDiv = document.getElementById('facets');
+    facetsDiv.innerHTML = '';
+    fetch(`/facets?${params}`)
+        .then(response => response.ok ? response.json() : null)
+        .then(facets => {
+            if (facets && facets.total) {
+                displayFacets(facets);
+            }
+        })
+        .catch(error => console.error('Facets error:', error));
+}
+
+function displayFacets(facets) {
+    const facetsDiv = document.getElementById('facets');
+    const badge = (label, count, attrs) =>
+        `<button type="button" class="btn btn-sm btn-outline-secondary facet me-1 mb-1" ${attrs}>${label} <span class="badge bg-secondary">${count}</span></button>`;
+
+    const states = Object.entries(facets.states)
+        .sort((a, b) => b[1] - a[1])
+        .map(([code, count]) => badge(code, count, `data-state="${code}"`))
+        .join('');
+    const types = Object.entries(facets.foundation_type)
+        .sort((a, b) => b[1] - a[1])
+        .map(([type, count]) => badge(type, count, `data-pc="${type}"`))
+        .join('');
+    const cities = facets.cities
+        .map(city => `<span class="me-2">${city.city}, ${city.state} (${city.count})</span>`)
+        .join('');
+
+    facetsDiv.innerHTML = `
+        <div class="card">
+            <div class="card-body">
+                <p class="mb-2"><strong>${facets.total}</strong> matches${foundationType ? ` (${foundationType} only)` : ''}</p>
+                <div class="mb-2"><small class="text-muted d-block">Locations</small>${states}</div>
+                <div class="mb-2"><small class="text-muted d-block">Foundation type</small>${types}</div>
+                ${cities ? `<div><small class="text-muted d-block">Top cities</small>${cities}</div>` : ''}
+            </div>
+        </div>
+    `;
+
+    facetsDiv.querySelectorAll('[data-state]').forEach(button => {
+        button.addEventListener('click', () => {
+            document.getElementById('stateSelect').value = button.dataset.state;
+            document.getElementById('internationalOnly').checked = false;
+            performSearch();
+        });
+    });
+    facetsDiv.querySelectorAll('[data-pc]').forEach(button => {
+        button.addEventListener('click', () => {
+            foundationType = foundationType === button.dataset.pc ? '' : button.dataset.pc;
+            performSearch();
+        });
+    });
+}
+
+// Read a newline-delimited JSON response, handing each batch of complete lines to onRecords
+async function readNdjson(response, onRecords) {
+    const parseLines = lines => lines.filter(line => line.trim()).map(line => JSON.parse(line));
+
+    if (!response.body || !response.body.getReader) {
+        onRecords(parseLines((await response.text()).split('\n')));
+        return;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        onRecords(parseLines(lines));
+    }
+    buffer += decoder.decode();
+    onRecords(parseLines([buffer]));
+}
+
+function displayResults(results, query, internationalOnly, append = false) {
     const resultsDiv = document.getElementById('results');
     
     if (results.length === 0) {
@@ -105,7 +207,14 @@ function displayResults(results, query, internationalOnly) {
         return;
     }
 
-    let html = '<div class="row">';
+    let container = resultsDiv.querySelector('.row');
+    if (!append || !container) {
+        resultsDiv.innerHTML = '<div class="row"></div>';
+        container = resultsDiv.querySelector('.row');
+    }
+
+    // Each chunk arrives sorted by score, so one forward pass merges it into the list
+    let cursor = container.firstElementChild;
     results.forEach(result => {
         const orgName = result['Organization Name'] || 'Unknown Organization';
         const city = result.City || '';
@@ -113,9 +222,12 @@ function displayResults(results, query, internationalOnly) {
         const country = result.Country || '';
         const website = result.Website || '';
         const ein = result.EIN || '';
+        const score = result._score || 0;
 
-        html += `
-            <div class="col-12 mb-4">
+        const card = document.createElement('div');
+        card.className = 'col-12 mb-4';
+        card.dataset.score = score;
+        card.innerHTML = `
                 <div class="card">
                     <div class="card-body">
                         <h5 class="card-title">${orgName}</h5>
@@ -126,10 +238,17 @@ function displayResults(results, query, internationalOnly) {
                         </p>
                     </div>
                 </div>
-            </div>
         `;
+
+        // Keep the list in rank order as results from later shards arrive
+        while (cursor && parseFloat(cursor.dataset.score) >= score) {
+            cursor = cursor.nextElementSibling;
+        }
+        container.insertBefore(card, cursor);
     });
-    html += '</div>';
 
-    resultsDiv.innerHTML = html;
-} 
\ No newline at end of file
+    // Rows from earlier shards that later shards have beaten drop off the end
+    while (container.children.length > RESULT_LIMIT) {
+        container.lastElementChild.remove();
+    }
+}
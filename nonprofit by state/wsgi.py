@@ -0,0 +1,11 @@
+"""WSGI entry point for production serving.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+With ``preload_app`` enabled in gunicorn.conf.py this module is imported once in
+the gunicorn master, so the nonprofit data is parsed a single time and every
+forked worker shares it copy-on-write.
+"""
+from app import create_app
+
+app = create_app()
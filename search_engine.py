@@ -8,9 +8,15 @@ import streamlit as st
 import chardet
 import urllib.parse
 import torch
+import dataset
+from email_quality import default_filter
+from suppression import load_suppression
 
 class NonprofitSearchEngine:
-    def __init__(self):
+    # Dataset columns the engine needs, and the Location shards it indexes
+    COLUMNS = ['EIN', 'Organization Name', 'City', 'State', 'Country', 'Website', 'Email Addresses']
+
+    def __init__(self, locations=('INT',), suppression=None):
         # Initialize the model without device specification
         self.model = SentenceTransformer('all-MiniLM-L6-v2')
         # Force CPU usage
@@ -21,6 +27,9 @@ class NonprofitSearchEngine:
         self.index = None
         self.embeddings = None
         self.vector_dim = 384  # Dimension of the embeddings
+        self.locations = locations
+        # Do-Not-Contact index; suppressed organizations and emails never appear in results
+        self.suppression = suppression
         
     def detect_encoding(self, file_path):
         """Detect the encoding of a file"""
@@ -29,7 +38,12 @@ class NonprofitSearchEngine:
         return result['encoding']
         
     def load_data(self):
-        """Load and combine data from all CSV files in the directories"""
+        """Load the normalized dataset written by ingest.py, falling back to the CSV files"""
+        if dataset.dataset_available():
+            self.data = dataset.load_dataset(columns=self.COLUMNS, locations=self.locations)
+            self._build_search_text()
+            return
+
         dfs = []
         
         # Load international nonprofits data
@@ -54,13 +68,24 @@ class NonprofitSearchEngine:
             self.data = self.data.fillna('')
             # Remove duplicates based on EIN
             self.data = self.data.drop_duplicates(subset=['EIN'], keep='first')
-            # Create a searchable text field
-            self.data['search_text'] = self.data.apply(
-                lambda row: f"{row['Organization Name']} {row['City']} {row['State']} {row['Country']} {row['Website']} {row['Email Addresses']}",
-                axis=1
-            )
+            self._build_search_text()
         else:
             raise ValueError("No CSV files found in the specified directories")
+
+    def _build_search_text(self):
+        """Create a searchable text field"""
+        self.data = self.data.reset_index(drop=True)
+        # Only plausible contacts are embedded and shown; tracking IDs and file names are dropped
+        has_email = self.data['Email Addresses'].astype(str) != ''
+        email_filter = default_filter()
+        self.data.loc[has_email, 'Email Addresses'] = [
+            email_filter.filter_field(emails, website) for emails, website in
+            zip(self.data.loc[has_email, 'Email Addresses'].astype(str), self.data.loc[has_email, 'Website'].astype(str))]
+        columns = ['Organization Name', 'City', 'State', 'Country', 'Website', 'Email Addresses']
+        text = self.data[columns[0]].astype(str)
+        for col in columns[1:]:
+            text = text + ' ' + self.data[col].astype(str)
+        self.data['search_text'] = text
     
     def build_index(self):
         """Create embeddings and build FAISS index"""
@@ -82,14 +107,19 @@ class NonprofitSearchEngine:
         # Create embedding for query
         query_embedding = self.model.encode([query])
         
-        # Search in FAISS index
-        distances, indices = self.index.search(query_embedding.astype('float32'), k)
-        
-        # Get results
-        results = self.data.iloc[indices[0]].copy()
-        results['similarity_score'] = 1 / (1 + distances[0])  # Convert distance to similarity score
-        
-        return results
+        # Search in FAISS index, widening the search while suppressed rows leave fewer than k
+        n = k
+        while True:
+            distances, indices = self.index.search(query_embedding.astype('float32'), n)
+            found = indices[0] >= 0
+            results = self.data.iloc[indices[0][found]].copy()
+            results['similarity_score'] = 1 / (1 + distances[0][found])  # Convert distance to similarity score
+            if not self.suppression:
+                return results
+            results = self.suppression.filter_frame(results)
+            if len(results) >= k or n >= self.index.ntotal:
+                return results.head(k)
+            n = min(n * 2, self.index.ntotal)
 
 def main():
     # Add Jotform bot script
@@ -126,7 +156,7 @@ def main():
     
     # Initialize search engine
     if 'search_engine' not in st.session_state:
-        st.session_state.search_engine = NonprofitSearchEngine()
+        st.session_state.search_engine = NonprofitSearchEngine(suppression=load_suppression())
         with st.spinner('Loading data and building search index...'):
             st.session_state.search_engine.load_data()
             st.session_state.search_engine.build_index()
@@ -0,0 +1,138 @@
+"""Local stand-in for DuckDuckGo's HTML search, for exercising find_nonprofit_websites.py offline.
+
+    python search_testserver.py --rate 2 --burst 3 --write-csv test_orgs.csv
+    python find_nonprofit_websites.py --input test_orgs.csv --output test_orgs_with_websites.csv \
+        --search-url http://127.0.0.1:8766/html/
+
+/html/?q=... answers like html.duckduckgo.com: a page of ``result__url``
+links, a directory listing first and then the organization's own site, so
+the result filtering is exercised too. The server enforces its own token
+bucket of --rate searches a second with --burst back to back; searches
+beyond it get the 202 DuckDuckGo sends when it wants clients to slow down
+(429 with --status 429), with Retry-After when --retry-after is given.
+--latency delays every answer. robots.txt allows /html/ and, with
+--crawl-delay, asks for that Crawl-delay. --write-csv produces an input file
+of N organizations.
+"""
+import argparse
+import csv
+import logging
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PAGE = '''<html><body><div class="results">
+<div class="result"><a class="result__url" href="https://www.guidestar.org/profile/{slug}">guidestar.org</a></div>
+<div class="result"><a class="result__url" href="https://www.{slug}.org/about?utm_source=ddg">{slug}.org</a></div>
+</div></body></html>'''
+ROBOTS = '''User-agent: *
+Disallow: /lite/
+{crawl_delay}'''
+
+class SearchHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real search engine
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if parsed.path == '/robots.txt':
+            crawl_delay = f"Crawl-delay: {self.server.crawl_delay}\n" if self.server.crawl_delay else ''
+            self.send_body(200, ROBOTS.format(crawl_delay=crawl_delay), 'text/plain')
+            return
+        if parsed.path != '/html/':
+            self.send_body(404, '<html><body>Not found</body></html>')
+            return
+        if not self.server.take_token():
+            self.send_body(self.server.status, '', retry_after=self.server.retry_after)
+            return
+        query = parse_qs(parsed.query).get('q', [''])[0]
+        # Everything before "<state> nonprofit official website" is the organization's name
+        name = query.rsplit(' nonprofit official website', 1)[0].rsplit(' ', 1)[0]
+        slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'unknown'
+        self.send_body(200, RESULTS_PAGE.format(slug=slug))
+
+    def send_body(self, status, text, content_type='text/html; charset=utf-8', retry_after=None):
+        body = text.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+class SearchServer(ThreadingHTTPServer):
+    """Threaded search server that rate limits searches and counts how they were answered"""
+    daemon_threads = True
+
+    def __init__(self, port=8766, rate=2.0, burst=1, status=202, retry_after=None, latency=0.0, crawl_delay=0):
+        super().__init__(('127.0.0.1', port), SearchHandler)
+        self.rate = rate
+        self.burst = burst
+        self.status = status
+        self.retry_after = retry_after
+        self.latency = latency
+        self.crawl_delay = crawl_delay
+        self.requests = {}
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take_token(self):
+        """True if a search fits the rate limit; counts it as answered or refused"""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            allowed = not self.rate or self._tokens >= 1
+            if allowed and self.rate:
+                self._tokens -= 1
+            key = 'answered' if allowed else 'refused'
+            self.requests[key] = self.requests.get(key, 0) + 1
+            return allowed
+
+def write_orgs_csv(path, count):
+    """Write a find_nonprofit_websites.py input file with ``count`` organizations, in the IA file's column order"""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['EIN', 'Organization Name', 'City', 'State', 'Country', 'PC'])
+        for n in range(1, count + 1):
+            writer.writerow([f"{n:09d}", f"Test Nonprofit {n}", 'Testville', 'IA', 'United States', 'PC'])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--rate', type=float, default=2.0, help='Searches a second answered with results (0: no limit)')
+    parser.add_argument('--burst', type=int, default=1, help='Searches answered back to back')
+    parser.add_argument('--status', type=int, default=202, help='Status sent to searches over the limit')
+    parser.add_argument('--retry-after', type=int, help='Retry-After seconds sent with refused searches')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each request')
+    parser.add_argument('--crawl-delay', type=int, default=0, help='Crawl-delay announced in robots.txt, in whole seconds')
+    parser.add_argument('--orgs', type=int, default=50, help='Number of organizations listed by --write-csv')
+    parser.add_argument('--write-csv', help='Write an input CSV of test organizations and keep serving')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.write_csv:
+        write_orgs_csv(args.write_csv, args.orgs)
+        logger.info(f"Wrote {args.write_csv}")
+    with SearchServer(args.port, args.rate, args.burst, args.status, args.retry_after, args.latency,
+                      args.crawl_delay) as server:
+        logger.info(f"Serving search on http://127.0.0.1:{args.port}/html/ at {args.rate:g} searches a second")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info(f"Searches: {server.requests}")
+
+if __name__ == "__main__":
+    main()
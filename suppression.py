@@ -0,0 +1,154 @@
+import logging
+import re
+import threading
+from pathlib import Path
+
+from crm_db import CRMDatabase
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "crm_database.db"
+EMAIL_SPLIT = re.compile(r'[,;\s]+')
+
+def normalize_ein(ein):
+    """EINs are nine digits; restore leading zeros lost by numeric round trips"""
+    digits = re.sub(r'\D', '', str(ein or ''))
+    return digits.zfill(9) if digits else ''
+
+def normalize_email(email):
+    email = str(email or '').strip().lower()
+    if email.startswith('mailto:'):
+        email = email[7:]
+    return email if '@' in email else ''
+
+def split_emails(value):
+    """Split a comma/semicolon/space separated email list into normalized addresses"""
+    if isinstance(value, str):
+        value = EMAIL_SPLIT.split(value)
+    return [email for email in map(normalize_email, value or ()) if email]
+
+class SuppressionList:
+    """Do-Not-Contact suppression index.
+
+    The ``suppressions`` table is the record of who must not be contacted; the
+    EINs and email addresses in it are loaded once into in-memory sets so every
+    search result, campaign and crawl can be checked in O(1). The sets are
+    replaced rather than mutated on change, so readers never need the lock.
+    """
+
+    _instances = {}
+    _instances_guard = threading.Lock()
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.db = CRMDatabase.shared(path)
+        self._lock = threading.Lock()
+        self.eins = frozenset()
+        self.emails = frozenset()
+        self.init_table()
+        self.reload()
+
+    @classmethod
+    def shared(cls, path=DEFAULT_DB_PATH):
+        """One suppression index per database file per process"""
+        key = str(Path(path).resolve())
+        with cls._instances_guard:
+            if key not in cls._instances:
+                cls._instances[key] = cls(path)
+            return cls._instances[key]
+
+    def init_table(self):
+        with self.db.transaction("init_suppressions") as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='suppressions'").fetchone()
+            conn.execute('''CREATE TABLE IF NOT EXISTS suppressions
+                            (kind TEXT NOT NULL,
+                             value TEXT NOT NULL,
+                             reason TEXT,
+                             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                             PRIMARY KEY (kind, value)) WITHOUT ROWID''')
+            has_prospects = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='prospects'").fetchone()
+            if not exists and has_prospects:
+                # Carry over prospects flagged Do Not Contact before the table existed
+                rows = conn.execute("SELECT ein, email FROM prospects WHERE do_not_contact=1").fetchall()
+                conn.executemany("INSERT OR IGNORE INTO suppressions (kind, value, reason) VALUES (?, ?, 'prospect')",
+                                 self._entries(rows))
+
+    @staticmethod
+    def _entries(pairs):
+        """(kind, value) rows for a sequence of (ein, emails) pairs"""
+        entries = []
+        for ein, emails in pairs:
+            if normalize_ein(ein):
+                entries.append(('ein', normalize_ein(ein)))
+            entries.extend(('email', email) for email in split_emails(emails))
+        return entries
+
+    def reload(self):
+        """Re-read the suppression table, picking up changes made by other processes"""
+        with self.db.connection("load_suppressions") as conn:
+            rows = conn.execute("SELECT kind, value FROM suppressions").fetchall()
+        with self._lock:
+            self.eins = frozenset(value for kind, value in rows if kind == 'ein')
+            self.emails = frozenset(value for kind, value in rows if kind == 'email')
+        logger.info(f"Loaded {len(self.eins)} suppressed EINs and {len(self.emails)} suppressed emails")
+
+    def suppress(self, ein=None, emails=(), reason=''):
+        """Add an EIN and/or email addresses to the suppression list"""
+        entries = self._entries([(ein, emails)])
+        if not entries:
+            return
+        with self.db.transaction("suppress") as conn:
+            conn.executemany("INSERT OR IGNORE INTO suppressions (kind, value, reason) VALUES (?, ?, ?)",
+                             [(kind, value, reason) for kind, value in entries])
+        with self._lock:
+            self.eins = self.eins | {value for kind, value in entries if kind == 'ein'}
+            self.emails = self.emails | {value for kind, value in entries if kind == 'email'}
+
+    def unsuppress(self, ein=None, emails=()):
+        """Lift the suppression on an EIN and/or email addresses"""
+        entries = self._entries([(ein, emails)])
+        if not entries:
+            return
+        with self.db.transaction("unsuppress") as conn:
+            conn.executemany("DELETE FROM suppressions WHERE kind=? AND value=?", entries)
+        with self._lock:
+            self.eins = self.eins - {value for kind, value in entries if kind == 'ein'}
+            self.emails = self.emails - {value for kind, value in entries if kind == 'email'}
+
+    def is_ein_suppressed(self, ein):
+        return normalize_ein(ein) in self.eins
+
+    def is_email_suppressed(self, email):
+        return normalize_email(email) in self.emails
+
+    def is_suppressed(self, ein=None, emails=()):
+        """True if the EIN or any of the email addresses must not be contacted"""
+        if ein is not None and self.is_ein_suppressed(ein):
+            return True
+        return any(email in self.emails for email in split_emails(emails))
+
+    def filter_emails(self, emails):
+        """Normalized addresses from ``emails`` that are not suppressed"""
+        return [email for email in split_emails(emails) if email not in self.emails]
+
+    def filter_frame(self, df, ein_column='EIN', email_column='Email Addresses'):
+        """Drop rows with a suppressed EIN and strip suppressed addresses from the email column"""
+        if ein_column in df.columns and self.eins:
+            eins = df[ein_column].astype(str).str.replace(r'\D', '', regex=True).str.zfill(9)
+            df = df[~eins.isin(self.eins)]
+        if email_column in df.columns and self.emails:
+            df = df.copy()
+            df[email_column] = df[email_column].map(
+                lambda value: ','.join(self.filter_emails(value)) if value else value)
+        return df
+
+    def __len__(self):
+        return len(self.eins) + len(self.emails)
+
+def load_suppression(path=DEFAULT_DB_PATH):
+    """The shared suppression index for a CRM database, or None if there is no CRM database yet"""
+    if not Path(path).exists():
+        logger.info(f"No CRM database at {path}; Do-Not-Contact suppression disabled")
+        return None
+    return SuppressionList.shared(path)
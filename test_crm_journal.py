@@ -0,0 +1,37 @@
+import pandas as pd
+
+from crm_journal import ChangeJournal, CSVCompactor
+
+def compact(tmp_path, rows, changes):
+    csv_path = tmp_path / "prospects.csv"
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    journal = ChangeJournal(tmp_path / "changes.jsonl")
+    journal.append_many(changes)
+    compactor = CSVCompactor(journal, [csv_path], interval=3600)
+    compactor.compact()
+    compactor.stop()
+    return pd.read_csv(csv_path, dtype=str, keep_default_na=False).set_index('EIN')
+
+def test_partial_upsert_keeps_existing_fields(tmp_path):
+    df = compact(tmp_path,
+                 [{'EIN': '000000001', 'Organization Name': 'One', 'Phone': '555-0001', 'Notes': 'keep me'},
+                  {'EIN': '000000002', 'Organization Name': 'Two', 'Phone': '555-0002', 'Notes': 'old'}],
+                 [('upsert', '000000001', {'Notes': 'new note'}),
+                  ('upsert', '000000002', {'Phone': '555-9999'})])
+    assert df.loc['000000001'].to_dict() == {'Organization Name': 'One', 'Phone': '555-0001', 'Notes': 'new note'}
+    assert df.loc['000000002'].to_dict() == {'Organization Name': 'Two', 'Phone': '555-9999', 'Notes': 'old'}
+
+def test_upserts_in_one_batch_merge(tmp_path):
+    df = compact(tmp_path,
+                 [{'EIN': '000000001', 'Organization Name': 'One', 'Phone': '', 'Notes': ''}],
+                 [('upsert', '000000003', {'Organization Name': 'Three', 'Phone': '555-0003', 'Notes': 'added'}),
+                  ('upsert', '000000003', {'Notes': 'imported'})])
+    assert df.loc['000000003'].to_dict() == {'Organization Name': 'Three', 'Phone': '555-0003', 'Notes': 'imported'}
+    assert len(df) == 2
+
+def test_upsert_after_delete_replaces_the_row(tmp_path):
+    df = compact(tmp_path,
+                 [{'EIN': '000000001', 'Organization Name': 'One', 'Phone': '555-0001', 'Notes': 'old'}],
+                 [('delete', '000000001', None),
+                  ('upsert', '000000001', {'Organization Name': 'One again'})])
+    assert df.loc['000000001'].to_dict() == {'Organization Name': 'One again', 'Phone': '', 'Notes': ''}